@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "forma.settings")
 
 application = get_asgi_application()
+
+# Connect to Firebase while the worker boots rather than on its first request
+from portal.catalogue_sync import start_catalogue_sync  # noqa: E402
+from portal.firebase_clients import firebase_clients  # noqa: E402
+
+firebase_clients.warm_up()
+start_catalogue_sync()
@@ -13,19 +13,66 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 
 import os
-import firebase_admin
-from firebase_admin import credentials
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Start Firebase App
-cred = credentials.Certificate(os.path.join(BASE_DIR, "firebase_services.json"))
-firebase_admin.initialize_app(cred, {
+# Firebase app, initialised on first use by portal.firebase_clients
+FIREBASE_CREDENTIALS = os.path.join(BASE_DIR, "firebase_services.json")
+FIREBASE_OPTIONS = {
     "projectId": "gymmawy-06fs5w",
     "storageBucket": "gymmawy-06fs5w.appspot.com",
     "databaseURL": "https://gymmawy-06fs5w.firebaseio.com"
-})
+}
+
+# In-process cache of the sanitized exercise catalogue (portal.firebase_utils.exercise_cache)
+PORTAL_EXERCISE_CACHE_TTL = 300  # seconds
+PORTAL_EXERCISE_CACHE_MAX_ENTRIES = 5000
+
+# Rendered exercise card fragments kept in memory (portal.fragments.card_fragments)
+PORTAL_FRAGMENT_CACHE_MAX_ENTRIES = 2000
+
+# Editor field updates are merged per exercise for this many seconds before being written, 0 disables
+PORTAL_WRITE_COALESCE_WINDOW = 2.0
+
+# Keep the exercise catalogue current through a Firestore snapshot listener started with the
+# worker (portal.catalogue_sync), instead of re-reading it when the cache TTL expires
+PORTAL_CATALOGUE_SYNC = os.environ.get("PORTAL_CATALOGUE_SYNC", "1") == "1"
+PORTAL_CATALOGUE_SYNC_TIMEOUT = 30.0  # seconds to wait for the initial snapshot at startup
+PORTAL_CATALOGUE_SYNC_RETRY = 30.0  # seconds before restarting a stopped listener
+
+# Exercise delta sync (/portal/exercises/changes/): deletes leave tombstones in
+# exerciseTombstones for this many days (enable a Firestore TTL policy on its expire_at
+# field to remove them), and change cursors overlap by this many seconds to cover clock
+# skew between workers
+PORTAL_TOMBSTONE_RETENTION_DAYS = 30
+PORTAL_CHANGES_OVERLAP = 5.0
+
+# Users page training summaries (portal.training_analytics) older than this many seconds
+# fold in new routines_progress documents when read
+PORTAL_TRAINING_SUMMARY_TTL = 900
+
+# Exercise added_count (portal.counters): increments are spread over this many shard
+# documents per exercise and summed in memory for this many seconds before being written
+# (0 writes each one); manage.py rollup_added_counts moves the shards into added_count
+PORTAL_ADDED_COUNT_SHARDS = 10
+PORTAL_ADDED_COUNT_WINDOW = 5.0
+
+# Reload a stale exercise catalogue from the compressed catalogue snapshot in the bucket
+# plus the changes made since (portal.snapshots) instead of reading every exercise
+PORTAL_CATALOGUE_SNAPSHOT_COLD_LOAD = os.environ.get("PORTAL_CATALOGUE_SNAPSHOT_COLD_LOAD", "") == "1"
+
+# Serve the portal with the async views (portal.async_views), meant for ASGI deployments
+PORTAL_ASYNC_VIEWS = os.environ.get("PORTAL_ASYNC_VIEWS", "") == "1"
+
+# Per-request Firestore/Storage metrics (portal.middleware): requests slower than this are
+# logged at WARNING and the others at INFO, shown with PORTAL_REQUEST_LOG_LEVEL=INFO; this
+# fraction of requests is profiled with cProfile (0 disables); profiles of slow requests
+# are logged and, with PORTAL_PROFILE_DIR set, dumped there as .prof
+PORTAL_SLOW_REQUEST_MS = 1000
+PORTAL_REQUEST_LOG_LEVEL = os.environ.get("PORTAL_REQUEST_LOG_LEVEL", "WARNING")
+PORTAL_PROFILE_SAMPLE_RATE = float(os.environ.get("PORTAL_PROFILE_SAMPLE_RATE", "0"))
+PORTAL_PROFILE_DIR = os.environ.get("PORTAL_PROFILE_DIR") or None
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
@@ -53,6 +100,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "portal.middleware.firestore_metrics_middleware",
+    # Compresses responses, streamed ones included. ConditionalGetMiddleware answers
+    # If-None-Match with a 304, hashing the body of responses without an ETag of their own
+    "django.middleware.gzip.GZipMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -113,6 +165,19 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "portal": {"handlers": ["console"], "level": "INFO"},
+        "portal.requests": {"level": PORTAL_REQUEST_LOG_LEVEL},
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PortalConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "portal"
+
+    def ready(self):
+        # Connects the search and completeness indexes, the card fragment cache and the
+        # catalogue snapshot to the exercise write signals
+        from . import completeness, fragments, search, snapshots  # noqa: F401
@@ -0,0 +1,275 @@
+"""
+Async flavour of the portal views, enabled with the PORTAL_ASYNC_VIEWS setting.
+
+The list, update, create, upload and delete views await Firestore through AsyncClient and
+Storage through the I/O pool (portal.firebase_async), so under ASGI a worker keeps serving
+other requests while these wait on Google APIs. Views without Firestore round trips of
+their own are shared with portal.views.
+"""
+
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.views.decorators.csrf import csrf_exempt
+from urllib.parse import urlencode
+
+from .firebase_async import (
+    adelete_exercise,
+    adelete_exercises,
+    aget_exercise_changes,
+    aget_exercises,
+    aget_exercises_by_ids,
+    aget_exercises_page,
+    aget_users_page,
+    ainsert_exercise,
+    aupdate_exercise,
+    run_io,
+)
+from .conditional import catalogue_condition, catalogue_page_condition, exercise_condition
+from .counters import DEFAULT_RANKING_SIZE, most_added
+from .firebase_utils import catalogue_changes_cursor, exercise_write_buffer
+from .fragments import card_fragments
+from .image_pipeline import astore_exercise_image
+from .search import exercise_search_index
+from .snapshots import catalogue_snapshot
+from .training_analytics import aget_training_summaries
+from .views import (  # noqa: F401 (shared with the sync URLconf)
+    CARD_CONTENT_TEMPLATE,
+    CARD_TEMPLATE,
+    _buffered_result,
+    _exercises_page_parts,
+    _changes_response,
+    _changes_since,
+    _changes_version,
+    _page_params,
+    _search_params,
+    batch_update,
+    bulk_create,
+    completeness_report_csv,
+    exercise_added,
+    exercise_cache_stats,
+    exercise_completeness,
+    exercise_search,
+    export_exercises,
+    flush_writes,
+    import_exercises_view,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def users_view(request):
+    page = await aget_users_page(**_page_params(request))
+    summaries = await aget_training_summaries([user["id"] for user in page["items"]])
+    for user in page["items"]:
+        user["training"] = summaries[user["id"]]
+    return render(request, "portal/users.html", {"users": page["items"], "page": page})
+
+@catalogue_page_condition
+async def exercises_view(request):
+    changes_since = catalogue_changes_cursor()
+    query, filters = _search_params(request)
+    # Loading the catalogue here keeps the index build below from doing a blocking read
+    await aget_exercises()
+    search = await sync_to_async(exercise_search_index.search, thread_sensitive=False)(query, filters)
+    ids = search["ids"] if query or filters else None
+
+    page = await aget_exercises_page(**_page_params(request), ids=ids, shape="summary")
+    filter_query = urlencode({"q": query, **filters}) if query or filters else ""
+    head, tail = _exercises_page_parts(request, {
+        "exercises": page["items"],
+        "page": page,
+        "search": {"q": query, **filters, "total": search["total"], "facets": search["facets"]},
+        "filter_query": filter_query,
+        "changes_since": _changes_version(changes_since),
+    })
+
+    async def chunks():
+        yield head
+        for exercise in page["items"]:
+            yield card_fragments.render_exercise(CARD_TEMPLATE, exercise)
+        yield tail
+
+    return StreamingHttpResponse(chunks(), content_type="text/html; charset=utf-8")
+
+@exercise_condition
+async def exercise_detail(request, ex_id):
+    version, html = card_fragments.lookup(CARD_CONTENT_TEMPLATE, ex_id)
+    if html is None:
+        exercises = await aget_exercises_by_ids([ex_id])
+        if not exercises:
+            raise Http404("Exercise not found")
+        html = render_to_string(CARD_CONTENT_TEMPLATE, {"ex": exercises[0]})
+        card_fragments.store(CARD_CONTENT_TEMPLATE, ex_id, version, html)
+    return HttpResponse(html)
+
+async def exercise_changes(request):
+    try:
+        since = _changes_since(request)
+    except ValueError:
+        return JsonResponse({"success": False, "error": "since must be a version or an ISO 8601 timestamp"}, status=400)
+    return _changes_response(await aget_exercise_changes(since))
+
+@catalogue_condition
+async def catalogue_snapshot_manifest(request):
+    return JsonResponse({"success": True, **await run_io(catalogue_snapshot.manifest)})
+
+async def most_added_exercises(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_RANKING_SIZE))
+    except ValueError:
+        limit = DEFAULT_RANKING_SIZE
+    return JsonResponse({"success": True, "items": await run_io(most_added, limit)})
+
+async def update_exercise_type(request, ex_id):
+    if request.method == "POST":
+        try:
+            await aupdate_exercise(ex_id, {"type": request.POST.get("exercise_type")})
+            return JsonResponse({"success": True})
+        except Exception as e:
+            return JsonResponse({"success": False, "error": str(e)})
+    return JsonResponse({"success": False})
+
+async def update_video_url(request, ex_id):
+    if request.method == "POST":
+        try:
+            await aupdate_exercise(ex_id, {"video_url": request.POST.get("video_url")})
+            return JsonResponse({"success": True})
+        except Exception as e:
+            return JsonResponse({"success": False, "error": str(e)})
+    return JsonResponse({"success": False})
+
+async def delete_exercise_view(request, ex_id):
+    if request.method == "POST":
+        try:
+            await adelete_exercise(ex_id)
+            return JsonResponse({"success": True})
+        except Exception as e:
+            logger.exception("Error deleting exercise %s", ex_id)
+            return JsonResponse({"success": False, "error": str(e)})
+    return JsonResponse({"success": False})
+
+async def bulk_delete(request):
+    """
+    Deletes many exercises and their images: {"exercise_ids": [...]}
+    """
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body.decode('utf-8'))
+            ex_ids = data.get("exercise_ids") or []
+            if not ex_ids:
+                return JsonResponse({"success": False, "error": "No exercise IDs provided"})
+            result = await adelete_exercises(ex_ids)
+            return JsonResponse({"success": True, **result})
+        except Exception as e:
+            logger.exception("Error in bulk delete")
+            return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({"success": False, "error": "Invalid method"})
+
+@csrf_exempt
+async def upload_exercise_image(request):
+    if request.method == "POST":
+        exercise_name = request.POST.get("exercise_name")
+        image_type = request.POST.get("image_type")  # "1" or "2"
+        image_file = request.FILES.get("image")
+
+        if not exercise_name or not image_type or not image_file:
+            return JsonResponse({"success": False, "error": "Missing fields"})
+
+        try:
+            result = await astore_exercise_image(exercise_name, image_type, image_file)
+            return JsonResponse({
+                "success": True,
+                "newImageUrl": result["image_url"],
+                "thumbnailUrl": result["thumbnail_url"],
+            })
+        except ValueError as e:
+            return JsonResponse({"success": False, "error": str(e)})
+        except Exception as e:
+            logger.exception("Error uploading image for %s", exercise_name)
+            return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({"success": False, "error": "Invalid method"})
+
+@csrf_exempt
+async def create_exercise(request):
+    """
+    Creates a new exercise in the database with all fields
+    """
+    if request.method == "POST":
+        from google.api_core.exceptions import AlreadyExists
+
+        try:
+            if request.content_type == 'application/json':
+                data = json.loads(request.body.decode('utf-8'))
+            else:
+                data = {
+                    'id': request.POST.get("id", "").strip(),
+                    'name_en': request.POST.get("name", "").strip(),
+                    'type': request.POST.get("type", "weight_reps"),
+                    'video_url': request.POST.get("video_url", "")
+                }
+
+            exercise_id = str(data.get('id') or "").strip()
+            if not exercise_id:
+                return JsonResponse({"success": False, "error": "Exercise ID is required"})
+
+            await ainsert_exercise(exercise_id, data)
+            return JsonResponse({"success": True, "id": exercise_id})
+        except AlreadyExists:
+            return JsonResponse({"success": False, "error": f"Exercise {exercise_id} already exists"}, status=409)
+        except Exception as e:
+            logger.exception("Error creating exercise")
+            return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({"success": False, "error": "Invalid method"})
+
+async def _save_fields(ex_id, data):
+    """
+    Saves editor field updates through the write buffer when coalescing is enabled.
+    """
+    if exercise_write_buffer.enabled:
+        # submit() can trigger a synchronous flush once the buffer is full
+        result = await sync_to_async(exercise_write_buffer.submit, thread_sensitive=False)(ex_id, data)
+        return _buffered_result(ex_id, result)
+    await aupdate_exercise(ex_id, data)
+    return {"success": True}
+
+@csrf_exempt
+async def update_field(request, ex_id):
+    """
+    Updates a single field in the exercise document
+    """
+    if request.method == "POST":
+        try:
+            if request.content_type == 'application/json':
+                data = json.loads(request.body.decode('utf-8'))
+            else:
+                field = next(iter(request.POST))
+                data = {field: request.POST.get(field)}
+            return JsonResponse(await _save_fields(ex_id, data))
+        except Exception as e:
+            logger.exception("Error updating field of %s", ex_id)
+            return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({"success": False, "error": "Invalid method"})
+
+@csrf_exempt
+async def update_array(request, ex_id):
+    """
+    Updates an array field in the exercise document (muscles, instructions)
+    """
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body.decode('utf-8'))
+            return JsonResponse(await _save_fields(ex_id, data))
+        except Exception as e:
+            logger.exception("Error updating array field of %s", ex_id)
+            return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({"success": False, "error": "Invalid method"})
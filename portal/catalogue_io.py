@@ -0,0 +1,307 @@
+"""
+Streaming export and import of the exercise catalogue as JSON Lines or CSV.
+
+Exports page through exerciseData with cursors (or read the cached catalogue when it is
+fresh) and yield one encoded line at a time, so memory stays flat however large the
+catalogue is. Imports read records lazily, sanitize them with sanitize_exercise_payload
+and write them in batches of FIRESTORE_BATCH_LIMIT, with up to ``concurrency`` batches
+in flight on the I/O pool.
+
+Imports report ``committed_through``, the last input line up to which every record has
+been written. Passing it back as ``resume_after`` skips those records, and since imports
+only set documents, replaying a few records after a failure is harmless.
+
+In CSV, array fields are JSON arrays and the header row names the fields.
+"""
+
+import csv
+import io
+import json
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .firebase_clients import get_db
+from .firebase_utils import (
+    EXERCISE_FIELD_SPECS,
+    FIRESTORE_BATCH_LIMIT,
+    UPDATED_AT,
+    _exercise_from_doc,
+    _io_executor,
+    _now,
+    exercise_cache,
+    exercise_write_buffer,
+    sanitize_exercise_payload,
+)
+from .completeness import completeness_index
+from .fragments import card_fragments
+from .instrumentation import bind_context, document_size
+from .search import exercise_search_index
+
+FORMATS = ("jsonl", "csv")
+CONTENT_TYPES = {"jsonl": "application/x-ndjson", "csv": "text/csv"}
+CSV_FIELDS = list(EXERCISE_FIELD_SPECS) + [UPDATED_AT]
+ARRAY_FIELDS = frozenset(field for field, spec in EXERCISE_FIELD_SPECS.items() if spec["type"] == "array")
+
+EXPORT_PAGE_SIZE = 1000
+IMPORT_CONCURRENCY = 8
+# Firestore's document size limit, minus room for the document name
+MAX_DOCUMENT_BYTES = 1_048_487
+# Errors beyond this many are counted but not listed in the report
+MAX_REPORTED_ERRORS = 100
+
+
+def format_for(filename: str, default: str = "jsonl") -> str:
+    """Guesses the format from a file name: .csv is CSV, anything else JSON Lines."""
+    return "csv" if filename.lower().endswith(".csv") else default
+
+
+# Export
+
+
+def iter_exercises(page_size: int = EXPORT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yields every sanitized exercise ordered by ID, one Firestore page in memory at a time."""
+    cached = exercise_cache.get_catalogue()
+    if cached is not None:
+        yield from cached
+        return
+
+    query = get_db().collection("exerciseData").order_by("__name__")
+    last_id = None
+    while True:
+        page = query.start_after({"__name__": last_id}) if last_id else query
+        docs = list(page.limit(page_size).stream())
+        for doc in docs:
+            yield _exercise_from_doc(doc)
+        if len(docs) < page_size:
+            return
+        last_id = docs[-1].id
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def export_lines(exercises: Iterable[Dict[str, Any]], file_format: str = "jsonl") -> Iterator[str]:
+    """Encodes exercises as lines of JSON Lines or CSV (header first)."""
+    if file_format == "jsonl":
+        for exercise in exercises:
+            yield json.dumps(exercise, ensure_ascii=False, default=_json_default) + "\n"
+        return
+    if file_format != "csv":
+        raise ValueError(f"Unknown format: {file_format}")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(row: List[Any]) -> str:
+        writer.writerow(row)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line(CSV_FIELDS)
+    for exercise in exercises:
+        row = []
+        for field in CSV_FIELDS:
+            value = exercise.get(field, "")
+            if field in ARRAY_FIELDS:
+                value = json.dumps(value or [], ensure_ascii=False)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            row.append(value)
+        yield line(row)
+
+
+# Import
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_records(lines: Iterable[str], file_format: str = "jsonl") -> Iterator[Tuple[int, Any]]:
+    """
+    Yields ``(line number, record dict)`` from an iterable of text lines. Records that
+    cannot be decoded are yielded as InvalidRecord instances instead of a dict.
+    """
+    if file_format == "jsonl":
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, InvalidRecord(f"Invalid JSON: {e}")
+                continue
+            yield number, record if isinstance(record, dict) else InvalidRecord("Record is not a JSON object")
+        return
+    if file_format != "csv":
+        raise ValueError(f"Unknown format: {file_format}")
+
+    reader = csv.DictReader(lines)
+    for row in reader:
+        number = reader.line_num
+        if None in row:
+            yield number, InvalidRecord("Row has more cells than the header")
+            continue
+        record = {}
+        try:
+            for field, value in row.items():
+                if field in ARRAY_FIELDS and value and value.lstrip().startswith("["):
+                    value = json.loads(value)
+                record[field] = value
+        except ValueError as e:
+            yield number, InvalidRecord(f"Invalid JSON array in {field}: {e}")
+            continue
+        yield number, record
+
+
+def _validate(record: Dict[str, Any], merge: bool) -> Tuple[str, Dict[str, Any]]:
+    ex_id = str(record.get("id") or "").strip()
+    if not ex_id:
+        raise InvalidRecord("Missing id")
+    if "/" in ex_id or ex_id in (".", "..") or (ex_id.startswith("__") and ex_id.endswith("__")):
+        raise InvalidRecord(f"Invalid document ID: {ex_id!r}")
+
+    if merge:
+        # Empty cells/values leave the stored field unchanged
+        record = {field: value for field, value in record.items() if value != ""}
+    data = sanitize_exercise_payload(record, apply_defaults=not merge, include_unknown=False)
+    data["id"] = ex_id
+    if document_size(data) > MAX_DOCUMENT_BYTES:
+        raise InvalidRecord("Document exceeds the 1 MiB Firestore limit")
+    return ex_id, data
+
+
+def _commit_sets(batch_items: List[Tuple[str, Dict[str, Any]]], merge: bool) -> None:
+    db = get_db()
+    collection = db.collection("exerciseData")
+    batch = db.batch()
+    stamp = _now()
+    for ex_id, data in batch_items:
+        batch.set(collection.document(ex_id), {**data, UPDATED_AT: stamp}, merge=merge)
+    batch.commit()
+
+
+def import_exercises(
+    records: Iterable[Tuple[int, Any]],
+    *,
+    dry_run: bool = False,
+    merge: bool = False,
+    resume_after: int = 0,
+    batch_size: int = FIRESTORE_BATCH_LIMIT,
+    concurrency: int = IMPORT_CONCURRENCY,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Validates and writes ``(line, record)`` pairs from read_records().
+
+    Records replace whole documents (defaults applied), or with ``merge`` only set the
+    non-empty fields they contain. Invalid records are skipped and reported. ``dry_run`` only
+    validates. ``on_progress(line)`` is called whenever ``committed_through`` advances.
+    After a failed batch no further batches are started, and the report names the
+    failure; re-run with ``resume_after=committed_through``.
+    """
+    started = time.perf_counter()
+    batch_size = max(1, min(int(batch_size), FIRESTORE_BATCH_LIMIT))
+    report: Dict[str, Any] = {
+        "dry_run": dry_run,
+        "records": 0,
+        "valid": 0,
+        "written": 0,
+        "skipped": 0,
+        "invalid": 0,
+        "errors": [],
+        "duplicates": 0,
+        "ignored_fields": Counter(),
+        "committed_through": resume_after,
+        "failed": None,
+    }
+    known_fields = frozenset(EXERCISE_FIELD_SPECS) | {UPDATED_AT}
+    seen = set()
+    in_flight: "deque[Tuple[int, int, List[str], Any]]" = deque()
+    batch: List[Tuple[str, Dict[str, Any]]] = []
+    batch_first = None
+    last_line = resume_after
+
+    def settle(wait_all: bool) -> None:
+        # Batches are settled oldest first, so committed_through only covers written lines
+        while in_flight and (wait_all or len(in_flight) >= concurrency or in_flight[0][3].done()):
+            first, last, ex_ids, future = in_flight.popleft()
+            try:
+                future.result()
+            except Exception as e:
+                if report["failed"] is None:
+                    report["failed"] = {"lines": [first, last], "error": str(e)}
+                continue
+            report["written"] += len(ex_ids)
+            if report["failed"] is None:
+                advance(last)
+
+    def advance(line: int) -> None:
+        report["committed_through"] = line
+        if on_progress is not None:
+            on_progress(line)
+
+    def submit(last: int) -> None:
+        nonlocal batch, batch_first
+        if batch and not dry_run:
+            for ex_id, _ in batch:
+                # A later flush of pending editor updates would overwrite the imported values
+                exercise_write_buffer.discard(ex_id)
+            future = _io_executor.submit(bind_context(_commit_sets, batch, merge))
+            in_flight.append((batch_first, last, [ex_id for ex_id, _ in batch], future))
+            settle(wait_all=False)
+        batch, batch_first = [], None
+
+    for number, record in records:
+        if report["failed"] is not None:
+            break
+        if number <= resume_after:
+            report["skipped"] += 1
+            continue
+        report["records"] += 1
+        last_line = number
+        try:
+            if isinstance(record, InvalidRecord):
+                raise record
+            ex_id, data = _validate(record, merge)
+        except InvalidRecord as e:
+            report["invalid"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": number, "id": record.get("id") if isinstance(record, dict) else None, "error": str(e)})
+            continue
+
+        report["valid"] += 1
+        report["ignored_fields"].update(field for field in record if field not in known_fields)
+        if ex_id in seen:
+            report["duplicates"] += 1
+        seen.add(ex_id)
+
+        if batch_first is None:
+            batch_first = number
+        batch.append((ex_id, data))
+        if len(batch) >= batch_size:
+            submit(number)
+
+    submit(last_line)
+    settle(wait_all=True)
+
+    if report["failed"] is None and not dry_run and last_line > report["committed_through"]:
+        # Trailing invalid records are done with too
+        advance(last_line)
+    if report["written"]:
+        # One reload on the next read instead of applying every imported record
+        exercise_cache.invalidate()
+        exercise_search_index.invalidate()
+        completeness_index.invalidate()
+        card_fragments.invalidate()
+
+    report["ignored_fields"] = dict(report["ignored_fields"])
+    report["elapsed"] = round(time.perf_counter() - started, 3)
+    return report
@@ -0,0 +1,162 @@
+"""
+Keeps exercise_cache in step with the exerciseData collection through a snapshot listener.
+
+The listener's first snapshot is the one full read of the catalogue. After that Firestore
+only sends the documents that were added, modified or removed, which are sanitized and
+applied to the cache as they arrive, so reads scale with edits instead of page views.
+While the listener is live the cached catalogue never expires, and get_exercises() and
+the other catalogue reads (sync and async) are memory lookups. Changes made by other
+workers or tools reach the search index through the usual portal.signals.
+
+If the listener stops, the cache falls back to its TTL and the listener is restarted
+after ``retry_interval`` seconds.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from .firebase_clients import get_db
+from .firebase_utils import _exercise_from_doc, exercise_cache, sanitize_many
+from .signals import exercise_catalogue_loaded, exercise_deleted, exercise_saved
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogueSync:
+    def __init__(self, cache, collection: str = "exerciseData", retry_interval: float = 30.0):
+        self.cache = cache
+        self.collection = collection
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._watch = None
+        # Bumped per listener, so late callbacks of a stopped one are ignored
+        self._generation = 0
+        self._ready = threading.Event()
+        self._restart_timer: Optional[threading.Timer] = None
+        self._last_event: Optional[float] = None
+        self._stats = {"snapshots": 0, "added": 0, "modified": 0, "removed": 0, "unchanged": 0, "restarts": 0}
+
+    @property
+    def version(self) -> int:
+        """Version of the local catalogue, bumped by every change applied to it."""
+        return self.cache.version
+
+    def start(self, timeout: Optional[float] = None) -> bool:
+        """
+        Starts the listener unless it is running and waits up to ``timeout`` seconds for
+        the initial snapshot. Returns whether the catalogue is loaded.
+        """
+        with self._lock:
+            if self._watch is None:
+                self._generation += 1
+                self._ready.clear()
+                generation = self._generation
+                self.cache.set_live_source(self.is_live)
+                self._watch = get_db().collection(self.collection).on_snapshot(
+                    lambda documents, changes, read_time: self._on_snapshot(generation, documents, changes)
+                )
+        return self._ready.wait(timeout)
+
+    def stop(self) -> None:
+        with self._lock:
+            watch, self._watch = self._watch, None
+            self._generation += 1
+            self._ready.clear()
+            if self._restart_timer is not None:
+                self._restart_timer.cancel()
+                self._restart_timer = None
+            self.cache.set_live_source(None)
+        if watch is not None:
+            watch.unsubscribe()
+
+    def is_live(self) -> bool:
+        watch = self._watch
+        if watch is None or not self._ready.is_set():
+            return False
+        if watch.is_active:
+            return True
+        self._listener_stopped(watch)
+        return False
+
+    def _listener_stopped(self, watch) -> None:
+        with self._lock:
+            if self._watch is not watch:
+                return
+            logger.warning("Exercise catalogue listener stopped, restarting in %ss", self.retry_interval)
+            self._watch = None
+            self._generation += 1
+            self._ready.clear()
+            self._stats["restarts"] += 1
+            self._restart_timer = threading.Timer(self.retry_interval, self.start)
+            self._restart_timer.daemon = True
+            self._restart_timer.start()
+
+    def _on_snapshot(self, generation: int, documents, changes) -> None:
+        if generation != self._generation:
+            return
+        try:
+            if not self._ready.is_set():
+                self._load(documents)
+            else:
+                self._apply(changes)
+        except Exception:
+            # Raising would stop the listener's thread without a trace
+            logger.exception("Error applying exercise catalogue changes")
+            return
+        self._last_event = time.monotonic()
+        self._stats["snapshots"] += 1
+
+    def _load(self, documents) -> None:
+        exercises = sanitize_many((doc.to_dict() or {} for doc in documents), apply_defaults=True, include_unknown=True)
+        for doc, exercise_data in zip(documents, exercises):
+            exercise_data["id"] = doc.id
+        self.cache.load_catalogue(exercises)
+        self._ready.set()
+        exercise_catalogue_loaded.send(sender=self, exercises=exercises)
+
+    def _apply(self, changes) -> None:
+        for change in changes:
+            kind = change.type.name
+            ex_id = change.document.id
+            if kind == "REMOVED":
+                changed = self.cache.remove(ex_id)
+                if changed:
+                    exercise_deleted.send(sender=self, ex_id=ex_id)
+            else:
+                exercise = _exercise_from_doc(change.document)
+                # Changes written by this process are already applied by the write paths
+                changed = self.cache.put(exercise)
+                if changed:
+                    exercise_saved.send(sender=self, ex_id=ex_id, fields=exercise, created=True)
+            self._stats[kind.lower() if changed else "unchanged"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "live": self.is_live(),
+            "version": self.version,
+            "last_event_age": None if self._last_event is None else time.monotonic() - self._last_event,
+        }
+
+
+catalogue_sync = CatalogueSync(
+    exercise_cache,
+    retry_interval=getattr(settings, "PORTAL_CATALOGUE_SYNC_RETRY", 30.0),
+)
+# Registered after firebase_clients.shutdown, so it runs before it
+atexit.register(catalogue_sync.stop)
+
+
+def start_catalogue_sync() -> bool:
+    """Starts catalogue_sync when the PORTAL_CATALOGUE_SYNC setting is on (see forma/wsgi.py)."""
+    if not getattr(settings, "PORTAL_CATALOGUE_SYNC", False):
+        return False
+    loaded = catalogue_sync.start(timeout=getattr(settings, "PORTAL_CATALOGUE_SYNC_TIMEOUT", 30.0))
+    if not loaded:
+        logger.warning("Exercise catalogue listener has not delivered its first snapshot yet")
+    return loaded
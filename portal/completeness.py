@@ -0,0 +1,181 @@
+"""
+Per-exercise completeness scores for content QA.
+
+Every field of EXERCISE_FIELD_SPECS except the SCORE_EXCLUDED ones counts towards the
+score (the percentage of them that are filled in). An exercise is complete when none of
+REQUIRED_FIELDS is missing, matching the status dots of the editor cards. Scores are
+computed when an exercise is written and kept in completeness_index, which follows the
+portal.signals write signals like the search index, so reports never rescan documents.
+"""
+
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+from django.dispatch import receiver
+
+from .firebase_utils import EXERCISE_FIELD_SPECS, exercise_cache, get_exercises
+from .signals import exercise_catalogue_loaded, exercise_deleted, exercise_saved
+
+SCORE_EXCLUDED = frozenset({"id", "type", "added_count", "image_1_thumb", "image_2_thumb"})
+SCORED_FIELDS = tuple(field for field in EXERCISE_FIELD_SPECS if field not in SCORE_EXCLUDED)
+REQUIRED_FIELDS = ("image_1", "primaryMuscles_en", "instructions_en")
+NAME_FIELDS = ("name_en", "name_ar")
+
+
+def _is_filled(value: Any) -> bool:
+    if isinstance(value, str):
+        return bool(value.strip())
+    if isinstance(value, (list, tuple)):
+        return any(_is_filled(item) for item in value)
+    return value is not None
+
+
+def missing_fields(exercise: Dict[str, Any], fields: Iterable[str] = SCORED_FIELDS) -> FrozenSet[str]:
+    return frozenset(field for field in fields if not _is_filled(exercise.get(field)))
+
+
+def score(missing: FrozenSet[str]) -> int:
+    return round(100 * (len(SCORED_FIELDS) - len(missing)) / len(SCORED_FIELDS))
+
+
+class CompletenessIndex:
+    """
+    Thread-safe ``{ex_id: entry}`` of missing fields and scores. Partial updates only
+    re-check the fields they contain; like the search index it is rebuilt from
+    get_exercises() once older than ``ttl``, which picks up writes made elsewhere.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._built_at: Optional[float] = None
+
+    def _entry(self, ex_id: str, missing: FrozenSet[str], names: Dict[str, str]) -> Dict[str, Any]:
+        return {
+            "id": ex_id,
+            **names,
+            "score": score(missing),
+            "complete": not missing.intersection(REQUIRED_FIELDS),
+            "missing": missing,
+        }
+
+    def rebuild(self, exercises: Iterable[Dict[str, Any]]) -> None:
+        entries = {
+            exercise["id"]: self._entry(
+                exercise["id"], missing_fields(exercise), {field: exercise.get(field, "") for field in NAME_FIELDS}
+            )
+            for exercise in exercises
+        }
+        with self._lock:
+            self._entries = entries
+            self._built_at = time.monotonic()
+
+    def update(self, ex_id: str, fields: Dict[str, Any], replace: bool = False) -> None:
+        with self._lock:
+            if self._built_at is None:
+                return
+            current = None if replace else self._entries.get(ex_id)
+            if current is None:
+                missing = missing_fields(fields)
+                names = {field: fields.get(field, "") for field in NAME_FIELDS}
+            else:
+                changed = [field for field in SCORED_FIELDS if field in fields]
+                missing = (current["missing"] - frozenset(changed)) | missing_fields(fields, changed)
+                names = {field: fields.get(field, current[field]) for field in NAME_FIELDS}
+            self._entries[ex_id] = self._entry(ex_id, missing, names)
+
+    def remove(self, ex_id: str) -> None:
+        with self._lock:
+            self._entries.pop(ex_id, None)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def _is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at >= self.ttl
+
+    def ensure_built(self) -> None:
+        if self._is_stale():
+            # get_exercises() sends exercise_catalogue_loaded when it hits Firestore
+            exercises = get_exercises()
+            if self._is_stale():
+                self.rebuild(exercises)
+
+    def get(self, ex_id: str) -> Optional[Dict[str, Any]]:
+        self.ensure_built()
+        with self._lock:
+            return self._entries.get(ex_id)
+
+    def report(self, missing: Optional[str] = None, complete: Optional[bool] = None, max_score: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Returns the entries (sorted by ID) matching every given filter, with a summary
+        over them: totals, average score and how often each field is missing.
+        """
+        self.ensure_built()
+        with self._lock:
+            entries = list(self._entries.values())
+
+        if missing is not None:
+            entries = [entry for entry in entries if missing in entry["missing"]]
+        if complete is not None:
+            entries = [entry for entry in entries if entry["complete"] == complete]
+        if max_score is not None:
+            entries = [entry for entry in entries if entry["score"] <= max_score]
+        entries.sort(key=lambda entry: entry["id"])
+
+        missing_counts = Counter(field for entry in entries for field in entry["missing"])
+        complete_count = sum(entry["complete"] for entry in entries)
+        return {
+            "items": entries,
+            "summary": {
+                "total": len(entries),
+                "complete": complete_count,
+                "percent_complete": round(100 * complete_count / len(entries)) if entries else 0,
+                "average_score": round(sum(entry["score"] for entry in entries) / len(entries), 1) if entries else 0,
+                "missing_counts": {field: missing_counts[field] for field in SCORED_FIELDS if missing_counts[field]},
+            },
+        }
+
+
+def serialize_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON form of an index entry, with the missing fields in EXERCISE_FIELD_SPECS order."""
+    return {**entry, "missing": [field for field in SCORED_FIELDS if field in entry["missing"]]}
+
+
+REPORT_CSV_HEADER = [
+    "Exercise Name", "Exercise ID", "Score", "Complete",
+    "Missing Primary Image", "Missing Primary Muscles", "Missing Instructions", "Missing Fields",
+]
+
+
+def report_rows(entries: Iterable[Dict[str, Any]]) -> Iterable[List[Any]]:
+    """CSV rows of the completeness report, REPORT_CSV_HEADER first."""
+    yield REPORT_CSV_HEADER
+    for entry in entries:
+        yield [
+            entry["name_en"] or entry["name_ar"], entry["id"], entry["score"], "Yes" if entry["complete"] else "No",
+            *("Yes" if field in entry["missing"] else "No" for field in REQUIRED_FIELDS),
+            " ".join(field for field in SCORED_FIELDS if field in entry["missing"]),
+        ]
+
+
+completeness_index = CompletenessIndex(ttl=exercise_cache.ttl)
+
+
+@receiver(exercise_catalogue_loaded)
+def _rebuild_on_catalogue_load(sender, exercises, **kwargs):
+    completeness_index.rebuild(exercises)
+
+
+@receiver(exercise_saved)
+def _score_saved_exercise(sender, ex_id, fields, created, **kwargs):
+    completeness_index.update(ex_id, fields, replace=created)
+
+
+@receiver(exercise_deleted)
+def _unscore_deleted_exercise(sender, ex_id, **kwargs):
+    completeness_index.remove(ex_id)
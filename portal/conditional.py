@@ -0,0 +1,113 @@
+"""
+Conditional GET for the views serving the exercise catalogue.
+
+Their ETags are derived from exercise_cache.fingerprint(), a digest of the cached
+catalogue's content, so a request whose If-None-Match still matches is answered with a
+304 by django.views.decorators.http.condition before the view reads Firestore or renders
+a template. A stale catalogue is reloaded first (the views would read it anyway), unless
+it is too large to be cached, in which case no ETag is sent.
+
+The ETags also cover the portal's code and templates (a deploy changes every ETag) and
+the query string; those of HTML pages, which embed a CSRF token, also cover the CSRF
+cookie.
+"""
+
+import hashlib
+from functools import wraps
+from pathlib import Path
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+from .firebase_async import aget_exercises
+from .firebase_utils import exercise_cache, get_exercises
+
+PORTAL_DIR = Path(__file__).resolve().parent
+
+
+def _release_digest() -> bytes:
+    digest = hashlib.blake2b(digest_size=8)
+    for path in sorted([*PORTAL_DIR.glob("**/*.py"), *PORTAL_DIR.glob("templates/**/*.html")]):
+        digest.update(path.relative_to(PORTAL_DIR).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.digest()
+
+
+RELEASE_DIGEST = _release_digest()
+
+
+def _etag(request, fingerprint: Optional[str], *parts: str) -> Optional[str]:
+    if fingerprint is None:
+        return None
+    digest = hashlib.blake2b(RELEASE_DIGEST, digest_size=12)
+    for part in (
+        fingerprint,
+        request.path,
+        *(f"{key}={value}" for key, values in sorted(request.GET.lists()) for value in values),
+        *parts,
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def catalogue_etag(request, *args, **kwargs) -> Optional[str]:
+    """ETag of a response derived from the whole catalogue."""
+    return _etag(request, exercise_cache.fingerprint())
+
+
+def _csrf_secret(request) -> str:
+    # get_token() also makes a first visit set the cookie the page's ETag is computed with
+    get_token(request)
+    return request.META["CSRF_COOKIE"]
+
+
+def catalogue_page_etag(request, *args, **kwargs) -> Optional[str]:
+    """catalogue_etag() of an HTML page embedding a CSRF token."""
+    return _etag(request, exercise_cache.fingerprint(), _csrf_secret(request))
+
+
+def exercise_etag(request, ex_id: str, *args, **kwargs) -> Optional[str]:
+    """ETag of a response derived from the exercise ``ex_id`` only."""
+    return _etag(request, exercise_cache.fingerprint(ex_id))
+
+
+def _needs_catalogue(request) -> bool:
+    return (
+        request.method in ("GET", "HEAD")
+        and exercise_cache.fingerprint() is None
+        and exercise_cache.can_hold_catalogue()
+    )
+
+
+def _catalogue_condition(etag_func):
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                if _needs_catalogue(request):
+                    await aget_exercises()
+                return await conditional_view(request, *args, **kwargs)
+
+        else:
+
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                if _needs_catalogue(request):
+                    get_exercises()
+                return conditional_view(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+catalogue_condition = _catalogue_condition(catalogue_etag)
+catalogue_page_condition = _catalogue_condition(catalogue_page_etag)
+# Exercises that are not cached get no ETag
+exercise_condition = condition(etag_func=exercise_etag)
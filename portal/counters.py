@@ -0,0 +1,188 @@
+"""
+Sharded counter behind the exercises' added_count.
+
+Additions are counted in SHARD_COUNT shard documents per exercise,
+exerciseData/{id}/addedCountShards/{0..SHARD_COUNT-1}, with atomic Increment writes to a
+random shard, so a popular exercise spreads its writes over many documents instead of
+one. AddedCountBuffer sums the additions recorded in this process for ``window`` seconds
+and writes one Increment per exercise, all exercises in the same batches.
+
+roll_up_added_counts() (``manage.py rollup_added_counts``, run periodically) moves the
+shard totals into added_count: for every exercise with non-zero shards, one atomic batch
+increments added_count by what the shards held and decrements each shard by what was
+read. Additions landing meanwhile stay in the shards for the next roll-up, and a value
+set in the editor stays the base the shards add to. Run one roll-up at a time.
+
+Finding the shards to roll up is a collection group query on ``count > 0``, which needs
+a collection group single-field index on addedCountShards.count.
+"""
+
+import atexit
+import logging
+import random
+import threading
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from .firebase_clients import get_db
+from .firebase_utils import FIRESTORE_BATCH_LIMIT, UPDATED_AT, _exercise_updated, _now
+
+logger = logging.getLogger(__name__)
+
+SHARDS_COLLECTION = "addedCountShards"
+SHARD_COUNT = getattr(settings, "PORTAL_ADDED_COUNT_SHARDS", 10)
+DEFAULT_RANKING_SIZE = 20
+MAX_RANKING_SIZE = 100
+RANKING_FIELDS = ("name_en", "name_ar", "category_en", "image_1_thumb", "added_count")
+
+
+def _shard(db, ex_id: str, shard: int):
+    return db.collection("exerciseData").document(ex_id).collection(SHARDS_COLLECTION).document(str(shard))
+
+
+class AddedCountBuffer:
+    """
+    Sums added_count increments per exercise before they reach the shards. With a
+    ``window`` of 0 every record() is written straight away.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pending: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._stats = {"recorded": 0, "shard_writes": 0, "commits": 0, "failures": 0}
+
+    def record(self, ex_id: str, count: int = 1) -> None:
+        with self._lock:
+            self._pending[ex_id] = self._pending.get(ex_id, 0) + count
+            self._stats["recorded"] += count
+            flush_now = self.window <= 0 or len(self._pending) >= FIRESTORE_BATCH_LIMIT
+            if not flush_now and self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            self.flush()
+
+    def flush(self) -> Dict[str, int]:
+        """Writes the pending increments and reports how many exercises and additions."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return {"exercises": 0, "added": 0}
+
+        from google.cloud.firestore_v1.transforms import Increment
+
+        db = get_db()
+        items = list(pending.items())
+        written = 0
+        for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+            chunk = items[start:start + FIRESTORE_BATCH_LIMIT]
+            batch = db.batch()
+            for ex_id, count in chunk:
+                batch.set(_shard(db, ex_id, random.randrange(SHARD_COUNT)), {"count": Increment(count)}, merge=True)
+            try:
+                batch.commit()
+            except Exception:
+                logger.exception("Error writing added_count increments")
+                with self._lock:
+                    self._stats["failures"] += 1
+                    # Kept for the next flush rather than lost
+                    for ex_id, count in chunk:
+                        self._pending[ex_id] = self._pending.get(ex_id, 0) + count
+                continue
+            written += sum(count for _, count in chunk)
+            with self._lock:
+                self._stats["shard_writes"] += len(chunk)
+                self._stats["commits"] += 1
+        return {"exercises": len(pending), "added": written}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "window": self.window, "pending_exercises": len(self._pending)}
+
+
+added_count_buffer = AddedCountBuffer(window=getattr(settings, "PORTAL_ADDED_COUNT_WINDOW", 5.0))
+atexit.register(added_count_buffer.flush)
+
+
+def record_exercise_added(ex_id: str, count: int = 1) -> None:
+    """Counts ``count`` additions of the exercise to a routine."""
+    added_count_buffer.record(ex_id, count)
+
+
+def roll_up_added_counts() -> Dict[str, int]:
+    """
+    Moves the shard totals into the exercises' added_count. Reports the exercises updated,
+    the additions moved and the shards deleted because their exercise no longer exists.
+    """
+    from google.cloud.firestore_v1.base_query import FieldFilter
+    from google.cloud.firestore_v1.transforms import Increment
+
+    db = get_db()
+    collection = db.collection("exerciseData")
+    shards: Dict[str, List[Any]] = {}
+    for doc in db.collection_group(SHARDS_COLLECTION).where(filter=FieldFilter("count", ">", 0)).stream():
+        shards.setdefault(doc.reference.parent.parent.id, []).append(doc)
+    if not shards:
+        return {"exercises": 0, "added": 0, "orphaned_shards": 0}
+
+    references = [collection.document(ex_id) for ex_id in shards]
+    existing = {doc.id for doc in db.get_all(references, field_paths=[UPDATED_AT]) if doc.exists}
+
+    report = {"exercises": 0, "added": 0, "orphaned_shards": 0}
+    stamp = _now()
+    rolled: List[str] = []
+    batch, operations = db.batch(), 0
+    for ex_id, docs in shards.items():
+        # An exercise's writes never span two batches
+        if operations + len(docs) + 1 > FIRESTORE_BATCH_LIMIT:
+            batch.commit()
+            batch, operations = db.batch(), 0
+        if ex_id not in existing:
+            for doc in docs:
+                batch.delete(doc.reference)
+            operations += len(docs)
+            report["orphaned_shards"] += len(docs)
+            continue
+        total = sum(doc.get("count") for doc in docs)
+        batch.update(collection.document(ex_id), {"added_count": Increment(total), UPDATED_AT: stamp})
+        for doc in docs:
+            batch.update(doc.reference, {"count": Increment(-doc.get("count"))})
+        operations += len(docs) + 1
+        rolled.append(ex_id)
+        report["exercises"] += 1
+        report["added"] += total
+    if operations:
+        batch.commit()
+
+    if rolled:
+        # Increments leave the new values unknown until read back
+        for doc in db.get_all([collection.document(ex_id) for ex_id in rolled], field_paths=["added_count"]):
+            if doc.exists:
+                _exercise_updated(doc.id, {"added_count": doc.get("added_count"), UPDATED_AT: stamp})
+    return report
+
+
+def most_added(limit: int = DEFAULT_RANKING_SIZE) -> List[Dict[str, Any]]:
+    """
+    The exercises with the highest rolled-up added_count, ranked by a Firestore query that
+    reads only ``limit`` documents.
+    """
+    limit = max(1, min(int(limit), MAX_RANKING_SIZE))
+    query = (
+        get_db().collection("exerciseData")
+        .order_by("added_count", direction="DESCENDING")
+        .limit(limit)
+        .select(RANKING_FIELDS)
+    )
+    ranking = []
+    for doc in query.stream():
+        data = doc.to_dict() or {}
+        ranking.append({"id": doc.id, **{field: data.get(field, "") for field in RANKING_FIELDS}, "added_count": data.get("added_count", 0)})
+    return ranking
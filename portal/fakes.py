@@ -0,0 +1,809 @@
+"""
+In-memory stand-ins for the Firestore and Storage clients the portal uses, for tests and
+benchmarks that must not touch the production project.
+
+FakeFirestore implements the slice of google.cloud.firestore.Client the portal calls
+(collections, documents, subcollections, collection groups, queries with cursors, batched
+writes, Increment transforms, get_all, collection snapshot listeners) and FakeBucket the slice of google.cloud.storage.Bucket (blobs, prefix
+listings). Every call that would be a network round trip is counted in ``rpcs`` and can
+be slowed down with ``latency`` seconds, so benchmarks see realistic call costs. Inject
+them with ``firebase_clients.override(firestore=..., bucket=..., async_firestore=...)``.
+"""
+
+import asyncio
+import copy
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1.transforms import Increment
+
+
+def _document_id(path: str) -> str:
+    return path.rsplit("/", 1)[-1]
+
+
+def _apply_transforms(current: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of ``data`` with Increment values resolved against the ``current`` fields."""
+    resolved = copy.deepcopy(data)
+    for field, value in data.items():
+        if isinstance(value, Increment):
+            resolved[field] = (current.get(field) or 0) + value.value
+    return resolved
+
+
+def _parent_path(path: str) -> str:
+    return path.rsplit("/", 1)[0]
+
+
+class _LatencyMixin:
+    """Counts round trips per method and sleeps ``latency`` seconds for each of them."""
+
+    def _init_stats(self, latency: float, per_document_latency: float = 0.0) -> None:
+        self.latency = latency
+        self.per_document_latency = per_document_latency
+        self.rpcs: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _rpc(self, method: str, documents: int = 0) -> float:
+        with self._stats_lock:
+            self.rpcs[method] += 1
+        return self.latency + documents * self.per_document_latency
+
+    def _call(self, method: str, documents: int = 0) -> None:
+        delay = self._rpc(method, documents)
+        if delay:
+            time.sleep(delay)
+
+    async def _acall(self, method: str, documents: int = 0) -> None:
+        delay = self._rpc(method, documents)
+        if delay:
+            await asyncio.sleep(delay)
+
+    @property
+    def rpc_count(self) -> int:
+        return sum(self.rpcs.values())
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self.rpcs.clear()
+
+
+class FakeDocumentSnapshot:
+    """Snapshots share the stored dict, which writes replace rather than mutate."""
+
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path: str) -> Any:
+        value = self._data
+        for part in field_path.split("."):
+            if not isinstance(value, dict) or part not in value:
+                raise KeyError(field_path)
+            value = value[part]
+        return copy.deepcopy(value)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeFirestore", path: str):
+        self._client = client
+        self.path = path
+        self.id = _document_id(path)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FakeDocumentReference) and other.path == self.path
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    @property
+    def parent(self) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._client, _parent_path(self.path))
+
+    def collection(self, collection_id: str) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def get(self, field_paths: Optional[Iterable[str]] = None) -> FakeDocumentSnapshot:
+        self._client._call("get")
+        return self._client._snapshot(self.path, field_paths)
+
+    def set(self, document_data: Dict[str, Any], merge: bool = False) -> None:
+        self._client._call("set")
+        self._client._write([("set", self.path, document_data, merge)])
+
+    def create(self, document_data: Dict[str, Any]) -> None:
+        self._client._call("create")
+        self._client._write([("create", self.path, document_data, False)])
+
+    def update(self, field_updates: Dict[str, Any]) -> None:
+        self._client._call("update")
+        self._client._write([("update", self.path, field_updates, False)])
+
+    def delete(self) -> None:
+        self._client._call("delete")
+        self._client._write([("delete", self.path, None, False)])
+
+
+class FakeQuery:
+    """Immutable query over one collection (or a collection group); builders return copies."""
+
+    _OPERATORS = {
+        "==": lambda value, operand: value == operand,
+        "!=": lambda value, operand: value != operand,
+        "<": lambda value, operand: value < operand,
+        "<=": lambda value, operand: value <= operand,
+        ">": lambda value, operand: value > operand,
+        ">=": lambda value, operand: value >= operand,
+        "in": lambda value, operand: value in operand,
+        "not-in": lambda value, operand: value not in operand,
+        "array_contains": lambda value, operand: isinstance(value, list) and operand in value,
+        "array_contains_any": lambda value, operand: isinstance(value, list) and any(item in value for item in operand),
+    }
+
+    def __init__(self, client: "FakeFirestore", path: str, all_descendants: bool = False):
+        self._client = client
+        self._path = path
+        self._all_descendants = all_descendants
+        self._filters: Tuple[Tuple[str, str, Any], ...] = ()
+        self._orders: Tuple[Tuple[str, str], ...] = ()
+        self._start_after: Optional[Any] = None
+        self._limit: Optional[int] = None
+        self._select: Optional[Tuple[str, ...]] = None
+
+    def _copy(self, **changes) -> "FakeQuery":
+        query = copy.copy(self)
+        query.__class__ = FakeQuery
+        for name, value in changes.items():
+            setattr(query, f"_{name}", value)
+        return query
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value: Any = None, *, filter=None) -> "FakeQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in self._OPERATORS:
+            raise ValueError(f"Unsupported operator: {op_string}")
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING") -> "FakeQuery":
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def start_after(self, document_fields_or_snapshot) -> "FakeQuery":
+        return self._copy(start_after=document_fields_or_snapshot)
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(limit=count)
+
+    def select(self, field_paths: Iterable[str]) -> "FakeQuery":
+        return self._copy(select=tuple(field_paths))
+
+    def _name(self, path: str) -> str:
+        # Collection-group results are ordered by full path, collection results by ID
+        return path if self._all_descendants else _document_id(path)
+
+    def _value(self, path: str, data: Dict[str, Any], field_path: str) -> Any:
+        if field_path == "__name__":
+            return self._name(path)
+        value: Any = data
+        for part in field_path.split("."):
+            if not isinstance(value, dict) or part not in value:
+                raise KeyError(field_path)
+            value = value[part]
+        return value
+
+    def _sort_key(self, path: str, data: Dict[str, Any]) -> Tuple:
+        return tuple(self._value(path, data, field) for field, _ in self._orders)
+
+    def _matching_paths(self) -> List[Tuple[str, Dict[str, Any]]]:
+        results = []
+        for path, data in self._client._documents_in(self._path, self._all_descendants):
+            try:
+                if not all(self._OPERATORS[op](self._value(path, data, field), operand) for field, op, operand in self._filters):
+                    continue
+                # Documents without an ordered field are left out, as in Firestore
+                self._sort_key(path, data)
+            except (KeyError, TypeError):
+                continue
+            results.append((path, data))
+        return results
+
+    def _cursor_values(self) -> Tuple:
+        cursor = self._start_after
+        if isinstance(cursor, FakeDocumentSnapshot):
+            return tuple(self._value(cursor.reference.path, cursor._data or {}, field) for field, _ in self._orders)
+        return tuple(cursor[field] for field, _ in self._orders)
+
+    def _run(self) -> List[FakeDocumentSnapshot]:
+        orders = self._orders if any(field == "__name__" for field, _ in self._orders) else self._orders + (("__name__", "ASCENDING"),)
+        query = self._copy(orders=orders)
+        results = query._matching_paths()
+        for index in reversed(range(len(orders))):
+            field, direction = orders[index]
+            results.sort(key=lambda item: query._value(item[0], item[1], field), reverse=direction == "DESCENDING")
+
+        if self._start_after is not None:
+            cursor = self._cursor_values()
+
+            def after_cursor(item) -> bool:
+                for (field, direction), cursor_value in zip(self._orders, cursor):
+                    value = self._value(item[0], item[1], field)
+                    if value != cursor_value:
+                        return value < cursor_value if direction == "DESCENDING" else value > cursor_value
+                return False
+
+            results = [item for item in results if after_cursor(item)]
+
+        if self._limit is not None:
+            results = results[:self._limit]
+
+        snapshots = []
+        for path, data in results:
+            if self._select is not None:
+                data = {field: data[field] for field in self._select if field in data}
+            snapshots.append(FakeDocumentSnapshot(FakeDocumentReference(self._client, path), data))
+        return snapshots
+
+    def stream(self) -> Iterator[FakeDocumentSnapshot]:
+        with self._client._lock:
+            snapshots = self._run()
+        self._client._call("stream", documents=len(snapshots))
+        return iter(snapshots)
+
+    def get(self) -> List[FakeDocumentSnapshot]:
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client: "FakeFirestore", path: str):
+        super().__init__(client, path)
+        self.id = _document_id(path)
+
+    @property
+    def parent(self) -> Optional[FakeDocumentReference]:
+        if "/" not in self._path:
+            return None
+        return FakeDocumentReference(self._client, _parent_path(self._path))
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, f"{self._path}/{document_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, document_data: Dict[str, Any]) -> Tuple[None, FakeDocumentReference]:
+        reference = self.document()
+        reference.create(document_data)
+        return None, reference
+
+    def on_snapshot(self, callback) -> "FakeWatch":
+        """
+        Calls ``callback(documents, changes, read_time)`` with the whole collection now and
+        with the changed documents after every write to it, like Firestore's Watch.
+        """
+        self._client._call("listen")
+        return FakeWatch(self._client, self._path, callback)
+
+
+class ChangeType(Enum):
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class FakeDocumentChange:
+    def __init__(self, type: ChangeType, document: FakeDocumentSnapshot):
+        self.type = type
+        self.document = document
+
+
+class FakeWatch:
+    """
+    Collection listener. Callbacks run synchronously in the writing thread, while the
+    write still holds the client lock, so they see writes in commit order.
+    """
+
+    def __init__(self, client: "FakeFirestore", path: str, callback):
+        self._client = client
+        self._path = path
+        self._callback = callback
+        # Documents delivered to the callback, each billed as a read by Firestore
+        self.documents = 0
+        with client._lock:
+            client._listeners.setdefault(path, []).append(self)
+            snapshots = [client._snapshot(document_path) for document_path in sorted(client._collections.get(path, ()))]
+            self._push(snapshots, [FakeDocumentChange(ChangeType.ADDED, snapshot) for snapshot in snapshots])
+
+    @property
+    def is_active(self) -> bool:
+        return self._callback is not None
+
+    def _push(self, snapshots: List[FakeDocumentSnapshot], changes: List[FakeDocumentChange]) -> None:
+        self.documents += len(changes)
+        self._callback(snapshots, changes, datetime.now(timezone.utc))
+
+    def _notify(self, changes: List[FakeDocumentChange]) -> None:
+        snapshots = [self._client._snapshot(path) for path in sorted(self._client._collections.get(self._path, ()))]
+        self._push(snapshots, changes)
+
+    def unsubscribe(self) -> None:
+        with self._client._lock:
+            listeners = self._client._listeners.get(self._path, [])
+            if self in listeners:
+                listeners.remove(self)
+            self._callback = None
+
+    close = unsubscribe
+
+
+class FakeWriteBatch:
+    """Queues writes and applies them atomically in one commit round trip."""
+
+    def __init__(self, client: "FakeFirestore"):
+        self._client = client
+        self._writes: List[Tuple[str, str, Any, bool]] = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def set(self, reference: FakeDocumentReference, document_data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append(("set", reference.path, document_data, merge))
+
+    def create(self, reference: FakeDocumentReference, document_data: Dict[str, Any]) -> None:
+        self._writes.append(("create", reference.path, document_data, False))
+
+    def update(self, reference: FakeDocumentReference, field_updates: Dict[str, Any]) -> None:
+        self._writes.append(("update", reference.path, field_updates, False))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._writes.append(("delete", reference.path, None, False))
+
+    def commit(self) -> None:
+        if len(self._writes) > FakeFirestore.MAX_BATCH_WRITES:
+            raise ValueError(f"A batch can contain at most {FakeFirestore.MAX_BATCH_WRITES} writes")
+        self._client._call("commit")
+        self._client._write(self._writes)
+        self._writes = []
+
+
+class FakeFirestore(_LatencyMixin):
+    """
+    In-memory google.cloud.firestore.Client stand-in.
+
+    ``latency`` is added to every round trip and ``per_document_latency`` to each document
+    a stream returns.
+    """
+
+    MAX_BATCH_WRITES = 500
+
+    def __init__(self, latency: float = 0.0, per_document_latency: float = 0.0):
+        self._init_stats(latency, per_document_latency)
+        self._lock = threading.RLock()
+        # {collection path: {document path: data}}, stored dicts are never mutated in place
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._listeners: Dict[str, List[FakeWatch]] = {}
+
+    # Client surface
+
+    def collection(self, collection_id: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, collection_id)
+
+    def collection_group(self, collection_id: str) -> FakeQuery:
+        return FakeQuery(self, collection_id, all_descendants=True)
+
+    def document(self, document_path: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self, document_path)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def get_all(self, references: Iterable[FakeDocumentReference], field_paths: Optional[Iterable[str]] = None) -> Iterator[FakeDocumentSnapshot]:
+        references = list(references)
+        self._call("get_all", documents=len(references))
+        with self._lock:
+            return iter([self._snapshot(reference.path, field_paths) for reference in references])
+
+    def close(self) -> None:
+        pass
+
+    def async_client(self) -> "FakeAsyncFirestore":
+        """An AsyncClient stand-in over the same documents and stats."""
+        return FakeAsyncFirestore(self)
+
+    # Direct access for seeding and assertions, no round trips counted
+
+    def put(self, path: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._collections.setdefault(_parent_path(path), {})[path] = copy.deepcopy(data)
+
+    def data(self, path: str) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._stored(path))
+
+    def paths(self, collection_path: Optional[str] = None) -> List[str]:
+        with self._lock:
+            if collection_path is None:
+                return sorted(path for documents in self._collections.values() for path in documents)
+            return sorted(self._collections.get(collection_path, ()))
+
+    # Storage engine
+
+    def _stored(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._collections.get(_parent_path(path), {}).get(path)
+
+    def _documents_in(self, path: str, all_descendants: bool) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            if all_descendants:
+                return [
+                    item for collection_path, documents in self._collections.items()
+                    if _document_id(collection_path) == path for item in documents.items()
+                ]
+            return list(self._collections.get(path, {}).items())
+
+    def _snapshot(self, path: str, field_paths: Optional[Iterable[str]] = None) -> FakeDocumentSnapshot:
+        data = self._stored(path)
+        if data is not None and field_paths is not None:
+            data = {field: data[field] for field in field_paths if field in data}
+        return FakeDocumentSnapshot(FakeDocumentReference(self, path), data)
+
+    def _write(self, writes: List[Tuple[str, str, Any, bool]]) -> None:
+        """Validates then applies all ``writes`` atomically."""
+        with self._lock:
+            exists = {path: self._stored(path) is not None for _, path, _, _ in writes}
+            for operation, path, _, _ in writes:
+                if operation == "update" and not exists[path]:
+                    raise NotFound(f"No document to update: {path}")
+                if operation == "create" and exists[path]:
+                    raise AlreadyExists(f"Document already exists: {path}")
+                exists[path] = operation != "delete"
+
+            before = {path: self._stored(path) for _, path, _, _ in writes}
+            for operation, path, data, merge in writes:
+                documents = self._collections.setdefault(_parent_path(path), {})
+                if operation == "delete":
+                    documents.pop(path, None)
+                elif operation == "update" or merge:
+                    current = documents.get(path, {})
+                    documents[path] = {**current, **_apply_transforms(current, data)}
+                else:
+                    documents[path] = _apply_transforms({}, data)
+
+            if self._listeners:
+                self._notify_listeners(before)
+
+    def _notify_listeners(self, before: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        changes: Dict[str, List[FakeDocumentChange]] = {}
+        for path, old in before.items():
+            if _parent_path(path) not in self._listeners:
+                continue
+            new = self._stored(path)
+            if new == old:
+                continue
+            if new is None:
+                change = FakeDocumentChange(ChangeType.REMOVED, FakeDocumentSnapshot(FakeDocumentReference(self, path), old))
+            else:
+                change = FakeDocumentChange(ChangeType.ADDED if old is None else ChangeType.MODIFIED, self._snapshot(path))
+            changes.setdefault(_parent_path(path), []).append(change)
+        for collection_path, collection_changes in changes.items():
+            for watch in list(self._listeners[collection_path]):
+                watch._notify(collection_changes)
+
+
+# Async (firestore.AsyncClient) surface over the same engine
+
+
+class FakeAsyncDocumentReference:
+    def __init__(self, reference: FakeDocumentReference):
+        self._reference = reference
+        self._client = reference._client
+        self.path = reference.path
+        self.id = reference.id
+
+    @property
+    def parent(self) -> "FakeAsyncCollectionReference":
+        return FakeAsyncCollectionReference(self._reference.parent)
+
+    def collection(self, collection_id: str) -> "FakeAsyncCollectionReference":
+        return FakeAsyncCollectionReference(self._reference.collection(collection_id))
+
+    async def get(self, field_paths: Optional[Iterable[str]] = None) -> FakeDocumentSnapshot:
+        await self._client._acall("get")
+        return self._client._snapshot(self.path, field_paths)
+
+    async def set(self, document_data: Dict[str, Any], merge: bool = False) -> None:
+        await self._client._acall("set")
+        self._client._write([("set", self.path, document_data, merge)])
+
+    async def create(self, document_data: Dict[str, Any]) -> None:
+        await self._client._acall("create")
+        self._client._write([("create", self.path, document_data, False)])
+
+    async def update(self, field_updates: Dict[str, Any]) -> None:
+        await self._client._acall("update")
+        self._client._write([("update", self.path, field_updates, False)])
+
+    async def delete(self) -> None:
+        await self._client._acall("delete")
+        self._client._write([("delete", self.path, None, False)])
+
+
+class FakeAsyncQuery:
+    def __init__(self, query: FakeQuery):
+        self._query = query
+        self._client = query._client
+
+    def where(self, *args, **kwargs) -> "FakeAsyncQuery":
+        return FakeAsyncQuery(self._query.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs) -> "FakeAsyncQuery":
+        return FakeAsyncQuery(self._query.order_by(*args, **kwargs))
+
+    def start_after(self, *args, **kwargs) -> "FakeAsyncQuery":
+        return FakeAsyncQuery(self._query.start_after(*args, **kwargs))
+
+    def limit(self, *args, **kwargs) -> "FakeAsyncQuery":
+        return FakeAsyncQuery(self._query.limit(*args, **kwargs))
+
+    def select(self, *args, **kwargs) -> "FakeAsyncQuery":
+        return FakeAsyncQuery(self._query.select(*args, **kwargs))
+
+    async def stream(self):
+        with self._client._lock:
+            snapshots = self._query._run()
+        await self._client._acall("stream", documents=len(snapshots))
+        for snapshot in snapshots:
+            yield snapshot
+
+    async def get(self) -> List[FakeDocumentSnapshot]:
+        return [snapshot async for snapshot in self.stream()]
+
+
+class FakeAsyncCollectionReference(FakeAsyncQuery):
+    def __init__(self, collection: FakeCollectionReference):
+        super().__init__(collection)
+        self.id = collection.id
+
+    def document(self, document_id: Optional[str] = None) -> FakeAsyncDocumentReference:
+        return FakeAsyncDocumentReference(self._query.document(document_id))
+
+
+class FakeAsyncWriteBatch(FakeWriteBatch):
+    async def commit(self) -> None:
+        if len(self._writes) > FakeFirestore.MAX_BATCH_WRITES:
+            raise ValueError(f"A batch can contain at most {FakeFirestore.MAX_BATCH_WRITES} writes")
+        await self._client._acall("commit")
+        self._client._write(self._writes)
+        self._writes = []
+
+
+class FakeAsyncFirestore:
+    """firestore.AsyncClient stand-in sharing the documents and stats of a FakeFirestore."""
+
+    def __init__(self, client: FakeFirestore):
+        self._client = client
+
+    def collection(self, collection_id: str) -> FakeAsyncCollectionReference:
+        return FakeAsyncCollectionReference(self._client.collection(collection_id))
+
+    def collection_group(self, collection_id: str) -> FakeAsyncQuery:
+        return FakeAsyncQuery(self._client.collection_group(collection_id))
+
+    def document(self, document_path: str) -> FakeAsyncDocumentReference:
+        return FakeAsyncDocumentReference(self._client.document(document_path))
+
+    def batch(self) -> FakeAsyncWriteBatch:
+        return FakeAsyncWriteBatch(self._client)
+
+    async def get_all(self, references, field_paths: Optional[Iterable[str]] = None):
+        references = list(references)
+        await self._client._acall("get_all", documents=len(references))
+        for reference in references:
+            yield self._client._snapshot(reference.path, field_paths)
+
+    def close(self) -> None:
+        pass
+
+
+# Storage
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.content_type: Optional[str] = None
+        self.cache_control: Optional[str] = None
+        self.metadata: Optional[Dict[str, str]] = None
+        self.size: Optional[int] = None
+        self.updated: Optional[datetime] = None
+
+    @property
+    def public_url(self) -> str:
+        return f"https://storage.googleapis.com/{self.bucket.name}/{quote(self.name)}"
+
+    def _load(self, stored: Dict[str, Any]) -> "FakeBlob":
+        self.content_type = stored["content_type"]
+        self.cache_control = stored["cache_control"]
+        self.metadata = dict(stored["metadata"]) if stored["metadata"] else None
+        self.size = len(stored["data"])
+        self.updated = stored["updated"]
+        return self
+
+    def upload_from_file(self, file_obj, rewind: bool = False, content_type: Optional[str] = None, predefined_acl: Optional[str] = None, **kwargs) -> None:
+        if rewind:
+            file_obj.seek(0)
+        self.upload_from_string(file_obj.read(), content_type=content_type, predefined_acl=predefined_acl)
+
+    def upload_from_string(self, data, content_type: Optional[str] = None, predefined_acl: Optional[str] = None, **kwargs) -> None:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.bucket._call("upload")
+        stored = {
+            "data": bytes(data),
+            "content_type": content_type or self.content_type or "application/octet-stream",
+            "cache_control": self.cache_control,
+            "metadata": self.metadata,
+            "public": predefined_acl == "publicRead",
+            "updated": datetime.now(timezone.utc),
+        }
+        with self.bucket._lock:
+            self.bucket._blobs[self.name] = stored
+        self._load(stored)
+
+    def download_as_bytes(self, **kwargs) -> bytes:
+        self.bucket._call("download")
+        return self.bucket._stored(self.name)["data"]
+
+    def exists(self, **kwargs) -> bool:
+        self.bucket._call("exists")
+        with self.bucket._lock:
+            return self.name in self.bucket._blobs
+
+    def reload(self, **kwargs) -> None:
+        self.bucket._call("reload")
+        self._load(self.bucket._stored(self.name))
+
+    def patch(self, **kwargs) -> None:
+        self.bucket._call("patch")
+        with self.bucket._lock:
+            stored = self.bucket._stored(self.name)
+            stored.update(cache_control=self.cache_control, metadata=self.metadata, content_type=self.content_type or stored["content_type"])
+
+    def make_public(self, **kwargs) -> None:
+        self.bucket._call("make_public")
+        with self.bucket._lock:
+            self.bucket._stored(self.name)["public"] = True
+
+    def delete(self, **kwargs) -> None:
+        self.bucket._call("delete")
+        with self.bucket._lock:
+            if self.bucket._blobs.pop(self.name, None) is None:
+                raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+
+
+class FakeBucket(_LatencyMixin):
+    """In-memory google.cloud.storage.Bucket stand-in."""
+
+    def __init__(self, name: str = "fake-bucket", latency: float = 0.0):
+        self._init_stats(latency)
+        self.name = name
+        self._lock = threading.RLock()
+        self._blobs: Dict[str, Dict[str, Any]] = {}
+
+    def blob(self, blob_name: str) -> FakeBlob:
+        return FakeBlob(self, blob_name)
+
+    def get_blob(self, blob_name: str) -> Optional[FakeBlob]:
+        self._call("get_blob")
+        with self._lock:
+            stored = self._blobs.get(blob_name)
+            return FakeBlob(self, blob_name)._load(stored) if stored is not None else None
+
+    def list_blobs(self, prefix: Optional[str] = None, **kwargs) -> List[FakeBlob]:
+        self._call("list_blobs")
+        with self._lock:
+            return [
+                FakeBlob(self, name)._load(stored) for name, stored in sorted(self._blobs.items())
+                if prefix is None or name.startswith(prefix)
+            ]
+
+    def put(self, name: str, data: bytes, content_type: str = "application/octet-stream", public: bool = True) -> None:
+        """Stores a blob directly, no round trip counted."""
+        with self._lock:
+            self._blobs[name] = {
+                "data": bytes(data), "content_type": content_type, "cache_control": None, "metadata": None, "public": public,
+                "updated": datetime.now(timezone.utc),
+            }
+
+    def names(self, prefix: str = "") -> List[str]:
+        """Stored blob names, no round trip counted."""
+        with self._lock:
+            return sorted(name for name in self._blobs if name.startswith(prefix))
+
+    def _stored(self, name: str) -> Dict[str, Any]:
+        with self._lock:
+            stored = self._blobs.get(name)
+        if stored is None:
+            raise NotFound(f"No such object: {self.name}/{name}")
+        return stored
+
+
+def seed_portal_data(firestore: FakeFirestore, bucket: Optional[FakeBucket] = None, users: int = 50, exercises: int = 200, routines_per_user: int = 3, progress_per_user: int = 10, seed: int = 0) -> None:
+    """Fills the fakes with users (with routines/routines_progress) and exercises with images."""
+    rng = random.Random(seed)
+    types = ("weight_reps", "bodyweight_reps", "duration", "distance")
+    categories = ("Chest", "Back", "Legs", "Shoulders", "Arms", "Core")
+    equipment = ("Barbell", "Dumbbell", "Machine", "Cable", "Bodyweight")
+    muscles = ("Pectorals", "Lats", "Quadriceps", "Hamstrings", "Deltoids", "Biceps", "Triceps", "Abs")
+
+    for index in range(exercises):
+        ex_id = f"exercise_{index:05d}"
+        data = {
+            "name_en": f"{rng.choice(equipment)} {rng.choice(categories)} Exercise {index}",
+            "name_ar": f"تمرين {index}",
+            "type": rng.choice(types),
+            "category_en": rng.choice(categories),
+            "equipment_en": rng.choice(equipment),
+            "primaryMuscles_en": rng.sample(muscles, 2),
+            "instructions_en": [f"Step {step}" for step in range(1, rng.randint(2, 6))],
+            "added_count": rng.randint(0, 500),
+        }
+        if bucket is not None:
+            for image_type in ("1", "2"):
+                blob = bucket.blob(f"exercise_images/{ex_id}/{image_type}.jpg")
+                bucket.put(blob.name, bytes(64), content_type="image/jpeg")
+                data[f"image_{image_type}"] = blob.public_url
+        firestore.put(f"exerciseData/{ex_id}", data)
+
+    for index in range(users):
+        user_id = f"user_{index:05d}"
+        firestore.put(f"users/{user_id}", {
+            "full_name": f"User {index}",
+            "email": f"user{index}@example.com",
+            "gender": rng.choice(("male", "female")),
+            "goal": rng.choice(("strength", "hypertrophy", "fat_loss")),
+            "image": "",
+        })
+        routine_ids = [f"routine_{routine}" for routine in range(routines_per_user)]
+        for routine_id in routine_ids:
+            firestore.put(f"users/{user_id}/routines/{routine_id}", {
+                "title": f"Routine {routine_id}",
+                "category": rng.choice(categories),
+                "duration": rng.randint(20, 90),
+                "image_url": "",
+                "user_exercises": [
+                    {
+                        "title": f"exercise_{rng.randrange(max(exercises, 1)):05d}",
+                        "type": rng.choice(types),
+                        "notes": "",
+                        "sets": [
+                            {"number_of_set": number, "reps": rng.randint(5, 12), "weight": rng.randint(10, 120)}
+                            for number in range(1, 4)
+                        ],
+                    }
+                    for _ in range(5)
+                ],
+            })
+        for progress in range(progress_per_user):
+            firestore.put(f"users/{user_id}/routines_progress/progress_{progress:04d}", {
+                "routine_id": rng.choice(routine_ids) if routine_ids else "",
+                "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "completed_sets": [
+                    {
+                        "number_of_set": number,
+                        "reps": rng.randint(5, 12),
+                        "weight": rng.randint(10, 120),
+                        "prev_reps": rng.randint(5, 12),
+                        "prev_weight": rng.randint(10, 120),
+                    }
+                    for number in range(1, rng.randint(4, 12))
+                ],
+            })
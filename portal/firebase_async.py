@@ -0,0 +1,286 @@
+"""
+Async counterparts of the firebase_utils read/write helpers, for the ASGI views.
+
+Firestore is reached through the AsyncClient of firebase_clients; Storage has no async
+client, so its calls run on firebase_utils' I/O pool and are awaited together with the
+Firestore work. The exercise cache, the write buffer and the write signals are shared
+with the sync helpers, so both view flavours stay consistent within one process.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .firebase_clients import get_async_db, get_bucket
+from .firebase_utils import (
+    DEFAULT_PAGE_SIZE,
+    DELETE_BATCH_LIMIT,
+    EXERCISE_SHAPES,
+    MAX_PAGE_SIZE,
+    TOMBSTONE_COLLECTION,
+    TOMBSTONE_RETENTION,
+    UPDATED_AT,
+    USER_FETCH_CONCURRENCY,
+    USER_PAGE_SUBCOLLECTIONS,
+    ExerciseSummary,
+    _changes_query,
+    _check_shape,
+    _chunked,
+    _delete_blob,
+    _exercise_deleted,
+    _exercise_saved,
+    _exercise_updated,
+    _io_executor,
+    _list_exercise_blobs,
+    _merge_changes,
+    _new_exercise,
+    _now,
+    _sanitize_update,
+    _stamped,
+    _summary_from_doc,
+    _tombstone,
+    catalogue_changes_cursor,
+    changes_cursor,
+    exercise_cache,
+    exercise_write_buffer,
+    paginate_sorted,
+    sanitize_exercise_payload,
+    sanitize_many,
+)
+from .instrumentation import bind_context
+from .signals import exercise_catalogue_loaded
+
+
+def run_io(func, *args, **kwargs) -> "asyncio.Future":
+    """Runs a blocking (Storage) call on the shared I/O pool and returns an awaitable."""
+    return asyncio.get_running_loop().run_in_executor(_io_executor, bind_context(func, *args, **kwargs))
+
+
+async def _fetch_page(query, page_size: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, before: Optional[str] = None) -> Dict[str, Any]:
+    """Async firebase_utils._fetch_page."""
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+    if before:
+        query = query.order_by("__name__", direction="DESCENDING")
+        query = query.start_after({"__name__": before})
+    else:
+        query = query.order_by("__name__")
+        if after:
+            query = query.start_after({"__name__": after})
+
+    docs = [doc async for doc in query.limit(page_size + 1).stream()]
+    has_more = len(docs) > page_size
+    docs = docs[:page_size]
+
+    if before:
+        docs.reverse()
+        prev_cursor = docs[0].id if has_more and docs else None
+        next_cursor = docs[-1].id if docs else None
+    else:
+        prev_cursor = docs[0].id if after and docs else None
+        next_cursor = docs[-1].id if has_more else None
+
+    return {
+        "docs": docs,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+
+
+async def aget_users_page(page_size: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, before: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Retrieves one page of users with their routines; the subcollection streams of
+    all users on the page run concurrently, at most USER_FETCH_CONCURRENCY at a time.
+    """
+    db = get_async_db()
+    page = await _fetch_page(db.collection("users"), page_size, after=after, before=before)
+    docs = page.pop("docs")
+    semaphore = asyncio.Semaphore(USER_FETCH_CONCURRENCY)
+
+    async def load(user_id: str, name: str) -> List[Dict[str, Any]]:
+        async with semaphore:
+            stream = db.collection("users").document(user_id).collection(name).stream()
+            return [{**doc.to_dict(), "id": doc.id} async for doc in stream]
+
+    pairs = [(doc.id, name) for doc in docs for name in USER_PAGE_SUBCOLLECTIONS]
+    results = await asyncio.gather(*(load(user_id, name) for user_id, name in pairs))
+    subcollections = dict(zip(pairs, results))
+
+    users = []
+    for doc in docs:
+        user_data = doc.to_dict()
+        user_data["id"] = doc.id
+        for name in USER_PAGE_SUBCOLLECTIONS:
+            user_data[name] = subcollections[doc.id, name]
+        users.append(user_data)
+
+    page["items"] = users
+    return page
+
+
+def _exercise_from_doc(doc) -> Dict[str, Any]:
+    exercise_data = sanitize_exercise_payload(doc.to_dict() or {}, apply_defaults=True, include_unknown=True)
+    exercise_data["id"] = doc.id
+    return exercise_data
+
+
+async def aget_exercises() -> List[Dict[str, Any]]:
+    """Async get_exercises(), served from exercise_cache while the catalogue is fresh."""
+    exercises = exercise_cache.get_catalogue()
+    if exercises is not None:
+        return exercises
+
+    since = changes_cursor()
+    docs = [doc async for doc in get_async_db().collection("exerciseData").stream()]
+    exercises = sanitize_many((doc.to_dict() or {} for doc in docs), apply_defaults=True, include_unknown=True)
+    for doc, exercise_data in zip(docs, exercises):
+        exercise_data["id"] = doc.id
+    exercise_cache.load_catalogue(exercises, since)
+    exercise_catalogue_loaded.send(sender=None, exercises=exercises)
+    return exercises
+
+
+async def aget_exercise_summaries() -> List[ExerciseSummary]:
+    """Async get_exercise_summaries()."""
+    summaries = exercise_cache.get_summaries()
+    if summaries is None:
+        exercises = await aget_exercises()
+        summaries = exercise_cache.get_summaries() or [ExerciseSummary(exercise) for exercise in exercises]
+    return summaries
+
+
+async def aget_exercises_by_ids(ex_ids: List[str], shape: str = "full") -> List[Any]:
+    """Async get_exercises_by_ids(), cache misses are read with one get_all call."""
+    _check_shape(shape)
+    found = {}
+    for ex_id in ex_ids:
+        exercise = exercise_cache.get(ex_id, shape=shape)
+        if exercise is not None:
+            found[ex_id] = exercise
+
+    missing = [ex_id for ex_id in ex_ids if ex_id not in found]
+    if missing:
+        db = get_async_db()
+        collection = db.collection("exerciseData")
+        async for doc in db.get_all([collection.document(ex_id) for ex_id in missing], field_paths=EXERCISE_SHAPES[shape]):
+            if not doc.exists:
+                continue
+            if shape == "summary":
+                found[doc.id] = _summary_from_doc(doc)
+            else:
+                found[doc.id] = _exercise_from_doc(doc)
+                exercise_cache.warm(found[doc.id])
+
+    return [found[ex_id] for ex_id in ex_ids if ex_id in found]
+
+
+async def aget_exercises_page(page_size: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, before: Optional[str] = None, ids: Optional[List[str]] = None, shape: str = "full") -> Dict[str, Any]:
+    """Async get_exercises_page()."""
+    _check_shape(shape)
+    if ids is not None:
+        page = paginate_sorted([{"id": ex_id} for ex_id in ids], page_size, after=after, before=before)
+        page["items"] = await aget_exercises_by_ids([item["id"] for item in page["items"]], shape=shape)
+        return page
+
+    if exercise_cache.can_hold_catalogue():
+        catalogue = await aget_exercise_summaries() if shape == "summary" else await aget_exercises()
+        return paginate_sorted(catalogue, page_size, after=after, before=before)
+
+    query = get_async_db().collection("exerciseData")
+    if shape == "summary":
+        query = query.select(EXERCISE_SHAPES["summary"])
+    page = await _fetch_page(query, page_size, after=after, before=before)
+    from_doc = _summary_from_doc if shape == "summary" else _exercise_from_doc
+    page["items"] = [from_doc(doc) for doc in page.pop("docs")]
+    return page
+
+
+async def aupdate_exercise(ex_id: str, data: Dict[str, Any]) -> None:
+    sanitized = _stamped(_sanitize_update(data))
+
+    async with exercise_write_buffer.async_direct_write({ex_id: sanitized}):
+        await get_async_db().collection("exerciseData").document(ex_id).update(sanitized)
+    _exercise_updated(ex_id, sanitized)
+
+
+async def ainsert_exercise(exercise_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Async insert_exercise()."""
+    exercise_data = _new_exercise(exercise_id, payload)
+    await get_async_db().collection("exerciseData").document(exercise_id).create(exercise_data)
+    _exercise_saved(exercise_data)
+    return exercise_data
+
+
+async def _commit_deletes(ex_ids: List[str]) -> None:
+    db = get_async_db()
+    collection = db.collection("exerciseData")
+    tombstones = db.collection(TOMBSTONE_COLLECTION)
+    deleted_at = _now()
+    batch = db.batch()
+    for ex_id in ex_ids:
+        batch.delete(collection.document(ex_id))
+        batch.set(tombstones.document(ex_id), _tombstone(ex_id, deleted_at))
+    await batch.commit()
+
+
+async def _delete_exercise_blobs(bucket, ex_id: str) -> None:
+    blobs = await run_io(_list_exercise_blobs, bucket, ex_id)
+    await asyncio.gather(*(run_io(_delete_blob, blob) for blob in blobs))
+
+
+async def adelete_exercises(ex_ids: Iterable[str], bucket=None) -> Dict[str, Any]:
+    """
+    Async delete_exercises(): the batched document deletes and the per-exercise blob
+    listings and deletes are all awaited concurrently.
+    """
+    ex_ids = list(dict.fromkeys(str(ex_id) for ex_id in ex_ids if ex_id))
+    bucket = bucket or get_bucket()
+
+    for ex_id in ex_ids:
+        # Pending buffered updates would fail against a deleted document
+        exercise_write_buffer.discard(ex_id)
+
+    chunks = list(_chunked(ex_ids, DELETE_BATCH_LIMIT))
+    results = await asyncio.gather(
+        *(_commit_deletes(chunk) for chunk in chunks),
+        *(_delete_exercise_blobs(bucket, ex_id) for ex_id in ex_ids),
+        return_exceptions=True,
+    )
+    document_results, blob_results = results[:len(chunks)], results[len(chunks):]
+
+    failures: Dict[str, str] = {}
+    for ex_id, result in zip(ex_ids, blob_results):
+        if isinstance(result, Exception):
+            failures[ex_id] = str(result)
+
+    for chunk, result in zip(chunks, document_results):
+        if isinstance(result, Exception):
+            for ex_id in chunk:
+                failures[ex_id] = str(result)
+            continue
+        for ex_id in chunk:
+            _exercise_deleted(ex_id)
+
+    return {"deleted_count": len(ex_ids) - len(failures), "failures": failures}
+
+
+async def adelete_exercise(ex_id: str) -> bool:
+    result = await adelete_exercises([ex_id])
+    if result["failures"]:
+        raise RuntimeError(f"Error deleting exercise {ex_id}: {result['failures'][ex_id]}")
+    return True
+
+
+async def aget_exercise_changes(since: Optional[datetime]) -> Dict[str, Any]:
+    """Async get_exercise_changes(), the two change queries are awaited together."""
+    cursor = changes_cursor()
+    if since is None or since < cursor - TOMBSTONE_RETENTION:
+        return {"full_reload": True, "since": catalogue_changes_cursor(), "updated": [], "deleted": []}
+
+    db = get_async_db()
+    updated_docs, tombstone_docs = await asyncio.gather(
+        _changes_query(db, "exerciseData", UPDATED_AT, since).get(),
+        _changes_query(db, TOMBSTONE_COLLECTION, "deleted_at", since).get(),
+    )
+    return _merge_changes(since, cursor, updated_docs, tombstone_docs)
@@ -0,0 +1,155 @@
+"""
+Lazily initialised Firebase app and the Firestore/Storage clients shared by the portal.
+
+Nothing Firebase-related is imported or initialised until a client is first asked for, so
+manage.py commands, tests and worker boots that never reach Firestore skip loading the
+credentials and building gRPC channels. Workers that want the connection cost paid at boot
+call warm_up() (forma.wsgi / forma.asgi do); override() swaps in fake clients. All clients
+are handed out wrapped for portal.instrumentation's per-request accounting.
+"""
+
+import asyncio
+import atexit
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from django.conf import settings
+
+from .instrumentation import instrument_bucket, instrument_firestore
+
+
+class FirebaseClients:
+    """
+    Thread-safe provider of the Firebase app, the sync Firestore client, the Storage bucket
+    and one Firestore AsyncClient per event loop (gRPC aio channels are bound to the loop
+    that created them).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._app = None
+        self._firestore = None
+        self._bucket = None
+        self._async_firestore: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._overrides: Dict[str, Any] = {}
+
+    def app(self):
+        """Returns the default Firebase app, initialising it from settings on first use."""
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    import firebase_admin
+                    from firebase_admin import credentials
+
+                    try:
+                        self._app = firebase_admin.get_app()
+                    except ValueError:
+                        self._app = firebase_admin.initialize_app(
+                            credentials.Certificate(str(settings.FIREBASE_CREDENTIALS)),
+                            settings.FIREBASE_OPTIONS,
+                        )
+        return self._app
+
+    def firestore(self):
+        if "firestore" in self._overrides:
+            return self._overrides["firestore"]
+        if self._firestore is None:
+            with self._lock:
+                if self._firestore is None:
+                    from firebase_admin import firestore
+
+                    self._firestore = instrument_firestore(firestore.client(self.app()))
+        return self._firestore
+
+    def async_firestore(self):
+        """Returns the AsyncClient of the running event loop."""
+        if "async_firestore" in self._overrides:
+            return self._overrides["async_firestore"]
+        loop = asyncio.get_running_loop()
+        client = self._async_firestore.get(loop)
+        if client is None:
+            from google.cloud import firestore
+
+            app = self.app()
+            client = instrument_firestore(
+                firestore.AsyncClient(credentials=app.credential.get_credential(), project=app.project_id)
+            )
+            self._async_firestore[loop] = client
+        return client
+
+    def bucket(self):
+        if "bucket" in self._overrides:
+            return self._overrides["bucket"]
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    from firebase_admin import storage
+
+                    self._bucket = instrument_bucket(storage.bucket(app=self.app()))
+        return self._bucket
+
+    def warm_up(self) -> None:
+        """Initialises the app and the sync clients now instead of on the first request."""
+        self.firestore()
+        self.bucket()
+
+    def shutdown(self) -> None:
+        """Closes the clients and deletes the Firebase app; the next use starts over."""
+        with self._lock:
+            if self._firestore is not None:
+                self._firestore.close()
+            self._firestore = None
+            self._bucket = None
+            # AsyncClients can only be closed from their own loop, which may be gone already
+            self._async_firestore.clear()
+            if self._app is not None:
+                import firebase_admin
+
+                firebase_admin.delete_app(self._app)
+                self._app = None
+
+    @contextmanager
+    def override(self, firestore=None, bucket=None, async_firestore=None):
+        """Serves the given (e.g. fake) clients instead of the real ones inside the block."""
+        replacements = {
+            name: client
+            for name, client in (
+                ("firestore", instrument_firestore(firestore)),
+                ("bucket", instrument_bucket(bucket)),
+                ("async_firestore", instrument_firestore(async_firestore)),
+            )
+            if client is not None
+        }
+        with self._lock:
+            previous = dict(self._overrides)
+            self._overrides.update(replacements)
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._overrides = previous
+
+    def is_initialised(self) -> bool:
+        return self._app is not None
+
+
+firebase_clients = FirebaseClients()
+# Registered before anything flushing Firestore writes at exit, so it runs after them
+atexit.register(firebase_clients.shutdown)
+
+
+def get_db():
+    """The shared sync Firestore client."""
+    return firebase_clients.firestore()
+
+
+def get_async_db():
+    """The Firestore AsyncClient of the running event loop."""
+    return firebase_clients.async_firestore()
+
+
+def get_bucket():
+    """The default Storage bucket."""
+    return firebase_clients.bucket()
@@ -1,8 +1,25 @@
-from firebase_admin import firestore, storage
+import asyncio
+import atexit
+import bisect
+import hashlib
+import json
+import logging
+import threading
+import time
 import uuid
-from typing import Any, Dict, Iterable, List
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
-db = firestore.client()
+from django.conf import settings
+
+from .firebase_clients import get_bucket, get_db
+from .instrumentation import bind_context
+from .signals import exercise_catalogue_loaded, exercise_deleted, exercise_saved
+
+logger = logging.getLogger(__name__)
 
 
 EXERCISE_FIELD_SPECS = {
@@ -23,6 +40,8 @@ EXERCISE_FIELD_SPECS = {
     "type": {"type": "string", "default": "weight_reps"},
     "image_1": {"type": "string", "default": ""},
     "image_2": {"type": "string", "default": ""},
+    "image_1_thumb": {"type": "string", "default": ""},
+    "image_2_thumb": {"type": "string", "default": ""},
     "added_count": {"type": "int", "default": 0},
     "primaryMuscles_en": {"type": "array", "default_factory": list},
     "primaryMuscles_ar": {"type": "array", "default_factory": list},
@@ -34,6 +53,8 @@ EXERCISE_FIELD_SPECS = {
 
 
 def _coerce_string(value: Any) -> str:
+    if type(value) is str:
+        return value.strip()
     if value is None:
         return ""
     value_str = str(value)
@@ -67,149 +88,1184 @@ def _ensure_iterable(value: Any) -> Iterable:
 def _coerce_array_of_strings(value: Any) -> List[str]:
     items = []
     for item in _ensure_iterable(value):
-        if item is None:
+        if type(item) is str:
+            item_str = item.strip()
+        elif item is None:
             continue
-        item_str = str(item).strip()
+        else:
+            item_str = str(item).strip()
         if item_str:
             items.append(item_str)
     return items
 
 
-def _default_value_for_field(field_spec: Dict[str, Any]) -> Any:
-    if "default_factory" in field_spec:
-        return field_spec["default_factory"]()
-    default = field_spec.get("default")
-    if isinstance(default, (list, dict, set)):
-        return default.copy()
-    return default
+_MISSING = object()
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+_COERCERS = {
+    "string": _coerce_string,
+    "int": _coerce_int,
+    "array": _coerce_array_of_strings,
+}
+
+
+def _compile_sanitizer(apply_defaults: bool, include_unknown: bool):
+    """
+    Builds a sanitizer specialised for one apply_defaults/include_unknown combination.
+
+    The per-field coercer and default are resolved once from EXERCISE_FIELD_SPECS, so
+    sanitizing a document does no spec lookups or type-string comparisons.
+    """
+    fields = []
+    for field, spec in EXERCISE_FIELD_SPECS.items():
+        coerce = _COERCERS.get(spec["type"], _identity)
+        default = spec.get("default")
+        if "default_factory" in spec:
+            factory = spec["default_factory"]
+        elif isinstance(default, (list, dict, set)):
+            factory = default.copy
+        else:
+            factory = None
+        fields.append((field, coerce, factory, default))
+    fields = tuple(fields)
+    known_fields = frozenset(EXERCISE_FIELD_SPECS)
+
+    def sanitize(payload: Dict[str, Any]) -> Dict[str, Any]:
+        sanitized: Dict[str, Any] = {}
+        get = payload.get
+        for field, coerce, factory, default in fields:
+            value = get(field, _MISSING)
+            if value is not _MISSING:
+                # Inline fast path for the common case of a plain string
+                sanitized[field] = value.strip() if coerce is _coerce_string and type(value) is str else coerce(value)
+            elif apply_defaults:
+                sanitized[field] = factory() if factory is not None else default
+        if include_unknown:
+            for field, value in payload.items():
+                if field not in known_fields:
+                    sanitized[field] = value
+        return sanitized
+
+    return sanitize
+
+
+def compile_sanitizers() -> None:
+    """
+    (Re)builds the compiled sanitizers; call again after changing EXERCISE_FIELD_SPECS.
+    """
+    global _SANITIZERS
+    _SANITIZERS = {
+        (apply_defaults, include_unknown): _compile_sanitizer(apply_defaults, include_unknown)
+        for apply_defaults in (False, True)
+        for include_unknown in (False, True)
+    }
+
+
+compile_sanitizers()
 
 
 def sanitize_exercise_payload(payload: Dict[str, Any], *, apply_defaults: bool = False, include_unknown: bool = False) -> Dict[str, Any]:
     """Sanitize raw data destined for an exercise document to match expected Firestore types."""
 
-    sanitized: Dict[str, Any] = {}
-    processed_fields = set()
+    return _SANITIZERS[bool(apply_defaults), bool(include_unknown)](payload)
 
-    for field, spec in EXERCISE_FIELD_SPECS.items():
-        if field in payload:
-            raw_value = payload[field]
-            if spec["type"] == "string":
-                sanitized[field] = _coerce_string(raw_value)
-            elif spec["type"] == "int":
-                sanitized[field] = _coerce_int(raw_value)
-            elif spec["type"] == "array":
-                sanitized[field] = _coerce_array_of_strings(raw_value)
-            else:
-                sanitized[field] = raw_value
-            processed_fields.add(field)
-        elif apply_defaults:
-            sanitized[field] = _default_value_for_field(spec)
 
-    if include_unknown:
-        for field, value in payload.items():
-            if field not in processed_fields and field not in sanitized:
-                sanitized[field] = value
+def sanitize_many(payloads: Iterable[Dict[str, Any]], *, apply_defaults: bool = False, include_unknown: bool = False) -> List[Dict[str, Any]]:
+    """Sanitizes a stream of payloads, same output as sanitize_exercise_payload per item."""
+
+    return list(map(_SANITIZERS[bool(apply_defaults), bool(include_unknown)], payloads))
+
+
+class ExerciseSummary:
+    """
+    Compact read-only list representation of an exercise: the fields the exercise cards
+    show while collapsed. Supports ``summary["field"]`` and ``.get()`` like the full
+    exercise dicts, so paginate_sorted and the templates take either shape.
+    """
+
+    __slots__ = ("id", "name_en", "type", "category_en", "image_1", "image_1_thumb", "primaryMuscles_en", "has_instructions")
+
+    def __init__(self, exercise: Dict[str, Any]):
+        self.id = exercise["id"]
+        self.name_en = exercise.get("name_en") or ""
+        self.type = exercise.get("type") or ""
+        self.category_en = exercise.get("category_en") or ""
+        self.image_1 = exercise.get("image_1") or ""
+        self.image_1_thumb = exercise.get("image_1_thumb") or ""
+        self.primaryMuscles_en = tuple(exercise.get("primaryMuscles_en") or ())
+        self.has_instructions = bool(exercise.get("instructions_en"))
+
+    def __getitem__(self, field: str) -> Any:
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def get(self, field: str, default: Any = None) -> Any:
+        return getattr(self, field, default)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ExerciseSummary) and self.as_dict() == other.as_dict()
+
+    def __repr__(self) -> str:
+        return f"ExerciseSummary({self.id!r})"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+# Firestore fields read for each shape of exercise (None reads whole documents);
+# instructions_en is only read for ExerciseSummary.has_instructions
+EXERCISE_SHAPES = {
+    "summary": ("name_en", "type", "category_en", "image_1", "image_1_thumb", "primaryMuscles_en", "instructions_en"),
+    "full": None,
+}
+
+
+def _check_shape(shape: str) -> None:
+    if shape not in EXERCISE_SHAPES:
+        raise ValueError(f"Unknown exercise shape: {shape}")
+
+
+USER_SUBCOLLECTIONS = ("routines", "routines_progress")
+# The users page summarizes routines_progress with portal.training_analytics instead
+USER_PAGE_SUBCOLLECTIONS = ("routines",)
+USER_FETCH_CONCURRENCY = 16
+
+# Shared pool for concurrent Storage/Firestore calls issued from the request thread;
+# tasks running on it must not wait on other tasks of the same pool
+IO_CONCURRENCY = 16
+_io_executor = ThreadPoolExecutor(max_workers=IO_CONCURRENCY, thread_name_prefix="portal-io")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Firestore rejects batched writes with more than 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+
+# Every exercise write stamps UPDATED_AT, and deletes leave a tombstone document, so the
+# editor can fetch only what changed since it last synced (get_exercise_changes)
+UPDATED_AT = "updated_at"
+TOMBSTONE_COLLECTION = "exerciseTombstones"
+# Tombstones carry an "expire_at" for a Firestore TTL policy on the collection; clients
+# that last synced before that need a full reload
+TOMBSTONE_RETENTION = timedelta(days=getattr(settings, "PORTAL_TOMBSTONE_RETENTION_DAYS", 30))
+# Stamps come from the workers' clocks and become visible when their write commits, so
+# change cursors are moved back by this much; changes inside the overlap are sent again
+CHANGES_OVERLAP = timedelta(seconds=getattr(settings, "PORTAL_CHANGES_OVERLAP", 5.0))
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _stamped(fields: Dict[str, Any], stamp: Optional[datetime] = None) -> Dict[str, Any]:
+    return {**fields, UPDATED_AT: stamp or _now()}
+
+
+def _fetch_page(query, page_size: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, before: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Fetches one page of documents ordered by document ID using Firestore cursors.
+
+    ``after`` continues forward from a document ID, ``before`` walks backwards from one.
+    Only ``page_size + 1`` documents are read to detect whether another page exists.
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+    if before:
+        query = query.order_by("__name__", direction="DESCENDING")
+        query = query.start_after({"__name__": before})
+    else:
+        query = query.order_by("__name__")
+        if after:
+            query = query.start_after({"__name__": after})
+
+    docs = list(query.limit(page_size + 1).stream())
+    has_more = len(docs) > page_size
+    docs = docs[:page_size]
+
+    if before:
+        docs.reverse()
+        prev_cursor = docs[0].id if has_more and docs else None
+        next_cursor = docs[-1].id if docs else None
+    else:
+        prev_cursor = docs[0].id if after and docs else None
+        next_cursor = docs[-1].id if has_more else None
+
+    return {
+        "docs": docs,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+
+
+def _get_user_subcollection_groups(subcollection: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Loads every document of a per-user subcollection with one collection-group query,
+    grouped by the ID of the owning user document.
+    """
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for doc in get_db().collection_group(subcollection).stream():
+        user_ref = doc.reference.parent.parent
+        # Collection groups match the name at any depth, keep only users/{uid}/{subcollection}
+        if user_ref is None or user_ref.parent.id != "users" or user_ref.parent.parent is not None:
+            continue
+        grouped.setdefault(user_ref.id, []).append({**doc.to_dict(), "id": doc.id})
+    return grouped
 
-    return sanitized
 
 def get_users_with_subcollections():
-    users_ref = db.collection("users").stream()
+    """
+    Retrieves all users together with their routines and routines_progress subcollections.
+
+    Subcollections are bulk-loaded with one collection-group query each instead of two
+    streams per user, so the number of round trips no longer grows with the user count.
+    """
+    subcollections = {name: _get_user_subcollection_groups(name) for name in USER_SUBCOLLECTIONS}
+
     users = []
-    for doc in users_ref:
+    for doc in get_db().collection("users").stream():
         user_data = doc.to_dict()
         user_data["id"] = doc.id
+        for name, grouped in subcollections.items():
+            user_data[name] = grouped.get(doc.id, [])
+        users.append(user_data)
+    return users
+
 
-        # 🔹 Get routines subcollection
-        routines_ref = db.collection("users").document(doc.id).collection("routines").stream()
-        user_data["routines"] = [{**r.to_dict(), "id": r.id} for r in routines_ref]
+def _get_user_subcollections(user_id: str, names: Iterable[str] = USER_SUBCOLLECTIONS) -> Dict[str, List[Dict[str, Any]]]:
+    user_ref = get_db().collection("users").document(user_id)
+    return {
+        name: [{**doc.to_dict(), "id": doc.id} for doc in user_ref.collection(name).stream()]
+        for name in names
+    }
 
-        # 🔹 Get routines_progress subcollection
-        progress_ref = db.collection("users").document(doc.id).collection("routines_progress").stream()
-        user_data["routines_progress"] = [{**p.to_dict(), "id": p.id} for p in progress_ref]
 
+def get_users_page(page_size: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, before: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Retrieves one page of users with their routines (USER_PAGE_SUBCOLLECTIONS).
+
+    Subcollections of the users on the page are fetched concurrently by a bounded thread
+    pool, so the work per request depends on the page size and not on the user count.
+    """
+    page = _fetch_page(get_db().collection("users"), page_size, after=after, before=before)
+    docs = page.pop("docs")
+
+    with ThreadPoolExecutor(max_workers=USER_FETCH_CONCURRENCY) as executor:
+        futures = [executor.submit(bind_context(_get_user_subcollections, doc.id, USER_PAGE_SUBCOLLECTIONS)) for doc in docs]
+        subcollections = [future.result() for future in futures]
+
+    users = []
+    for doc, user_subcollections in zip(docs, subcollections):
+        user_data = doc.to_dict()
+        user_data["id"] = doc.id
+        user_data.update(user_subcollections)
         users.append(user_data)
-    return users
+
+    page["items"] = users
+    return page
+
+
+class ExerciseCache:
+    """
+    Thread-safe in-process cache of sanitized exercises.
+
+    Entries are kept in an LRU bounded by ``max_entries``. The full catalogue is served from
+    memory only while every exercise is cached and the last full load is younger than ``ttl``
+    seconds; the write paths keep individual entries current in between.
+
+    With a live source attached (portal.catalogue_sync), a snapshot listener keeps the whole
+    catalogue current: it does not expire while the source reports live and is never evicted.
+    ``version`` is bumped by every change to the cached exercises; fingerprint() is a digest
+    of their content, equal in every process holding the same catalogue.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # ExerciseSummary of the entries, built on first use and shared by every reader
+        self._summaries: Dict[str, ExerciseSummary] = {}
+        # Content digests of the entries and their XOR, memoised like the summaries
+        self._digests: Dict[str, int] = {}
+        self._fingerprint: Optional[tuple] = None
+        self._lock = threading.RLock()
+        self._loaded_at: Optional[float] = None
+        # Changes cursor taken before the catalogue was read
+        self._loaded_since: Optional[datetime] = None
+        self._catalogue_size: Optional[int] = None
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._live_source: Optional[Callable[[], bool]] = None
+        self.version = 0
+
+    def set_live_source(self, is_live: Optional[Callable[[], bool]]) -> None:
+        with self._lock:
+            self._live_source = is_live
+
+    def _is_live(self) -> bool:
+        return self._live_source is not None and self._live_source()
+
+    def _is_fresh(self) -> bool:
+        if self._loaded_at is None:
+            return False
+        return self._is_live() or time.monotonic() - self._loaded_at < self.ttl
+
+    def _store(self, exercise: Dict[str, Any]) -> None:
+        self._entries[exercise["id"]] = exercise
+        self._entries.move_to_end(exercise["id"])
+        self._summaries.pop(exercise["id"], None)
+        self._digests.pop(exercise["id"], None)
+        self.version += 1
+        while self._live_source is None and len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._summaries.pop(evicted, None)
+            self._digests.pop(evicted, None)
+            self._stats["evictions"] += 1
+            # An evicted entry means the catalogue can no longer be served from memory
+            self._loaded_at = None
+
+    def can_hold_catalogue(self) -> bool:
+        return self._live_source is not None or self._catalogue_size is None or self._catalogue_size <= self.max_entries
+
+    def get_catalogue(self) -> Optional[List[Dict[str, Any]]]:
+        """Returns all cached exercises sorted by ID, or None when the catalogue is stale."""
+        with self._lock:
+            if not self._is_fresh():
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            return [dict(self._entries[ex_id]) for ex_id in sorted(self._entries)]
+
+    def _summary(self, ex_id: str) -> ExerciseSummary:
+        summary = self._summaries.get(ex_id)
+        if summary is None:
+            summary = self._summaries[ex_id] = ExerciseSummary(self._entries[ex_id])
+        return summary
+
+    def get_summaries(self) -> Optional[List[ExerciseSummary]]:
+        """get_catalogue() in the summary shape, without copying the cached exercises."""
+        with self._lock:
+            if not self._is_fresh():
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            return [self._summary(ex_id) for ex_id in sorted(self._entries)]
+
+    def _digest(self, ex_id: str) -> int:
+        digest = self._digests.get(ex_id)
+        if digest is None:
+            encoded = json.dumps(self._entries[ex_id], sort_keys=True, default=str).encode()
+            digest = self._digests[ex_id] = int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "big")
+        return digest
+
+    def fingerprint(self, ex_id: Optional[str] = None) -> Optional[str]:
+        """
+        Hex digest of the content of the cached catalogue, or of one cached exercise with
+        ``ex_id``. None when the catalogue is stale or the exercise is not cached.
+        """
+        with self._lock:
+            if not self._is_fresh():
+                return None
+            if ex_id is not None:
+                return f"{self._digest(ex_id):016x}" if ex_id in self._entries else None
+            if self._fingerprint is None or self._fingerprint[0] != self.version:
+                combined = len(self._entries)
+                for cached_id in self._entries:
+                    combined ^= self._digest(cached_id)
+                self._fingerprint = (self.version, f"{combined:016x}")
+            return self._fingerprint[1]
+
+    def load_catalogue(self, exercises: List[Dict[str, Any]], since: Optional[datetime] = None) -> None:
+        """
+        Caches the whole catalogue. ``since`` is the changes cursor taken before it was
+        read, by default the current one.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._summaries.clear()
+            self._digests.clear()
+            self._catalogue_size = len(exercises)
+            self._loaded_at = time.monotonic()
+            self._loaded_since = since or changes_cursor()
+            for exercise in exercises:
+                self._store(dict(exercise))
+            self.version += 1
+
+    def changes_since(self) -> Optional[datetime]:
+        """
+        The changes cursor covering every write the cached catalogue may be missing: the
+        current one while a live source keeps it current, else the one of the last full
+        load. None when the catalogue is stale.
+        """
+        with self._lock:
+            if not self._is_fresh():
+                return None
+            return changes_cursor() if self._is_live() else self._loaded_since
+
+    def get(self, ex_id: str, shape: str = "full") -> Optional[Any]:
+        with self._lock:
+            exercise = self._entries.get(ex_id) if self._is_fresh() else None
+            if exercise is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(ex_id)
+            self._stats["hits"] += 1
+            return self._summary(ex_id) if shape == "summary" else dict(exercise)
+
+    def warm(self, exercise: Dict[str, Any]) -> None:
+        """Caches an exercise read from Firestore without counting it as a new one."""
+        with self._lock:
+            self._store(dict(exercise))
+
+    def put(self, exercise: Dict[str, Any]) -> bool:
+        """Caches a created or replaced exercise, returns False when it was cached unchanged."""
+        with self._lock:
+            current = self._entries.get(exercise["id"])
+            if current == exercise:
+                return False
+            if current is None and self._catalogue_size is not None:
+                self._catalogue_size += 1
+            self._store(dict(exercise))
+            return True
+
+    def apply_update(self, ex_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            current = self._entries.get(ex_id)
+            if current is not None and any(current.get(field, _MISSING) != value for field, value in fields.items()):
+                self._store({**current, **fields})
+
+    def remove(self, ex_id: str) -> bool:
+        with self._lock:
+            if self._entries.pop(ex_id, None) is None:
+                return False
+            self._summaries.pop(ex_id, None)
+            self._digests.pop(ex_id, None)
+            self.version += 1
+            if self._catalogue_size:
+                self._catalogue_size -= 1
+            return True
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._summaries.clear()
+            self._digests.clear()
+            self._loaded_at = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "catalogue_fresh": self._is_fresh(),
+                "live": self._is_live(),
+                "version": self.version,
+                "catalogue_age": None if self._loaded_at is None else time.monotonic() - self._loaded_at,
+            }
+
+
+exercise_cache = ExerciseCache(
+    ttl=getattr(settings, "PORTAL_EXERCISE_CACHE_TTL", 300),
+    max_entries=getattr(settings, "PORTAL_EXERCISE_CACHE_MAX_ENTRIES", 5000),
+)
+
+
+def paginate_sorted(items: List[Dict[str, Any]], page_size: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, before: Optional[str] = None) -> Dict[str, Any]:
+    """
+    In-memory equivalent of _fetch_page over dicts already sorted by their "id".
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    ids = [item["id"] for item in items]
+
+    if before:
+        end = bisect.bisect_left(ids, before)
+        start = max(0, end - page_size)
+        page_items = items[start:end]
+        prev_cursor = page_items[0]["id"] if start > 0 and page_items else None
+        next_cursor = page_items[-1]["id"] if page_items else None
+    else:
+        start = bisect.bisect_right(ids, after) if after else 0
+        page_items = items[start:start + page_size]
+        prev_cursor = page_items[0]["id"] if after and page_items else None
+        next_cursor = page_items[-1]["id"] if start + page_size < len(items) else None
+
+    return {
+        "items": page_items,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+
+
+def _exercise_from_doc(doc) -> Dict[str, Any]:
+    raw_data = doc.to_dict() or {}
+    exercise_data = sanitize_exercise_payload(raw_data, apply_defaults=True, include_unknown=True)
+    exercise_data["id"] = doc.id
+    return exercise_data
+
+
+def _summary_from_doc(doc) -> ExerciseSummary:
+    """ExerciseSummary of a document read with the "summary" projection."""
+    return ExerciseSummary({**sanitize_exercise_payload(doc.to_dict() or {}), "id": doc.id})
+
 
 def get_exercises():
     """
-    Retrieves all exercises from the Firestore database with default values for missing fields
+    Retrieves all exercises from the Firestore database with default values for missing fields.
+    Served from exercise_cache while the cached catalogue is fresh. With the
+    PORTAL_CATALOGUE_SNAPSHOT_COLD_LOAD setting a stale catalogue is reloaded from the
+    catalogue snapshot and the changes made since (portal.snapshots) when possible.
     """
-    docs = db.collection("exerciseData").stream()
-    exercises = []
+    exercises = exercise_cache.get_catalogue()
+    if exercises is not None:
+        return exercises
 
-    for doc in docs:
-        raw_data = doc.to_dict() or {}
-        exercise_data = sanitize_exercise_payload(raw_data, apply_defaults=True, include_unknown=True)
-        exercise_data["id"] = doc.id
-        exercises.append(exercise_data)
+    if getattr(settings, "PORTAL_CATALOGUE_SNAPSHOT_COLD_LOAD", False):
+        from .snapshots import load_catalogue_snapshot
 
+        try:
+            exercises = load_catalogue_snapshot()
+        except Exception:
+            logger.exception("Error loading the catalogue snapshot")
+        if exercises is not None:
+            return exercises
+
+    since = changes_cursor()
+    docs = list(get_db().collection("exerciseData").stream())
+    exercises = sanitize_many((doc.to_dict() or {} for doc in docs), apply_defaults=True, include_unknown=True)
+    for doc, exercise_data in zip(docs, exercises):
+        exercise_data["id"] = doc.id
+    exercise_cache.load_catalogue(exercises, since)
+    exercise_catalogue_loaded.send(sender=None, exercises=exercises)
     return exercises
 
-def update_exercise(ex_id, data):
+
+def get_exercise_summaries() -> List[ExerciseSummary]:
+    """get_exercises() in the summary shape; the summaries are shared, not copied."""
+    summaries = exercise_cache.get_summaries()
+    if summaries is None:
+        exercises = get_exercises()
+        # A zero TTL makes the catalogue stale as soon as it is loaded
+        summaries = exercise_cache.get_summaries() or [ExerciseSummary(exercise) for exercise in exercises]
+    return summaries
+
+
+def get_exercises_page(page_size: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, before: Optional[str] = None, ids: Optional[List[str]] = None, shape: str = "full") -> Dict[str, Any]:
+    """
+    Retrieves one page of exercises ordered by ID, sanitized like get_exercises().
+
+    With ``ids`` (sorted, e.g. search results) the page is cut from that list. Otherwise
+    pages are cut from the cached catalogue when it fits in exercise_cache, or read from
+    Firestore with cursors. ``shape="summary"`` returns ExerciseSummary items, and
+    Firestore reads select only their fields.
+    """
+    _check_shape(shape)
+    if ids is not None:
+        page = paginate_sorted([{"id": ex_id} for ex_id in ids], page_size, after=after, before=before)
+        page["items"] = get_exercises_by_ids([item["id"] for item in page["items"]], shape=shape)
+        return page
+
+    if exercise_cache.can_hold_catalogue():
+        catalogue = get_exercise_summaries() if shape == "summary" else get_exercises()
+        return paginate_sorted(catalogue, page_size, after=after, before=before)
+
+    query = get_db().collection("exerciseData")
+    if shape == "summary":
+        query = query.select(EXERCISE_SHAPES["summary"])
+    page = _fetch_page(query, page_size, after=after, before=before)
+    from_doc = _summary_from_doc if shape == "summary" else _exercise_from_doc
+    page["items"] = [from_doc(doc) for doc in page.pop("docs")]
+    return page
+
+
+def get_exercises_by_ids(ex_ids: List[str], shape: str = "full") -> List[Any]:
+    """
+    Retrieves sanitized exercises in the given order, reading only cache misses from
+    Firestore (in one get_all call). Unknown IDs are skipped. Summaries read from
+    Firestore are not cached, as the cache holds full exercises.
+    """
+    _check_shape(shape)
+    found = {}
+    for ex_id in ex_ids:
+        exercise = exercise_cache.get(ex_id, shape=shape)
+        if exercise is not None:
+            found[ex_id] = exercise
+
+    missing = [ex_id for ex_id in ex_ids if ex_id not in found]
+    if missing:
+        db = get_db()
+        collection = db.collection("exerciseData")
+        for doc in db.get_all([collection.document(ex_id) for ex_id in missing], field_paths=EXERCISE_SHAPES[shape]):
+            if not doc.exists:
+                continue
+            if shape == "summary":
+                found[doc.id] = _summary_from_doc(doc)
+            else:
+                found[doc.id] = _exercise_from_doc(doc)
+                exercise_cache.warm(found[doc.id])
+
+    return [found[ex_id] for ex_id in ex_ids if ex_id in found]
+
+
+def get_exercise_cache_stats() -> Dict[str, Any]:
+    return exercise_cache.stats()
+
+
+def _exercise_saved(exercise: Dict[str, Any]) -> None:
+    exercise_cache.put(exercise)
+    exercise_saved.send(sender=None, ex_id=exercise["id"], fields=exercise, created=True)
+
+
+def _exercise_updated(ex_id: str, fields: Dict[str, Any]) -> None:
+    exercise_cache.apply_update(ex_id, fields)
+    exercise_saved.send(sender=None, ex_id=ex_id, fields=fields, created=False)
+
+
+def _exercise_deleted(ex_id: str) -> None:
+    exercise_cache.remove(ex_id)
+    exercise_deleted.send(sender=None, ex_id=ex_id)
+
+def _resync_exercises(ex_ids: List[str]) -> None:
+    """
+    Re-reads exercises whose cached values may differ from Firestore and sends them through
+    the write signals, so the cache and indexes hold what is actually stored.
+    """
+    collection = get_db().collection("exerciseData")
+    try:
+        docs = list(get_db().get_all([collection.document(ex_id) for ex_id in ex_ids]))
+    except Exception:
+        logger.exception("Error re-reading exercises %s", ", ".join(ex_ids))
+        # The next read reloads the catalogue, which rebuilds the indexes too
+        exercise_cache.invalidate()
+        return
+    for doc in docs:
+        if doc.exists:
+            _exercise_saved(_exercise_from_doc(doc))
+        else:
+            _exercise_deleted(doc.id)
+
+
+def _sanitize_update(data: Dict[str, Any]) -> Dict[str, Any]:
     sanitized = sanitize_exercise_payload(data, apply_defaults=False, include_unknown=False)
     sanitized.pop("id", None)
 
     if not sanitized:
         raise ValueError("No valid exercise fields provided for update")
+    return sanitized
 
-    db.collection("exerciseData").document(ex_id).update(sanitized)
 
-def delete_exercise(ex_id):
+def update_exercise(ex_id, data):
+    sanitized = _stamped(_sanitize_update(data))
+
+    with exercise_write_buffer.direct_write({ex_id: sanitized}):
+        get_db().collection("exerciseData").document(ex_id).update(sanitized)
+    _exercise_updated(ex_id, sanitized)
+
+def _chunked(items: List[Any], size: int = FIRESTORE_BATCH_LIMIT) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def batch_update_exercises(ex_ids: Iterable[str], field: str, value: Any) -> Dict[str, Any]:
     """
-    Deletes an exercise from Firestore and its associated images from Storage.
+    Sets one field to the same value on many exercises using Firestore batched writes.
+
+    Updates are committed in chunks of FIRESTORE_BATCH_LIMIT. A batch is atomic, so when a
+    chunk fails (e.g. one document no longer exists) its documents are retried one by one
+    and the IDs that still fail are reported in ``failures``.
     """
-    try:
-        # First try to delete the images from storage
-        bucket = storage.bucket()
-        
-        # Delete image 1
-        blob1 = bucket.blob(f"exercise_images/{ex_id}/1.jpg")
+    if field not in EXERCISE_FIELD_SPECS or field == "id":
+        raise ValueError(f"Unknown exercise field: {field}")
+
+    sanitized = _stamped(sanitize_exercise_payload({field: value}, apply_defaults=False, include_unknown=False))
+    ex_ids = list(dict.fromkeys(str(ex_id).strip() for ex_id in ex_ids if ex_id and str(ex_id).strip()))
+    if not ex_ids:
+        raise ValueError("No exercise IDs provided for batch update")
+
+    with exercise_write_buffer.direct_write({ex_id: sanitized for ex_id in ex_ids}):
+        updated, failures = _commit_updates({ex_id: sanitized for ex_id in ex_ids})
+
+    for ex_id in updated:
+        _exercise_updated(ex_id, sanitized)
+
+    return {"updated_count": len(updated), "failures": failures}
+
+
+def _commit_updates(updates: Dict[str, Dict[str, Any]]):
+    """
+    Writes ``{ex_id: fields}`` with batched updates of up to FIRESTORE_BATCH_LIMIT documents.
+
+    A batch is atomic, so when a chunk fails its documents are retried one by one.
+    Returns the list of updated IDs and a ``{ex_id: error}`` dict of failures.
+    """
+    db = get_db()
+    collection = db.collection("exerciseData")
+    updated: List[str] = []
+    failures: Dict[str, str] = {}
+
+    for chunk in _chunked(list(updates)):
+        batch = db.batch()
+        for ex_id in chunk:
+            batch.update(collection.document(ex_id), updates[ex_id])
         try:
-            blob1.delete()
+            batch.commit()
+            updated.extend(chunk)
         except Exception:
-            # Image might not exist, continue
-            pass
-            
-        # Delete image 2
-        blob2 = bucket.blob(f"exercise_images/{ex_id}/2.jpg")
+            for ex_id in chunk:
+                try:
+                    collection.document(ex_id).update(updates[ex_id])
+                    updated.append(ex_id)
+                except Exception as e:
+                    failures[ex_id] = str(e)
+
+    return updated, failures
+
+
+class ExerciseWriteBuffer:
+    """
+    Coalesces exercise field updates before they reach Firestore.
+
+    Updates submitted for the same exercise within ``window`` seconds are merged (the last
+    value of each field wins) and written as a single document update; all pending
+    documents are committed together in batches. Direct writes through update_exercise
+    drop the pending values they supersede, so a later flush never overwrites them.
+
+    Writes to the same exercise, flushed or direct, are committed in the order they
+    started; writes to different exercises do not wait for each other. Pending updates
+    that fail to be written are kept as failures until reported by flush() or by the next
+    submit() for the exercise.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._submits: Dict[str, int] = {}
+        # Latest write started per exercise, set once it is committed
+        self._writes: Dict[str, threading.Event] = {}
+        self._failures: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._stats = {"submitted": 0, "merged": 0, "documents_written": 0, "commits": 0, "failures": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def submit(self, ex_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queues an update and reports the fields now pending for the exercise, plus the
+        ``failures`` of its earlier updates that could not be written.
+        """
+        sanitized = _sanitize_update(data)
+
+        with self._lock:
+            pending = self._pending.setdefault(ex_id, {})
+            pending.update(sanitized)
+            self._submits[ex_id] = self._submits.get(ex_id, 0) + 1
+            self._stats["submitted"] += 1
+            result = {"pending_fields": sorted(pending), "merged_updates": self._submits[ex_id]}
+
+            flush_now = len(self._pending) >= FIRESTORE_BATCH_LIMIT
+            if not flush_now and self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        # Reads through the cache see the new values before they are flushed
+        _exercise_updated(ex_id, sanitized)
+
+        if flush_now:
+            self._flush()
+        with self._lock:
+            failure = self._failures.pop(ex_id, None)
+        result["failures"] = {ex_id: failure} if failure is not None else {}
+        return result
+
+    def flush(self, ex_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Writes pending updates (all of them, or only ``ex_id``'s) and reports what was merged,
+        with the failures of this flush and of earlier ones not reported yet.
+        """
+        report = self._flush(ex_id)
+        with self._lock:
+            if ex_id is None:
+                report["failures"], self._failures = self._failures, {}
+            elif ex_id in self._failures:
+                report["failures"] = {ex_id: self._failures.pop(ex_id)}
+        return report
+
+    def _flush(self, ex_id: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            if ex_id is None:
+                pending, self._pending = self._pending, {}
+                submits, self._submits = self._submits, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            elif ex_id in self._pending:
+                pending = {ex_id: self._pending.pop(ex_id)}
+                submits = {ex_id: self._submits.pop(ex_id, 1)}
+            else:
+                pending, submits = {}, {}
+            if not pending:
+                return {"flushed": {}, "failures": {}}
+            done, previous = self._start_write(pending)
+
         try:
-            blob2.delete()
-        except Exception:
-            # Image might not exist, continue
-            pass
-            
-        # Delete the Firestore document
-        db.collection("exerciseData").document(ex_id).delete()
-        return True
-    except Exception as e:
-        print(f"Error deleting exercise: {str(e)}")
-        return False
+            for write in previous:
+                write.wait()
+            stamp = _now()
+            updated, failures = _commit_updates({pending_id: _stamped(fields, stamp) for pending_id, fields in pending.items()})
+        finally:
+            self._finish_write(pending, done)
 
-def create_exercise(name, exercise_type="weight_reps", video_url=""):
+        with self._lock:
+            self._stats["documents_written"] += len(updated)
+            self._stats["merged"] += sum(submits[flushed_id] - 1 for flushed_id in updated)
+            self._stats["commits"] += (len(pending) + FIRESTORE_BATCH_LIMIT - 1) // FIRESTORE_BATCH_LIMIT
+            self._stats["failures"] += len(failures)
+            self._failures.update(failures)
+
+        for flushed_id in updated:
+            exercise_cache.apply_update(flushed_id, {UPDATED_AT: stamp})
+        for failed_id, error in failures.items():
+            logger.error("Error flushing buffered update for %s: %s", failed_id, error)
+        if failures:
+            # The cache and indexes already hold the values that could not be written
+            _resync_exercises(list(failures))
+
+        return {
+            "flushed": {
+                flushed_id: {"fields": sorted(pending[flushed_id]), "merged_updates": submits[flushed_id]}
+                for flushed_id in updated
+            },
+            "failures": failures,
+        }
+
+    def _start_write(self, ex_ids: Iterable[str]) -> Tuple[threading.Event, List[threading.Event]]:
+        # Called with self._lock held; returns the write's event and the writes to wait for
+        done = threading.Event()
+        previous = set()
+        for ex_id in ex_ids:
+            if ex_id in self._writes:
+                previous.add(self._writes[ex_id])
+            self._writes[ex_id] = done
+        return done, list(previous)
+
+    def _finish_write(self, ex_ids: Iterable[str], done: threading.Event) -> None:
+        with self._lock:
+            for ex_id in ex_ids:
+                if self._writes.get(ex_id) is done:
+                    del self._writes[ex_id]
+        done.set()
+
+    @contextmanager
+    def direct_write(self, updates: Dict[str, Iterable[str]]):
+        """
+        Wraps a write that bypasses the buffer: drops the pending ``{ex_id: fields}`` it
+        supersedes and keeps it ordered after the writes to the same exercises in progress.
+        """
+        with self._lock:
+            self._drop_superseded(updates)
+            done, previous = self._start_write(updates)
+        try:
+            for write in previous:
+                write.wait()
+            yield
+        finally:
+            self._finish_write(updates, done)
+
+    @asynccontextmanager
+    async def async_direct_write(self, updates: Dict[str, Iterable[str]]):
+        """
+        direct_write for coroutines, waits for earlier writes in a worker thread instead of
+        blocking the event loop.
+        """
+        with self._lock:
+            self._drop_superseded(updates)
+            done, previous = self._start_write(updates)
+        try:
+            for write in previous:
+                if not write.is_set():
+                    await asyncio.to_thread(write.wait)
+            yield
+        finally:
+            self._finish_write(updates, done)
+
+    def _drop_superseded(self, updates: Dict[str, Iterable[str]]) -> None:
+        # Called with self._lock held
+        for ex_id, fields in updates.items():
+            pending = self._pending.get(ex_id)
+            if pending is None:
+                continue
+            for field in fields:
+                pending.pop(field, None)
+            if not pending:
+                del self._pending[ex_id]
+                self._submits.pop(ex_id, None)
+
+    def discard(self, ex_id: str) -> None:
+        with self._lock:
+            self._pending.pop(ex_id, None)
+            self._submits.pop(ex_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "window": self.window,
+                "pending_documents": len(self._pending),
+                "unreported_failures": len(self._failures),
+            }
+
+
+exercise_write_buffer = ExerciseWriteBuffer(window=getattr(settings, "PORTAL_WRITE_COALESCE_WINDOW", 2.0))
+atexit.register(exercise_write_buffer.flush)
+
+
+def exercise_images_prefix(ex_id: str) -> str:
+    return f"exercise_images/{ex_id}/"
+
+
+def _list_exercise_blobs(bucket, ex_id: str) -> List[Any]:
+    return list(bucket.list_blobs(prefix=exercise_images_prefix(ex_id)))
+
+
+def _delete_blob(blob) -> None:
+    from google.api_core.exceptions import NotFound
+
+    try:
+        blob.delete()
+    except NotFound:
+        # Already gone, deleting again is a no-op
+        pass
+
+
+# Each delete also writes a tombstone
+DELETE_BATCH_LIMIT = FIRESTORE_BATCH_LIMIT // 2
+
+
+def _tombstone(ex_id: str, deleted_at: datetime) -> Dict[str, Any]:
+    return {"id": ex_id, "deleted_at": deleted_at, "expire_at": deleted_at + TOMBSTONE_RETENTION}
+
+
+def _commit_deletes(ex_ids: List[str]) -> None:
+    db = get_db()
+    collection = db.collection("exerciseData")
+    tombstones = db.collection(TOMBSTONE_COLLECTION)
+    deleted_at = _now()
+    batch = db.batch()
+    for ex_id in ex_ids:
+        batch.delete(collection.document(ex_id))
+        batch.set(tombstones.document(ex_id), _tombstone(ex_id, deleted_at))
+    batch.commit()
+
+
+def delete_exercises(ex_ids: Iterable[str], bucket=None) -> Dict[str, Any]:
+    """
+    Deletes exercises from Firestore together with every blob under their image prefix.
+
+    Prefix listings, blob deletes and batched document deletes all run concurrently on
+    _io_executor. Deletion is idempotent, so IDs reported in ``failures`` can be retried.
+    """
+    ex_ids = list(dict.fromkeys(str(ex_id) for ex_id in ex_ids if ex_id))
+    bucket = bucket or get_bucket()
+
+    for ex_id in ex_ids:
+        # Pending buffered updates would fail against a deleted document
+        exercise_write_buffer.discard(ex_id)
+
+    listings = {ex_id: _io_executor.submit(bind_context(_list_exercise_blobs, bucket, ex_id)) for ex_id in ex_ids}
+    document_deletes = [(chunk, _io_executor.submit(bind_context(_commit_deletes, chunk))) for chunk in _chunked(ex_ids, DELETE_BATCH_LIMIT)]
+
+    failures: Dict[str, str] = {}
+    blob_deletes = []
+    for ex_id, listing in listings.items():
+        try:
+            blob_deletes.extend((ex_id, _io_executor.submit(bind_context(_delete_blob, blob))) for blob in listing.result())
+        except Exception as e:
+            failures[ex_id] = str(e)
+
+    for chunk, future in document_deletes:
+        try:
+            future.result()
+        except Exception as e:
+            for ex_id in chunk:
+                failures[ex_id] = str(e)
+            continue
+        for ex_id in chunk:
+            _exercise_deleted(ex_id)
+
+    for ex_id, future in blob_deletes:
+        try:
+            future.result()
+        except Exception as e:
+            failures.setdefault(ex_id, str(e))
+
+    return {"deleted_count": len(ex_ids) - len(failures), "failures": failures}
+
+
+def delete_exercise(ex_id):
+    """
+    Deletes an exercise from Firestore and its associated images from Storage.
     """
-    Creates a new exercise in Firestore.
-    """
-    exercise_id = name.lower().replace(" ", "_")
-    
-    # Check if id already exists
-    existing = db.collection("exerciseData").document(exercise_id).get()
-    if existing.exists:
-        # Generate a unique id by appending a random string
-        unique_suffix = uuid.uuid4().hex[:6]
-        exercise_id = f"{exercise_id}_{unique_suffix}"
-    
-    exercise_data = sanitize_exercise_payload(
-        {
-            "id": exercise_id,
-            "name_en": name,
-            "type": exercise_type,
-            "video_url": video_url,
-        },
-        apply_defaults=True,
-        include_unknown=False,
-    )
+    result = delete_exercises([ex_id])
+    if result["failures"]:
+        raise RuntimeError(f"Error deleting exercise {ex_id}: {result['failures'][ex_id]}")
+    return True
 
+# Taken slugs are retried with a random suffix this many times
+EXERCISE_ID_ATTEMPTS = 5
+
+
+def _new_exercise(exercise_id: str, payload: Dict[str, Any], stamp: Optional[datetime] = None) -> Dict[str, Any]:
+    exercise_data = sanitize_exercise_payload(payload, apply_defaults=True, include_unknown=False)
     # Ensure stored id matches document id
     exercise_data["id"] = exercise_id
-    db.collection("exerciseData").document(exercise_id).set(exercise_data)
-    return exercise_id
\ No newline at end of file
+    exercise_data[UPDATED_AT] = stamp or _now()
+    return exercise_data
+
+
+def create_exercise(name, exercise_type="weight_reps", video_url=""):
+    """
+    Creates a new exercise in Firestore under an ID slugged from its name.
+
+    The ID is claimed with create(), which fails if the document exists, so a taken ID
+    (including one claimed concurrently) is retried with a random suffix instead of
+    being overwritten.
+    """
+    from google.api_core.exceptions import AlreadyExists
+
+    slug = name.lower().replace(" ", "_")
+    payload = {"name_en": name, "type": exercise_type, "video_url": video_url}
+    for attempt in range(EXERCISE_ID_ATTEMPTS):
+        exercise_id = slug if attempt == 0 else f"{slug}_{uuid.uuid4().hex[:6]}"
+        try:
+            insert_exercise(exercise_id, payload)
+            return exercise_id
+        except AlreadyExists:
+            continue
+    raise RuntimeError(f"No free exercise ID for {name!r} after {EXERCISE_ID_ATTEMPTS} attempts")
+
+
+def insert_exercise(exercise_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Creates an exercise document with the sanitized payload (defaults applied). Raises
+    google.api_core.exceptions.AlreadyExists if the ID is taken.
+    """
+    exercise_data = _new_exercise(exercise_id, payload)
+    get_db().collection("exerciseData").document(exercise_id).create(exercise_data)
+    _exercise_saved(exercise_data)
+    return exercise_data
+
+
+def create_exercises(payloads: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Creates many exercises (the payloads' "id" is the document ID) using batched create()
+    writes, which never overwrite an existing document.
+
+    Writes are committed in chunks of FIRESTORE_BATCH_LIMIT. A batch is atomic, so when a
+    chunk fails its documents are retried one by one. IDs that already exist (or repeat
+    in ``payloads``) are reported in ``conflicts``, other errors in ``failures``.
+    """
+    from google.api_core.exceptions import AlreadyExists
+
+    stamp = _now()
+    documents: Dict[str, Dict[str, Any]] = {}
+    conflicts: List[str] = []
+    for payload in payloads:
+        ex_id = str(payload.get("id") or "").strip()
+        if not ex_id:
+            raise ValueError("Every exercise needs an id")
+        if ex_id in documents:
+            conflicts.append(ex_id)
+            continue
+        documents[ex_id] = _new_exercise(ex_id, payload, stamp)
+
+    db = get_db()
+    collection = db.collection("exerciseData")
+    created: List[str] = []
+    failures: Dict[str, str] = {}
+    for chunk in _chunked(list(documents)):
+        batch = db.batch()
+        for ex_id in chunk:
+            batch.create(collection.document(ex_id), documents[ex_id])
+        try:
+            batch.commit()
+            created.extend(chunk)
+        except Exception:
+            for ex_id in chunk:
+                try:
+                    collection.document(ex_id).create(documents[ex_id])
+                    created.append(ex_id)
+                except AlreadyExists:
+                    conflicts.append(ex_id)
+                except Exception as e:
+                    failures[ex_id] = str(e)
+
+    for ex_id in created:
+        _exercise_saved(documents[ex_id])
+    return {"created": created, "conflicts": conflicts, "failures": failures}
+
+
+def _changes_query(db, collection: str, field: str, since: datetime):
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    return db.collection(collection).where(filter=FieldFilter(field, ">", since))
+
+
+def changes_cursor() -> datetime:
+    """The ``since`` to use for changes after the data read now."""
+    return _now() - CHANGES_OVERLAP
+
+
+def catalogue_changes_cursor() -> datetime:
+    """
+    The ``since`` to hand out with the catalogue served now. A cached catalogue can be up
+    to the cache TTL old, so its cursor is the one of its load.
+    """
+    return exercise_cache.changes_since() or changes_cursor()
+
+
+def _merge_changes(since: datetime, cursor: datetime, updated_docs, tombstone_docs) -> Dict[str, Any]:
+    updated = {doc.id: _exercise_from_doc(doc) for doc in updated_docs}
+    deleted = {}
+    for doc in tombstone_docs:
+        deleted_at = doc.get("deleted_at")
+        # An exercise deleted and created again keeps whichever came last
+        if doc.id in updated and updated[doc.id][UPDATED_AT] > deleted_at:
+            continue
+        updated.pop(doc.id, None)
+        deleted[doc.id] = deleted_at
+
+    return {
+        "full_reload": False,
+        "since": max(since, cursor),
+        "updated": [updated[ex_id] for ex_id in sorted(updated)],
+        "deleted": sorted(deleted),
+    }
+
+
+def get_exercise_changes(since: Optional[datetime]) -> Dict[str, Any]:
+    """
+    Returns the exercises written and the IDs deleted after ``since``, plus the cursor to
+    pass as ``since`` next time. Only the changed documents and their tombstones are read.
+
+    ``full_reload`` is set (and nothing else returned) when ``since`` is missing or older
+    than the tombstone retention, as deletions from before then may be lost.
+    """
+    cursor = changes_cursor()
+    if since is None or since < cursor - TOMBSTONE_RETENTION:
+        # The client reloads the catalogue served now
+        return {"full_reload": True, "since": catalogue_changes_cursor(), "updated": [], "deleted": []}
+
+    tombstones = _io_executor.submit(bind_context(lambda: list(_changes_query(get_db(), TOMBSTONE_COLLECTION, "deleted_at", since).stream())))
+    updated_docs = list(_changes_query(get_db(), "exerciseData", UPDATED_AT, since).stream())
+    return _merge_changes(since, cursor, updated_docs, tombstones.result())
@@ -0,0 +1,104 @@
+"""
+Cache of rendered exercise card fragments.
+
+Fragments are stored per template and exercise ID together with the exercise's content
+version at render time. Versions are bumped by the portal.signals write signals, sent by
+the write paths (and by catalogue_sync for changes made elsewhere), so a write turns the
+exercise's fragments into misses; a reloaded catalogue drops every fragment.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+
+from .signals import exercise_catalogue_loaded, exercise_deleted, exercise_saved
+
+Version = Tuple[int, int]
+
+
+class FragmentCache:
+    """Thread-safe LRU of ``(template, ex_id) -> (version, html)``."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Version, str]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        # Bumped when everything is invalidated
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _version(self, ex_id: str) -> Version:
+        return self._generation, self._versions.get(ex_id, 0)
+
+    def lookup(self, template_name: str, ex_id: str) -> Tuple[Version, Optional[str]]:
+        """
+        Returns the current version of the exercise and its cached fragment, or None.
+        Pass the version to store() after rendering a miss.
+        """
+        with self._lock:
+            version = self._version(ex_id)
+            cached = self._entries.get((template_name, ex_id))
+            if cached is None or cached[0] != version:
+                self._stats["misses"] += 1
+                return version, None
+            self._entries.move_to_end((template_name, ex_id))
+            self._stats["hits"] += 1
+            return version, cached[1]
+
+    def store(self, template_name: str, ex_id: str, version: Version, html: str) -> None:
+        with self._lock:
+            # A write since lookup() means the fragment may show the old content
+            if self._version(ex_id) != version:
+                return
+            self._entries[template_name, ex_id] = (version, html)
+            self._entries.move_to_end((template_name, ex_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_or_render(self, template_name: str, ex_id: str, render: Callable[[], str]) -> str:
+        version, html = self.lookup(template_name, ex_id)
+        if html is None:
+            html = render()
+            self.store(template_name, ex_id, version, html)
+        return html
+
+    def render_exercise(self, template_name: str, exercise: Any) -> str:
+        """Renders ``template_name`` with the exercise as ``ex``, from the cache when possible."""
+        return self.get_or_render(template_name, exercise["id"], lambda: render_to_string(template_name, {"ex": exercise}))
+
+    def invalidate(self, ex_id: Optional[str] = None) -> None:
+        with self._lock:
+            if ex_id is None:
+                self._generation += 1
+                self._versions.clear()
+                self._entries.clear()
+            else:
+                self._versions[ex_id] = self._versions.get(ex_id, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+card_fragments = FragmentCache(max_entries=getattr(settings, "PORTAL_FRAGMENT_CACHE_MAX_ENTRIES", 2000))
+
+
+@receiver(exercise_catalogue_loaded)
+def _clear_on_catalogue_load(sender, **kwargs):
+    card_fragments.invalidate()
+
+
+@receiver(exercise_saved)
+def _invalidate_saved_exercise(sender, ex_id, **kwargs):
+    card_fragments.invalidate(ex_id)
+
+
+@receiver(exercise_deleted)
+def _invalidate_deleted_exercise(sender, ex_id, **kwargs):
+    card_fragments.invalidate(ex_id)
@@ -0,0 +1,240 @@
+"""
+Exercise image upload pipeline.
+
+Uploads are re-encoded into a compressed full-size JPEG and a small WebP thumbnail, and
+streamed to Storage from spooled temporary files rather than read into memory in one go.
+The two variants are uploaded concurrently, and the exercise document is only pointed at
+them once both uploads succeeded. astore_exercise_image is the ASGI flavour of the pipeline.
+
+Blobs are named after a hash of the uploaded file, exercise_images/{id}/{slot}-{hash}.jpg,
+so the content behind a URL never changes and is served with an immutable Cache-Control.
+Uploading a file already stored for the slot skips rendering and uploading. Replaced
+blobs are not deleted by the upload, since a concurrent upload to the same slot may be
+about to point the exercise at them: deleting an exercise deletes its whole prefix, and
+collect_unreferenced_images() sweeps replaced blobs once they are old enough.
+"""
+
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from tempfile import SpooledTemporaryFile
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from .firebase_async import aupdate_exercise
+from .firebase_clients import get_bucket
+from .firebase_utils import _delete_blob, _now, exercise_images_prefix, get_exercises, update_exercise
+from .instrumentation import bind_context
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:  # Pillow missing: upload originals without resizing or thumbnails
+    Image = None
+
+
+IMAGE_TYPES = ("1", "2")
+FULL_MAX_SIZE = 1600
+FULL_JPEG_QUALITY = 85
+THUMBNAIL_MAX_SIZE = 320
+THUMBNAIL_WEBP_QUALITY = 75
+
+# Spooled outputs stay in memory up to this size and move to disk beyond it
+SPOOL_MAX_SIZE = 1024 * 1024
+
+IMAGES_ROOT = "exercise_images/"
+IMAGE_FIELDS = ("image_1", "image_2", "image_1_thumb", "image_2_thumb")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Hashed with the upload, so rendering changes give the variants new names
+RENDITION_VERSION = f"{FULL_MAX_SIZE}-{FULL_JPEG_QUALITY}-{THUMBNAIL_MAX_SIZE}-{THUMBNAIL_WEBP_QUALITY}"
+HASH_CHUNK_SIZE = 1024 * 1024
+# Blobs younger than this may belong to an upload whose Firestore update has not landed
+COLLECT_MIN_AGE = timedelta(hours=1)
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="image-pipeline")
+
+
+def image_slot_prefix(ex_id: str, image_type: str) -> str:
+    return f"{exercise_images_prefix(ex_id)}{image_type}"
+
+
+def image_blob_path(ex_id: str, image_type: str, content_hash: str) -> str:
+    return f"{image_slot_prefix(ex_id, image_type)}-{content_hash}.jpg"
+
+
+def thumbnail_blob_path(ex_id: str, image_type: str, content_hash: str) -> str:
+    return f"{image_slot_prefix(ex_id, image_type)}-{content_hash}_thumb.webp"
+
+
+def _content_hash(image_file) -> str:
+    digest = hashlib.sha256(RENDITION_VERSION.encode() if Image is not None else b"original")
+    image_file.seek(0)
+    for chunk in iter(lambda: image_file.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    image_file.seek(0)
+    return digest.hexdigest()[:32]
+
+
+def _encode(image, max_size: int, image_format: str, **save_options) -> SpooledTemporaryFile:
+    resized = image.copy()
+    resized.thumbnail((max_size, max_size), Image.LANCZOS)
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    resized.save(output, format=image_format, **save_options)
+    output.seek(0)
+    return output
+
+
+def _render_variants(image_file) -> Tuple[SpooledTemporaryFile, SpooledTemporaryFile]:
+    """Re-encodes an upload into (full-size JPEG, WebP thumbnail)."""
+    try:
+        with Image.open(image_file) as image:
+            # Let the JPEG decoder downscale while decoding instead of inflating the full bitmap
+            image.draft("RGB", (FULL_MAX_SIZE, FULL_MAX_SIZE))
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except UnidentifiedImageError:
+        raise ValueError("Uploaded file is not a supported image")
+
+    full = _encode(image, FULL_MAX_SIZE, "JPEG", quality=FULL_JPEG_QUALITY, optimize=True, progressive=True)
+    thumbnail = _encode(image, THUMBNAIL_MAX_SIZE, "WEBP", quality=THUMBNAIL_WEBP_QUALITY)
+    return full, thumbnail
+
+
+def _upload(blob, file_obj, content_type: str) -> None:
+    blob.cache_control = IMMUTABLE_CACHE_CONTROL
+    # The public ACL is applied by the upload request itself, no separate make_public() call
+    blob.upload_from_file(file_obj, rewind=True, content_type=content_type, predefined_acl="publicRead")
+
+
+def _prepare(ex_id: str, image_type: str, image_file, bucket):
+    """
+    Renders the variants of an upload unless the slot already holds them, and returns
+    (uploads, image URL, thumbnail URL, exercise fields), where uploads are
+    (blob, file, content type) triples.
+    """
+    if image_type not in IMAGE_TYPES:
+        raise ValueError(f"Invalid image type: {image_type}")
+
+    bucket = bucket or get_bucket()
+    content_hash = _content_hash(image_file)
+    image_blob = bucket.blob(image_blob_path(ex_id, image_type, content_hash))
+    thumbnail_blob = bucket.blob(thumbnail_blob_path(ex_id, image_type, content_hash)) if Image is not None else None
+    wanted = {blob.name for blob in (image_blob, thumbnail_blob) if blob is not None}
+    stored = {blob.name for blob in bucket.list_blobs(prefix=image_slot_prefix(ex_id, image_type))}
+
+    uploads: List[Tuple[Any, Any, str]] = []
+    if not wanted <= stored:
+        if Image is None:
+            uploads.append((image_blob, image_file, image_file.content_type))
+        else:
+            full, thumbnail = _render_variants(image_file)
+            uploads.append((image_blob, full, "image/jpeg"))
+            uploads.append((thumbnail_blob, thumbnail, "image/webp"))
+
+    image_url = image_blob.public_url
+    thumbnail_url = thumbnail_blob.public_url if thumbnail_blob is not None else None
+    fields = {f"image_{image_type}": image_url}
+    if thumbnail_url:
+        fields[f"image_{image_type}_thumb"] = thumbnail_url
+    return uploads, image_url, thumbnail_url, fields
+
+
+def _delete_stale(blob) -> bool:
+    try:
+        _delete_blob(blob)
+        return True
+    except Exception:
+        # Left for collect_unreferenced_images()
+        logger.exception("Error deleting unreferenced image %s", blob.name)
+        return False
+
+
+def _close_outputs(uploads, image_file) -> None:
+    for _, file_obj, _ in uploads:
+        if file_obj is not image_file:
+            file_obj.close()
+
+
+def store_exercise_image(ex_id: str, image_type: str, image_file, bucket=None) -> Dict[str, Any]:
+    """
+    Processes and stores an exercise image, then points the exercise document at it.
+
+    Returns the public URLs of the full-size image and of its thumbnail (None when Pillow
+    is not installed and the original file is uploaded as-is), and ``deduplicated``
+    when the slot already held the file and nothing was uploaded.
+    """
+    uploads, image_url, thumbnail_url, fields = _prepare(ex_id, image_type, image_file, bucket)
+
+    futures = [_executor.submit(bind_context(_upload, blob, file_obj, content_type)) for blob, file_obj, content_type in uploads]
+    wait(futures)
+
+    _close_outputs(uploads, image_file)
+    for future in futures:
+        future.result()
+
+    # Only once the new blobs exist
+    update_exercise(ex_id, fields)
+    return {"image_url": image_url, "thumbnail_url": thumbnail_url, "deduplicated": not uploads}
+
+
+async def astore_exercise_image(ex_id: str, image_type: str, image_file, bucket=None) -> Dict[str, Any]:
+    """
+    Async store_exercise_image(): the image is re-encoded and uploaded on the pipeline pool,
+    then the exercise is updated through the AsyncClient.
+    """
+    loop = asyncio.get_running_loop()
+    uploads, image_url, thumbnail_url, fields = await loop.run_in_executor(
+        _executor, bind_context(_prepare, ex_id, image_type, image_file, bucket)
+    )
+
+    # Exceptions are collected so the outputs are only closed once every upload has stopped
+    results = await asyncio.gather(
+        *(
+            loop.run_in_executor(_executor, bind_context(_upload, blob, file_obj, content_type))
+            for blob, file_obj, content_type in uploads
+        ),
+        return_exceptions=True,
+    )
+    _close_outputs(uploads, image_file)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+    await aupdate_exercise(ex_id, fields)
+    return {"image_url": image_url, "thumbnail_url": thumbnail_url, "deduplicated": not uploads}
+
+
+def _referenced_blob_name(url: str) -> Optional[str]:
+    """Blob name behind an image URL: a public Storage URL or a Firebase download URL."""
+    path = unquote(urlsplit(url).path)
+    index = path.find(IMAGES_ROOT)
+    return path[index:] if index >= 0 else None
+
+
+def collect_unreferenced_images(dry_run: bool = False, min_age: timedelta = COLLECT_MIN_AGE, bucket=None) -> Dict[str, Any]:
+    """
+    Deletes the blobs under exercise_images/ that no exercise's image fields point to,
+    such as blobs of deleted exercises or replaced images whose delete failed. Blobs
+    younger than ``min_age`` are kept. Reads the whole catalogue and bucket listing, so
+    it is meant for occasional maintenance runs.
+    """
+    bucket = bucket or get_bucket()
+    referenced = set()
+    for exercise in get_exercises():
+        for field in IMAGE_FIELDS:
+            name = _referenced_blob_name(exercise.get(field) or "")
+            if name:
+                referenced.add(name)
+
+    cutoff = _now() - min_age
+    unreferenced = [
+        blob for blob in bucket.list_blobs(prefix=IMAGES_ROOT)
+        if blob.name not in referenced and (blob.updated is None or blob.updated <= cutoff)
+    ]
+    deleted = 0
+    if not dry_run:
+        futures = [_executor.submit(bind_context(_delete_stale, blob)) for blob in unreferenced]
+        deleted = sum(future.result() for future in futures)
+    return {"unreferenced": len(unreferenced), "bytes": sum(blob.size or 0 for blob in unreferenced), "deleted": deleted}
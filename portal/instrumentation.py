@@ -0,0 +1,336 @@
+"""
+Per-request accounting of Firestore and Storage calls.
+
+firebase_clients hands out the clients wrapped by instrument_firestore() and
+instrument_bucket(). While a RequestMetrics is active (collect_metrics(), which the
+portal.middleware request middleware opens for every request), the wrappers record each
+round trip: documents read and written, streamed documents, estimated bytes and the time
+spent waiting. Outside of it they only pass calls through.
+
+The active metrics live in a context variable. Work handed to thread pools must be
+submitted through bind_context() to be attributed to the request that started it.
+"""
+
+import contextvars
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Dict, Optional
+
+_current_metrics: "contextvars.ContextVar[Optional[RequestMetrics]]" = contextvars.ContextVar("portal_request_metrics", default=None)
+
+FIRESTORE_READS = frozenset({"get", "stream", "get_all"})
+FIRESTORE_WRITES = frozenset({"set", "update", "delete", "create"})
+FIRESTORE_RPCS = FIRESTORE_READS | FIRESTORE_WRITES | {"commit"}
+STORAGE_RPCS = frozenset({
+    "upload_from_file", "upload_from_string", "upload_from_filename", "download_as_bytes",
+    "delete", "exists", "reload", "patch", "make_public", "list_blobs", "get_blob",
+})
+
+
+class RequestMetrics:
+    """Thread-safe counters of the Firestore and Storage calls made for one request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.firestore = {"rpcs": 0, "reads": 0, "writes": 0, "streamed": 0, "bytes_read": 0, "bytes_written": 0, "ms": 0.0}
+        self.storage = {"rpcs": 0, "bytes_read": 0, "bytes_written": 0, "ms": 0.0}
+
+    def record(self, service: str, elapsed: float, **counts: int) -> None:
+        with self._lock:
+            counters = getattr(self, service)
+            counters["rpcs"] += 1
+            counters["ms"] += elapsed * 1000
+            for name, value in counts.items():
+                counters[name] += value
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {"firestore": dict(self.firestore), "storage": dict(self.storage)}
+
+
+@contextmanager
+def use_metrics(metrics: RequestMetrics):
+    """Attributes the Firestore/Storage calls made inside the block to ``metrics``."""
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+@contextmanager
+def collect_metrics():
+    """Attributes the Firestore/Storage calls made inside the block to a new RequestMetrics."""
+    with use_metrics(RequestMetrics()) as metrics:
+        yield metrics
+
+
+def current_metrics() -> Optional[RequestMetrics]:
+    return _current_metrics.get()
+
+
+def bind_context(func, *args, **kwargs):
+    """
+    Wraps ``func`` to run in a copy of the caller's context, e.g. on a thread pool.
+
+    A copied context can only be entered by one thread at a time, so bind each submitted
+    call separately rather than passing one bound function to ``executor.map``.
+    """
+    return partial(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def document_size(value: Any) -> int:
+    """Approximate Firestore storage size of a value, following the documented size rules."""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(key).encode("utf-8")) + 1 + document_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(document_size(item) for item in value)
+    return 8
+
+
+def _snapshot_size(snapshot) -> int:
+    # Snapshots keep their decoded fields in _data, to_dict() would deep-copy them
+    return document_size(getattr(snapshot, "_data", None) or {})
+
+
+def _unwrap(value: Any) -> Any:
+    if isinstance(value, _Instrumented):
+        return value._target
+    if isinstance(value, (list, tuple)) and any(isinstance(item, _Instrumented) for item in value):
+        return type(value)(_unwrap(item) for item in value)
+    return value
+
+
+class _Instrumented:
+    """Proxy of a client object; builder calls return proxies, round trips are recorded."""
+
+    __slots__ = ("_target",)
+
+    _service = ""
+    _rpcs: frozenset = frozenset()
+
+    def __init__(self, target):
+        self._target = target
+
+    def __repr__(self) -> str:
+        return f"<instrumented {self._target!r}>"
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __eq__(self, other) -> bool:
+        return self._target == _unwrap(other)
+
+    def __hash__(self) -> int:
+        return hash(self._target)
+
+    def __setattr__(self, name, value):
+        # Property writes such as blob.cache_control go to the wrapped object
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._target, name, value)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == "parent":
+            return None if attr is None else type(self)(attr)
+        if not callable(attr):
+            return attr
+
+        if name not in self._rpcs:
+            def builder(*args, **kwargs):
+                result = attr(*map(_unwrap, args), **{key: _unwrap(value) for key, value in kwargs.items()})
+                return result if result is None or result is self._target else type(self)(result)
+            return builder
+
+        def rpc(*args, **kwargs):
+            metrics = _current_metrics.get()
+            if metrics is None:
+                return attr(*map(_unwrap, args), **{key: _unwrap(value) for key, value in kwargs.items()})
+            counts = self._request_counts(name, args, kwargs)
+            started = time.perf_counter()
+            result = attr(*map(_unwrap, args), **{key: _unwrap(value) for key, value in kwargs.items()})
+            if inspect.isawaitable(result):
+                return self._await(metrics, name, result, started, counts)
+            if hasattr(result, "__anext__"):
+                return self._iterate_async(metrics, name, result, time.perf_counter() - started, counts)
+            if name in ("stream", "get_all", "list_blobs"):
+                return self._iterate(metrics, name, result, time.perf_counter() - started, counts)
+            self._record(metrics, name, result, time.perf_counter() - started, counts)
+            return result
+
+        return rpc
+
+    def _request_counts(self, name, args, kwargs) -> Dict[str, int]:
+        return {}
+
+    def _item_counts(self, name, item) -> Dict[str, int]:
+        return {}
+
+    def _result(self, name, item):
+        return item
+
+    def _record(self, metrics, name, result, elapsed, counts) -> None:
+        metrics.record(self._service, elapsed, **counts)
+
+    async def _await(self, metrics, name, awaitable, started, counts):
+        result = await awaitable
+        self._record(metrics, name, result, time.perf_counter() - started, counts)
+        return result
+
+    def _iterate(self, metrics, name, iterator, elapsed, counts):
+        # Time is only counted while waiting for the next item, not while the caller works
+        iterator = iter(iterator)
+        counts = dict(counts)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    elapsed += time.perf_counter() - started
+                    break
+                elapsed += time.perf_counter() - started
+                for key, value in self._item_counts(name, item).items():
+                    counts[key] = counts.get(key, 0) + value
+                yield self._result(name, item)
+        finally:
+            metrics.record(self._service, elapsed, **counts)
+
+    async def _iterate_async(self, metrics, name, iterator, elapsed, counts):
+        counts = dict(counts)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    elapsed += time.perf_counter() - started
+                    break
+                elapsed += time.perf_counter() - started
+                for key, value in self._item_counts(name, item).items():
+                    counts[key] = counts.get(key, 0) + value
+                yield self._result(name, item)
+        finally:
+            metrics.record(self._service, elapsed, **counts)
+
+
+class InstrumentedFirestore(_Instrumented):
+    __slots__ = ()
+
+    _service = "firestore"
+    _rpcs = FIRESTORE_RPCS
+
+    def __getattr__(self, name):
+        if name == "batch":
+            batch = getattr(self._target, "batch")
+            return lambda *args, **kwargs: InstrumentedBatch(batch(*args, **kwargs))
+        return super().__getattr__(name)
+
+    def _request_counts(self, name, args, kwargs):
+        if name in ("set", "create", "update"):
+            data = args[0] if args else kwargs.get("document_data", kwargs.get("field_updates", {}))
+            return {"writes": 1, "bytes_written": document_size(data)}
+        if name == "delete":
+            return {"writes": 1}
+        return {}
+
+    def _item_counts(self, name, item):
+        counts = {"reads": 1, "bytes_read": _snapshot_size(item)}
+        if name == "stream":
+            counts["streamed"] = 1
+        return counts
+
+    def _record(self, metrics, name, result, elapsed, counts):
+        if name == "get" and result is not None and not isinstance(result, list):
+            counts = {**counts, "reads": 1, "bytes_read": _snapshot_size(result)}
+        elif name == "get" and isinstance(result, list):
+            counts = {**counts, "reads": len(result), "bytes_read": sum(_snapshot_size(snapshot) for snapshot in result)}
+        metrics.record(self._service, elapsed, **counts)
+
+
+class InstrumentedBatch(_Instrumented):
+    """Write batch proxy, counts the queued writes and their size when committed."""
+
+    __slots__ = ("_writes", "_bytes")
+
+    _service = "firestore"
+    _rpcs = frozenset({"commit"})
+
+    def __init__(self, target):
+        super().__init__(target)
+        self._writes = 0
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._target)
+
+    def __getattr__(self, name):
+        if name in ("set", "create", "update", "delete"):
+            method = getattr(self._target, name)
+
+            def write(reference, *args, **kwargs):
+                self._writes += 1
+                if args:
+                    self._bytes += document_size(args[0])
+                return method(_unwrap(reference), *args, **kwargs)
+
+            return write
+        return super().__getattr__(name)
+
+    def _request_counts(self, name, args, kwargs):
+        counts = {"writes": self._writes, "bytes_written": self._bytes}
+        self._writes = self._bytes = 0
+        return counts
+
+
+class InstrumentedBucket(_Instrumented):
+    __slots__ = ()
+
+    _service = "storage"
+    _rpcs = STORAGE_RPCS
+
+    def _request_counts(self, name, args, kwargs):
+        if name == "upload_from_string" and args:
+            return {"bytes_written": len(args[0])}
+        return {}
+
+    def _result(self, name, item):
+        # Listed blobs are wrapped too, so deleting them is recorded
+        return InstrumentedBucket(item) if name == "list_blobs" else item
+
+    def _record(self, metrics, name, result, elapsed, counts):
+        if name == "download_as_bytes" and isinstance(result, bytes):
+            counts = {**counts, "bytes_read": len(result)}
+        elif name == "upload_from_file" and hasattr(self._target, "size") and self._target.size:
+            counts = {**counts, "bytes_written": self._target.size}
+        metrics.record(self._service, elapsed, **counts)
+
+    def __getattr__(self, name):
+        attr = super().__getattr__(name)
+        if name == "get_blob":
+            def get_blob(*args, **kwargs):
+                blob = attr(*args, **kwargs)
+                return None if blob is None else InstrumentedBucket(blob)
+            return get_blob
+        return attr
+
+
+def instrument_firestore(client):
+    return client if client is None or isinstance(client, _Instrumented) else InstrumentedFirestore(client)
+
+
+def instrument_bucket(bucket):
+    return bucket if bucket is None or isinstance(bucket, _Instrumented) else InstrumentedBucket(bucket)
@@ -0,0 +1,191 @@
+import asyncio
+import io
+import json
+import math
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from portal import async_views, views
+from portal.catalogue_sync import catalogue_sync
+from portal.completeness import completeness_index
+from portal.fragments import card_fragments
+from portal.fakes import FakeBucket, FakeFirestore, seed_portal_data
+from portal.firebase_clients import firebase_clients
+from portal.firebase_utils import exercise_cache, exercise_write_buffer, get_users_with_subcollections
+from portal.search import exercise_search_index
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _reset_caches():
+    exercise_cache.invalidate()
+    exercise_search_index.invalidate()
+    completeness_index.invalidate()
+    card_fragments.invalidate()
+
+
+async def _drain(streaming_content):
+    async for _ in streaming_content:
+        pass
+
+
+def _sample_image():
+    if Image is None:
+        return b"\xff\xd8\xff" + bytes(200_000)
+    output = io.BytesIO()
+    Image.new("RGB", (1200, 900), (120, 140, 160)).save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    help = "End-to-end latency percentiles and RPC counts of the portal views against in-memory Firebase fakes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--exercises", type=int, default=1500)
+        parser.add_argument("--routines", type=int, default=3, help="Routines per user")
+        parser.add_argument("--progress", type=int, default=20, help="routines_progress documents per user")
+        parser.add_argument("--requests", type=int, default=20, help="Requests per scenario")
+        parser.add_argument("--latency", type=float, default=20.0, help="Milliseconds per Firestore/Storage round trip")
+        parser.add_argument("--async", action="store_true", dest="use_async", help="Drive portal.async_views instead of portal.views")
+        parser.add_argument("--catalogue-sync", action="store_true", help="Keep the catalogue current with the snapshot listener")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        latency = options["latency"] / 1000
+        firestore = FakeFirestore(latency=latency)
+        bucket = FakeBucket(latency=latency)
+        seed_portal_data(
+            firestore, bucket,
+            users=options["users"], exercises=options["exercises"],
+            routines_per_user=options["routines"], progress_per_user=options["progress"],
+        )
+
+        view_module = async_views if options["use_async"] else views
+        loop = asyncio.new_event_loop() if options["use_async"] else None
+
+        def call(view, request, *args):
+            response = view(request, *args)
+            if asyncio.iscoroutine(response):
+                response = loop.run_until_complete(response)
+            if response.status_code != 200:
+                raise CommandError(f"{view.__name__} returned HTTP {response.status_code}")
+            # Streamed pages do their work as they are iterated, so that is timed too
+            if response.streaming:
+                if response.is_async:
+                    loop.run_until_complete(_drain(response.streaming_content))
+                else:
+                    for _ in response.streaming_content:
+                        pass
+            if response.get("Content-Type", "").startswith("application/json"):
+                payload = json.loads(response.content)
+                if not payload.get("success"):
+                    raise CommandError(f"{view.__name__} failed: {payload.get('error')}")
+            return response
+
+        factory = RequestFactory()
+        exercise_ids = [path.rsplit("/", 1)[1] for path in firestore.paths("exerciseData")]
+        image = _sample_image()
+        created = []
+
+        def create(index):
+            ex_id = f"benchmark_{index:05d}"
+            created.append(ex_id)
+            body = json.dumps({"id": ex_id, "name_en": f"Benchmark {index}", "type": "weight_reps"})
+            call(view_module.create_exercise, factory.post("/portal/exercises/create/", body, content_type="application/json"))
+
+        def upload(index):
+            upload_file = SimpleUploadedFile("image.jpg", image, content_type="image/jpeg")
+            request = factory.post("/portal/exercises/upload_image/", {
+                "exercise_name": exercise_ids[index % len(exercise_ids)], "image_type": "1", "image": upload_file,
+            })
+            call(view_module.upload_exercise_image, request)
+
+        def delete(index):
+            ex_id = created[index] if index < len(created) else exercise_ids[-1 - index]
+            call(view_module.delete_exercise_view, factory.post(f"/portal/exercises/{ex_id}/delete/"), ex_id)
+
+        scenarios = [
+            ("users_view", None, lambda i: call(view_module.users_view, factory.get("/portal/users/"))),
+            ("exercises_view cold", _reset_caches, lambda i: call(view_module.exercises_view, factory.get("/portal/exercises/"))),
+            ("exercises_view warm", None, lambda i: call(view_module.exercises_view, factory.get("/portal/exercises/"))),
+            ("exercises_view search", None, lambda i: call(
+                view_module.exercises_view, factory.get("/portal/exercises/", {"q": "barbell", "category": "Chest"})
+            )),
+            ("update_exercise_type", None, lambda i: call(
+                view_module.update_exercise_type,
+                factory.post("/portal/exercises/x/update_type/", {"exercise_type": "duration"}),
+                exercise_ids[i % len(exercise_ids)],
+            )),
+            ("batch_update x50", None, lambda i: call(view_module.batch_update, factory.post(
+                "/portal/exercises/batch_update/",
+                json.dumps({"field": "type", "value": "weight_reps", "exercise_ids": exercise_ids[i:i + 50]}),
+                content_type="application/json",
+            ))),
+            ("create_exercise", None, create),
+            ("upload_exercise_image", None, upload),
+            ("delete_exercise", None, delete),
+            ("get_users_with_subcollections", None, lambda i: get_users_with_subcollections()),
+        ]
+
+        results = []
+        _reset_caches()
+        try:
+            with firebase_clients.override(firestore=firestore, bucket=bucket, async_firestore=firestore.async_client()):
+                if options["catalogue_sync"]:
+                    catalogue_sync.start()
+                for name, setup, run in scenarios:
+                    timings, firestore_rpcs, storage_rpcs = [], 0, 0
+                    for index in range(options["requests"]):
+                        if setup is not None:
+                            setup()
+                        firestore_before, storage_before = firestore.rpc_count, bucket.rpc_count
+                        started = time.perf_counter()
+                        run(index)
+                        timings.append(time.perf_counter() - started)
+                        firestore_rpcs += firestore.rpc_count - firestore_before
+                        storage_rpcs += bucket.rpc_count - storage_before
+
+                    results.append({
+                        "scenario": name,
+                        "requests": len(timings),
+                        "p50_ms": percentile(timings, 50) * 1000,
+                        "p90_ms": percentile(timings, 90) * 1000,
+                        "p99_ms": percentile(timings, 99) * 1000,
+                        "max_ms": max(timings) * 1000,
+                        "firestore_rpcs": firestore_rpcs / len(timings),
+                        "storage_rpcs": storage_rpcs / len(timings),
+                    })
+                exercise_write_buffer.flush()
+        finally:
+            catalogue_sync.stop()
+            _reset_caches()
+            if loop is not None:
+                loop.close()
+
+        if options["json"]:
+            self.stdout.write(json.dumps({"options": {k: options[k] for k in ("users", "exercises", "requests", "latency", "use_async", "catalogue_sync")}, "results": results}, indent=2))
+            return
+
+        self.stdout.write(
+            f"{options['users']} users, {options['exercises']} exercises, {options['latency']:g} ms per round trip, "
+            f"{'async' if options['use_async'] else 'sync'} views{', catalogue listener' if options['catalogue_sync'] else ''}"
+        )
+        self.stdout.write(f"{'scenario':<32}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'fs rpc':>8}{'gcs rpc':>8}")
+        for result in results:
+            self.stdout.write(
+                f"{result['scenario']:<32}{result['p50_ms']:>9.1f}{result['p90_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                f"{result['max_ms']:>9.1f}{result['firestore_rpcs']:>8.1f}{result['storage_rpcs']:>8.1f}"
+            )
@@ -0,0 +1,145 @@
+import gc
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from portal.firebase_utils import EXERCISE_FIELD_SPECS, sanitize_exercise_payload, sanitize_many
+
+
+def _reference_coerce_int(value):
+    if value is None or value == "":
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return 0
+
+
+def _reference_coerce_array(value):
+    if value is None:
+        value = []
+    elif not isinstance(value, (list, tuple, set)):
+        value = [value]
+    items = []
+    for item in value:
+        if item is None:
+            continue
+        item_str = str(item).strip()
+        if item_str:
+            items.append(item_str)
+    return items
+
+
+def _reference_default(field_spec):
+    if "default_factory" in field_spec:
+        return field_spec["default_factory"]()
+    default = field_spec.get("default")
+    if isinstance(default, (list, dict, set)):
+        return default.copy()
+    return default
+
+
+def _reference_sanitize(payload, *, apply_defaults=False, include_unknown=False):
+    """The spec-walking sanitizer that sanitize_exercise_payload replaced, kept as the baseline."""
+    sanitized = {}
+    processed_fields = set()
+
+    for field, spec in EXERCISE_FIELD_SPECS.items():
+        if field in payload:
+            raw_value = payload[field]
+            if spec["type"] == "string":
+                sanitized[field] = "" if raw_value is None else str(raw_value).strip()
+            elif spec["type"] == "int":
+                sanitized[field] = _reference_coerce_int(raw_value)
+            elif spec["type"] == "array":
+                sanitized[field] = _reference_coerce_array(raw_value)
+            else:
+                sanitized[field] = raw_value
+            processed_fields.add(field)
+        elif apply_defaults:
+            sanitized[field] = _reference_default(spec)
+
+    if include_unknown:
+        for field, value in payload.items():
+            if field not in processed_fields and field not in sanitized:
+                sanitized[field] = value
+
+    return sanitized
+
+
+def _synthetic_document(rng):
+    """An exercise document with missing fields, padding, loose types and unknown fields."""
+    document = {}
+    for field, spec in EXERCISE_FIELD_SPECS.items():
+        if rng.random() < 0.15:
+            continue
+        if spec["type"] == "string":
+            document[field] = rng.choice([f"  {field} value {rng.randint(0, 999)} ", None, 42, ""])
+        elif spec["type"] == "int":
+            document[field] = rng.choice([rng.randint(0, 500), str(rng.randint(0, 500)), "3.0", None, "", True])
+        else:
+            document[field] = rng.choice([
+                [f" item {i} " for i in range(rng.randint(0, 8))] + [None, ""],
+                ("a", "b"),
+                "single",
+                None,
+            ])
+    if rng.random() < 0.3:
+        document["legacy_field"] = rng.randint(0, 10)
+    return document
+
+
+class Command(BaseCommand):
+    help = "Microbenchmark of the compiled exercise sanitizer against the spec-walking baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=50000, help="Number of synthetic documents")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per variant, the best is reported")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        documents = [_synthetic_document(rng) for _ in range(options["documents"])]
+
+        for apply_defaults, include_unknown in ((True, True), (False, False)):
+            flags = {"apply_defaults": apply_defaults, "include_unknown": include_unknown}
+            variants = {
+                "baseline": lambda: [_reference_sanitize(document, **flags) for document in documents],
+                "sanitize_exercise_payload": lambda: [sanitize_exercise_payload(document, **flags) for document in documents],
+                "sanitize_many": lambda: sanitize_many(documents, **flags),
+            }
+
+            # Variants are interleaved within each run so machine noise affects them alike, and
+            # the collector is paused like timeit does so one variant's garbage isn't billed to the next
+            timings = {name: [] for name in variants}
+            results = {}
+            for _ in range(options["repeat"]):
+                for name, variant in variants.items():
+                    results[name] = None
+                    gc.collect()
+                    gc.disable()
+                    try:
+                        started = time.perf_counter()
+                        results[name] = variant()
+                        timings[name].append(time.perf_counter() - started)
+                    finally:
+                        gc.enable()
+
+            if any(result != results["baseline"] for result in results.values()):
+                raise AssertionError(f"Compiled sanitizer output differs from the baseline for {flags}")
+
+            best = {name: min(values) for name, values in timings.items()}
+            self.stdout.write(
+                f"{len(documents)} documents, apply_defaults={apply_defaults}, include_unknown={include_unknown}: "
+                + ", ".join(
+                    f"{name} {best[name] * 1000:.1f} ms ({best['baseline'] / best[name]:.2f}x)" for name in variants
+                )
+            )
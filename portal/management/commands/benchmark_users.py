@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from portal import firebase_utils
+from portal.firebase_clients import firebase_clients, get_db
+
+
+QUERY_METHODS = ("collection", "collection_group", "document", "where", "order_by", "limit", "select", "start_after")
+ROUND_TRIP_METHODS = ("stream", "get")
+
+
+class _RoundTripCounter:
+    """Wraps a Firestore client/reference/query and counts the calls that hit the network."""
+
+    def __init__(self, target, stats):
+        self._target = target
+        self._stats = stats
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if name in ROUND_TRIP_METHODS:
+                self._stats["round_trips"] += 1
+            elif name in QUERY_METHODS:
+                return _RoundTripCounter(result, self._stats)
+            return result
+
+        return wrapper
+
+
+def _get_users_per_user_streams():
+    """Reference loader issuing two subcollection streams per user (the pre-bulk behaviour)."""
+    db = get_db()
+    users = []
+    for doc in db.collection("users").stream():
+        user_data = doc.to_dict()
+        user_data["id"] = doc.id
+        for name in firebase_utils.USER_SUBCOLLECTIONS:
+            stream = db.collection("users").document(doc.id).collection(name).stream()
+            user_data[name] = [{**r.to_dict(), "id": r.id} for r in stream]
+        users.append(user_data)
+    return users
+
+
+class Command(BaseCommand):
+    help = "Compares Firestore round trips and latency of the per-user and bulk user loaders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3, help="Number of runs per loader")
+
+    def handle(self, *args, **options):
+        loaders = [
+            ("per-user streams", _get_users_per_user_streams),
+            ("collection-group bulk", firebase_utils.get_users_with_subcollections),
+        ]
+
+        original_db = get_db()
+        for label, loader in loaders:
+            stats = {"round_trips": 0}
+            with firebase_clients.override(firestore=_RoundTripCounter(original_db, stats)):
+                timings = []
+                users = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    users = loader()
+                    timings.append(time.perf_counter() - started)
+
+            self.stdout.write(
+                f"{label}: {len(users)} users, "
+                f"{stats['round_trips'] // options['repeat']} round trips/run, "
+                f"best {min(timings) * 1000:.1f} ms, worst {max(timings) * 1000:.1f} ms"
+            )
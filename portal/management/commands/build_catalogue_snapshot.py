@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from portal.snapshots import catalogue_snapshot
+
+
+class Command(BaseCommand):
+    help = "Builds the compressed catalogue snapshot and publishes it with its manifest"
+
+    def handle(self, *args, **options):
+        manifest = catalogue_snapshot.manifest()
+        self.stdout.write(
+            f"Snapshot {manifest['version']}: {manifest['count']} exercises, "
+            f"{manifest['size']} bytes ({manifest['format']}) at {manifest['path']}"
+        )
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from portal.image_pipeline import COLLECT_MIN_AGE, collect_unreferenced_images
+
+
+class Command(BaseCommand):
+    help = "Deletes exercise image blobs that no exercise points to"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report the unreferenced blobs")
+        parser.add_argument(
+            "--min-age", type=float, default=COLLECT_MIN_AGE.total_seconds() / 3600,
+            help="Keep blobs uploaded less than this many hours ago",
+        )
+
+    def handle(self, *args, **options):
+        report = collect_unreferenced_images(dry_run=options["dry_run"], min_age=timedelta(hours=options["min_age"]))
+        self.stdout.write(
+            f"{report['unreferenced']} unreferenced blobs ({report['bytes']} bytes), deleted {report['deleted']}"
+        )
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.catalogue_io import FORMATS, export_lines, format_for, iter_exercises
+
+
+class Command(BaseCommand):
+    help = "Streams the exerciseData collection out as JSON Lines or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", help="File to write, stdout by default")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the output file's extension, or jsonl")
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        file_format = options["format"] or (format_for(output) if output else "jsonl")
+
+        stream = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+        count = -1 if file_format == "csv" else 0
+        try:
+            for line in export_lines(iter_exercises(), file_format):
+                stream.write(line)
+                count += 1
+        except Exception as e:
+            raise CommandError(f"Export failed after {max(count, 0)} exercises: {e}")
+        finally:
+            if output:
+                stream.close()
+
+        if output:
+            self.stderr.write(f"Exported {count} exercises to {output}")
@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.catalogue_io import FORMATS, IMPORT_CONCURRENCY, format_for, import_exercises, read_records
+from portal.firebase_utils import FIRESTORE_BATCH_LIMIT
+
+
+def _progress_path(path):
+    return f"{path}.progress"
+
+
+def _load_progress(path):
+    """Returns the committed_through line saved for ``path``, 0 if none or the file changed."""
+    try:
+        with open(_progress_path(path), encoding="utf-8") as progress_file:
+            progress = json.load(progress_file)
+    except FileNotFoundError:
+        return 0
+    stat = os.stat(path)
+    if progress.get("size") != stat.st_size or progress.get("mtime") != stat.st_mtime:
+        raise CommandError(f"{path} changed since the interrupted import, remove {_progress_path(path)} to start over")
+    return progress["committed_through"]
+
+
+def _save_progress(path, committed_through):
+    stat = os.stat(path)
+    temporary = f"{_progress_path(path)}.tmp"
+    with open(temporary, "w", encoding="utf-8") as progress_file:
+        json.dump({"committed_through": committed_through, "size": stat.st_size, "mtime": stat.st_mtime}, progress_file)
+    os.replace(temporary, _progress_path(path))
+
+
+class Command(BaseCommand):
+    help = "Imports exercises from a JSON Lines or CSV file with batched, parallel writes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument("--dry-run", action="store_true", help="Only validate and report")
+        parser.add_argument("--merge", action="store_true", help="Only set the non-empty fields of each record instead of replacing documents")
+        parser.add_argument("--resume", action="store_true", help="Skip the records an interrupted import already wrote")
+        parser.add_argument("--batch-size", type=int, default=FIRESTORE_BATCH_LIMIT)
+        parser.add_argument("--concurrency", type=int, default=IMPORT_CONCURRENCY, help="Batches in flight")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"No such file: {path}")
+        file_format = options["format"] or format_for(path)
+        resume_after = _load_progress(path) if options["resume"] else 0
+        dry_run = options["dry_run"]
+
+        last_saved = 0.0
+
+        def on_progress(line):
+            nonlocal last_saved
+            if time.monotonic() - last_saved >= 1:
+                _save_progress(path, line)
+                last_saved = time.monotonic()
+
+        with open(path, encoding="utf-8-sig", newline="") as source:
+            report = import_exercises(
+                read_records(source, file_format),
+                dry_run=dry_run,
+                merge=options["merge"],
+                resume_after=resume_after,
+                batch_size=options["batch_size"],
+                concurrency=options["concurrency"],
+                on_progress=None if dry_run else on_progress,
+            )
+
+        if not dry_run:
+            if report["failed"] is None:
+                if os.path.exists(_progress_path(path)):
+                    os.remove(_progress_path(path))
+            else:
+                _save_progress(path, report["committed_through"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            self._write_report(report)
+
+        if report["failed"] is not None:
+            raise CommandError(
+                f"Batch at lines {report['failed']['lines'][0]}-{report['failed']['lines'][1]} failed: "
+                f"{report['failed']['error']}. Re-run with --resume to continue after line {report['committed_through']}."
+            )
+
+    def _write_report(self, report):
+        action = "Validated" if report["dry_run"] else "Imported"
+        self.stdout.write(
+            f"{action} {report['valid']} of {report['records']} records in {report['elapsed']:.2f}s "
+            f"({report['written']} written, {report['skipped']} skipped by --resume, {report['invalid']} invalid, "
+            f"{report['duplicates']} duplicate IDs)"
+        )
+        for error in report["errors"]:
+            self.stdout.write(f"  line {error['line']}: {error['error']}" + (f" ({error['id']})" if error["id"] else ""))
+        if report["invalid"] > len(report["errors"]):
+            self.stdout.write(f"  ... and {report['invalid'] - len(report['errors'])} more")
+        if report["ignored_fields"]:
+            ignored = ", ".join(f"{field} ({count})" for field, count in sorted(report["ignored_fields"].items()))
+            self.stdout.write(f"Ignored unknown fields: {ignored}")
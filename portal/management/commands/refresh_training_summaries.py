@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.firebase_clients import get_db
+from portal.instrumentation import bind_context
+from portal.training_analytics import refresh_training_summary
+
+
+class Command(BaseCommand):
+    help = "Folds new routines_progress documents into the users' training summaries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("user_ids", nargs="*", help="Users to refresh, all users by default")
+        parser.add_argument("--rebuild", action="store_true", help="Recompute the summaries from the whole history")
+        parser.add_argument("--concurrency", type=int, default=8, help="Users refreshed at the same time")
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"] or [doc.id for doc in get_db().collection("users").select([]).stream()]
+
+        failures = 0
+        with ThreadPoolExecutor(max_workers=max(1, options["concurrency"])) as executor:
+            futures = [
+                (user_id, executor.submit(bind_context(refresh_training_summary, user_id, rebuild=options["rebuild"])))
+                for user_id in user_ids
+            ]
+            for user_id, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    failures += 1
+                    self.stderr.write(f"{user_id}: {e}")
+
+        self.stdout.write(f"Refreshed {len(user_ids) - failures} of {len(user_ids)} training summaries")
+        if failures:
+            raise CommandError(f"{failures} summaries failed")
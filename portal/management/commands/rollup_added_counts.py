@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from portal.counters import added_count_buffer, roll_up_added_counts
+
+
+class Command(BaseCommand):
+    help = "Moves the added_count shard totals into the exercises' added_count"
+
+    def handle(self, *args, **options):
+        # Increments still buffered in this process go to the shards first
+        added_count_buffer.flush()
+        report = roll_up_added_counts()
+        self.stdout.write(
+            f"Rolled up {report['added']} additions into {report['exercises']} exercises, "
+            f"deleted {report['orphaned_shards']} shards of deleted exercises"
+        )
@@ -0,0 +1,178 @@
+"""
+Request middleware reporting the Firestore/Storage work behind every response.
+
+Each request runs inside instrumentation.collect_metrics(). The totals are returned in
+a Server-Timing header (visible in the browser's network panel) and logged as one JSON
+line on the "portal.requests" logger, at WARNING for requests slower than
+PORTAL_SLOW_REQUEST_MS (settings.LOGGING only shows the others with
+PORTAL_REQUEST_LOG_LEVEL=INFO). With PORTAL_PROFILE_SAMPLE_RATE set, that fraction of
+requests runs under cProfile; the profile is kept only when the request turns out to be slow.
+
+Streamed responses produce their body after the view returns: the calls made while it is
+sent are still counted and the log line is written once it has been, but Server-Timing,
+sent before the body, and the profile only cover the view.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .instrumentation import collect_metrics, use_metrics
+
+logger = logging.getLogger("portal.requests")
+profile_logger = logging.getLogger("portal.profile")
+
+# cProfile can only profile one request of a process at a time
+_profiling = threading.Lock()
+_END = object()
+
+
+def _server_timing(metrics, duration_ms: float) -> str:
+    firestore, storage = metrics["firestore"], metrics["storage"]
+    return ", ".join([
+        f'firestore;dur={firestore["ms"]:.1f};desc="{firestore["rpcs"]} rpcs, {firestore["reads"]} reads, {firestore["writes"]} writes"',
+        f'storage;dur={storage["ms"]:.1f};desc="{storage["rpcs"]} rpcs"',
+        f"total;dur={duration_ms:.1f}",
+    ])
+
+
+class _RequestReport:
+    def __init__(self, request):
+        self.request = request
+        self.slow_ms = getattr(settings, "PORTAL_SLOW_REQUEST_MS", 1000)
+        sample_rate = getattr(settings, "PORTAL_PROFILE_SAMPLE_RATE", 0)
+        self.profiler = None
+        if sample_rate and random.random() < sample_rate and _profiling.acquire(blocking=False):
+            self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+
+    def __enter__(self):
+        self._metrics_context = collect_metrics()
+        self.metrics = self._metrics_context.__enter__()
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError:  # Another profiler (e.g. a debugger) is active
+                self.profiler = None
+                _profiling.release()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self._metrics_context.__exit__(*exc_info)
+        if exc_info[0] is not None:
+            self._finish(None)
+        return False
+
+    def finish(self, response):
+        if not response.streaming:
+            self._finish(response)
+            return response
+
+        self._add_server_timing(response)
+        self._end_profile(self._record(response))
+        if response.is_async:
+            response.streaming_content = self._astream(response, response.streaming_content)
+        else:
+            response.streaming_content = self._stream(response, response.streaming_content)
+        return response
+
+    def _stream(self, response, content):
+        iterator = iter(content)
+        try:
+            while True:
+                with use_metrics(self.metrics):
+                    chunk = next(iterator, _END)
+                if chunk is _END:
+                    return
+                yield chunk
+        finally:
+            self._log(self._record(response))
+
+    async def _astream(self, response, content):
+        iterator = aiter(content)
+        try:
+            while True:
+                with use_metrics(self.metrics):
+                    chunk = await anext(iterator, _END)
+                if chunk is _END:
+                    return
+                yield chunk
+        finally:
+            self._log(self._record(response))
+
+    def _finish(self, response):
+        if response is not None:
+            self._add_server_timing(response)
+        record = self._record(response)
+        self._log(record)
+        self._end_profile(record)
+
+    def _duration_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def _add_server_timing(self, response):
+        timing = _server_timing(self.metrics.as_dict(), self._duration_ms())
+        response["Server-Timing"] = f'{response["Server-Timing"]}, {timing}' if response.has_header("Server-Timing") else timing
+
+    def _record(self, response):
+        return {
+            "method": self.request.method,
+            "path": self.request.path,
+            "status": response.status_code if response is not None else 500,
+            "duration_ms": round(self._duration_ms(), 1),
+            **{
+                f"{service}_{name}": round(value, 1) if isinstance(value, float) else value
+                for service, counters in self.metrics.as_dict().items() for name, value in counters.items()
+            },
+        }
+
+    def _log(self, record):
+        slow = record["duration_ms"] >= self.slow_ms
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record), extra={"request_metrics": record})
+
+    def _end_profile(self, record):
+        if self.profiler is None:
+            return
+        try:
+            if record["duration_ms"] >= self.slow_ms:
+                self._report_profile(record)
+        finally:
+            _profiling.release()
+
+    def _report_profile(self, record):
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats("cumulative").print_stats(30)
+        profile_logger.warning("Slow request %s %s took %.1f ms\n%s", record["method"], record["path"], record["duration_ms"], output.getvalue())
+
+        profile_dir = getattr(settings, "PORTAL_PROFILE_DIR", None)
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{record['method']}-{record['path'].strip('/').replace('/', '_') or 'root'}.prof"
+            self.profiler.dump_stats(os.path.join(profile_dir, name))
+
+
+@sync_and_async_middleware
+def firestore_metrics_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with _RequestReport(request) as report:
+                response = await get_response(request)
+            return report.finish(response)
+    else:
+        def middleware(request):
+            with _RequestReport(request) as report:
+                response = get_response(request)
+            return report.finish(response)
+    return middleware
@@ -0,0 +1,219 @@
+"""
+In-memory search index over the sanitized exercise catalogue.
+
+Names (English and Arabic) are tokenised into an inverted index for free-text search;
+type, category, equipment and muscles are indexed as exact facet values. The index is
+built from get_exercises() and kept current through the portal.signals write signals.
+"""
+
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from django.dispatch import receiver
+
+from .firebase_utils import exercise_cache, get_exercises
+from .signals import exercise_catalogue_loaded, exercise_deleted, exercise_saved
+
+
+TEXT_FIELDS = ("name_en", "name_ar")
+FACET_FIELDS = {
+    "type": ("type",),
+    "category": ("category_en", "category_ar"),
+    "equipment": ("equipment_en", "equipment_ar"),
+    "muscle": ("primaryMuscles_en", "primaryMuscles_ar", "secondaryMuscles_en", "secondaryMuscles_ar"),
+}
+INDEXED_FIELDS = TEXT_FIELDS + tuple(field for fields in FACET_FIELDS.values() for field in fields)
+
+# Harakat, superscript alef and tatweel carry no meaning for matching
+_ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u0640]")
+_ARABIC_LETTER_VARIANTS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ة": "ه", "ى": "ي"})
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Case-folds English and strips Arabic diacritics/letter variants."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _ARABIC_MARKS.sub("", text)
+    return text.translate(_ARABIC_LETTER_VARIANTS).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = _TOKEN.findall(normalize(text))
+    # Drop the Arabic definite article so "الضغط" matches "ضغط"
+    return [token[2:] if token.startswith("ال") and len(token) > 3 else token for token in tokens]
+
+
+def _field_values(exercise: Dict[str, Any], field: str) -> List[str]:
+    value = exercise.get(field)
+    if not value:
+        return []
+    return list(value) if isinstance(value, list) else [value]
+
+
+class ExerciseSearchIndex:
+    """
+    Thread-safe inverted index with facet counts.
+
+    ``_documents`` keeps the indexed values per exercise so partial updates can remove
+    the postings of the values they replace.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._documents: Dict[str, Dict[str, List[str]]] = {}
+        self._tokens: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._facets: Dict[str, Dict[str, Set[str]]] = {facet: {} for facet in FACET_FIELDS}
+        self._built_at: Optional[float] = None
+
+    def _add(self, ex_id: str, document: Dict[str, List[str]], sort_vocabulary: bool = True) -> None:
+        self._documents[ex_id] = document
+        for field in TEXT_FIELDS:
+            for value in document.get(field, ()):
+                for token in tokenize(value):
+                    if token not in self._tokens:
+                        if sort_vocabulary:
+                            bisect.insort(self._vocabulary, token)
+                        self._tokens[token] = set()
+                    self._tokens[token].add(ex_id)
+        for facet, fields in FACET_FIELDS.items():
+            for field in fields:
+                for value in document.get(field, ()):
+                    self._facets[facet].setdefault(normalize(value), set()).add(ex_id)
+
+    def _discard(self, ex_id: str) -> Optional[Dict[str, List[str]]]:
+        document = self._documents.pop(ex_id, None)
+        if document is None:
+            return None
+        for field in TEXT_FIELDS:
+            for value in document.get(field, ()):
+                for token in tokenize(value):
+                    postings = self._tokens.get(token)
+                    if postings is None:
+                        continue
+                    postings.discard(ex_id)
+                    if not postings:
+                        del self._tokens[token]
+                        del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+        for facet, fields in FACET_FIELDS.items():
+            for field in fields:
+                for value in document.get(field, ()):
+                    postings = self._facets[facet].get(normalize(value))
+                    if postings is not None:
+                        postings.discard(ex_id)
+                        if not postings:
+                            del self._facets[facet][normalize(value)]
+        return document
+
+    def rebuild(self, exercises: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._documents = {}
+            self._tokens = {}
+            self._vocabulary = []
+            self._facets = {facet: {} for facet in FACET_FIELDS}
+            for exercise in exercises:
+                document = {field: _field_values(exercise, field) for field in INDEXED_FIELDS}
+                self._add(exercise["id"], document, sort_vocabulary=False)
+            self._vocabulary = sorted(self._tokens)
+            self._built_at = time.monotonic()
+
+    def update(self, ex_id: str, fields: Dict[str, Any], replace: bool = False) -> None:
+        """Re-indexes an exercise; with ``replace`` False only the given fields change."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            document = self._discard(ex_id) or {}
+            if replace:
+                document = {}
+            document.update({field: _field_values(fields, field) for field in INDEXED_FIELDS if field in fields})
+            self._add(ex_id, document)
+
+    def remove(self, ex_id: str) -> None:
+        with self._lock:
+            self._discard(ex_id)
+
+    def invalidate(self) -> None:
+        """Drops the index, the next search rebuilds it from get_exercises()."""
+        with self._lock:
+            self._built_at = None
+
+    def ensure_built(self) -> None:
+        if self._built_at is None or time.monotonic() - self._built_at >= self.ttl:
+            # get_exercises() sends exercise_catalogue_loaded when it hits Firestore
+            exercises = get_exercises()
+            if self._built_at is None or time.monotonic() - self._built_at >= self.ttl:
+                self.rebuild(exercises)
+
+    def _match_text(self, query: str) -> Optional[Set[str]]:
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        matches: Optional[Set[str]] = None
+        for index, token in enumerate(tokens):
+            if index == len(tokens) - 1:
+                # The last token is still being typed, match it as a prefix
+                postings: Set[str] = set()
+                position = bisect.bisect_left(self._vocabulary, token)
+                while position < len(self._vocabulary) and self._vocabulary[position].startswith(token):
+                    postings |= self._tokens[self._vocabulary[position]]
+                    position += 1
+            else:
+                postings = self._tokens.get(token, set())
+            matches = set(postings) if matches is None else matches & postings
+            if not matches:
+                return set()
+        return matches
+
+    def search(self, query: str = "", filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Returns the sorted IDs matching the free-text ``query`` and every facet filter, plus
+        facet value counts over the matches.
+        """
+        self.ensure_built()
+        with self._lock:
+            matches = self._match_text(query or "")
+            for facet, value in (filters or {}).items():
+                if facet not in FACET_FIELDS or not value:
+                    continue
+                postings = self._facets[facet].get(normalize(value), set())
+                matches = set(postings) if matches is None else matches & postings
+            if matches is None:
+                matches = set(self._documents)
+
+            facets = {}
+            for facet, fields in FACET_FIELDS.items():
+                if len(matches) == len(self._documents):
+                    # Unfiltered: the posting list sizes are the counts
+                    counts = Counter({value: len(postings) for value, postings in self._facets[facet].items()})
+                else:
+                    counts = Counter()
+                    for ex_id in matches:
+                        document = self._documents[ex_id]
+                        counts.update({normalize(value) for field in fields for value in document.get(field, ())})
+                facets[facet] = dict(counts.most_common())
+
+            return {"ids": sorted(matches), "total": len(matches), "facets": facets}
+
+
+exercise_search_index = ExerciseSearchIndex(ttl=exercise_cache.ttl)
+
+
+@receiver(exercise_catalogue_loaded)
+def _rebuild_on_catalogue_load(sender, exercises, **kwargs):
+    exercise_search_index.rebuild(exercises)
+
+
+@receiver(exercise_saved)
+def _index_saved_exercise(sender, ex_id, fields, created, **kwargs):
+    exercise_search_index.update(ex_id, fields, replace=created)
+
+
+@receiver(exercise_deleted)
+def _unindex_deleted_exercise(sender, ex_id, **kwargs):
+    exercise_search_index.remove(ex_id)
@@ -0,0 +1,14 @@
+from django.dispatch import Signal
+
+# Sent after an exercise document is written through portal.firebase_utils, and by
+# portal.catalogue_sync for changes written elsewhere (with the whole document).
+# Arguments: ex_id, fields (the sanitized fields written), created (True when the whole
+# document was created or replaced, False for partial updates).
+exercise_saved = Signal()
+
+# Sent after an exercise document is deleted (here or elsewhere). Arguments: ex_id.
+exercise_deleted = Signal()
+
+# Sent after the full sanitized catalogue is (re)loaded from Firestore, by a read or by the
+# catalogue listener's first snapshot. Arguments: exercises.
+exercise_catalogue_loaded = Signal()
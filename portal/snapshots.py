@@ -0,0 +1,261 @@
+"""
+Compressed snapshot of the exercise catalogue, for cold loads in one download.
+
+The sanitized catalogue from get_exercises() is serialised as msgpack (JSON when msgpack
+is not installed), gzip-compressed and stored in the bucket under a hash of its content,
+catalogue_snapshots/{hash}.msgpack.gz, with an immutable Cache-Control. The manifest
+(/portal/exercises/snapshot/, also stored as catalogue_snapshots/manifest.json) names the
+current artifact, its SHA-256 and a ``changes_since`` version: a client downloads the
+artifact once, then follows /portal/exercises/changes/ from that version.
+
+Every exercise is encoded once and kept until the portal.signals write signals replace
+it, so rebuilding after a write only encodes the exercises that changed. The snapshot is
+rebuilt when the manifest is requested after the catalogue changed, or with
+``manage.py build_catalogue_snapshot``.
+
+Artifacts are deterministic (exercises sorted by ID, fields by name), so workers holding
+the same catalogue publish the same one. A worker never replaces a published manifest
+whose ``changes_since`` is newer than its own catalogue's. Datetimes are stored as ISO 8601
+strings.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from django.dispatch import receiver
+
+from .firebase_clients import get_bucket
+from .firebase_utils import UPDATED_AT, catalogue_changes_cursor, exercise_cache, get_exercise_changes, get_exercises
+from .signals import exercise_catalogue_loaded, exercise_deleted, exercise_saved
+
+try:
+    import msgpack
+except ImportError:  # msgpack missing: snapshots are gzipped JSON
+    msgpack = None
+
+SCHEMA_VERSION = 1
+SNAPSHOTS_PREFIX = "catalogue_snapshots/"
+MANIFEST_PATH = f"{SNAPSHOTS_PREFIX}manifest.json"
+SNAPSHOT_FORMAT = "msgpack+gzip" if msgpack is not None else "json+gzip"
+SNAPSHOT_CONTENT_TYPE = "application/gzip"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# The manifest changes with every snapshot, clients revalidate it
+MANIFEST_CACHE_CONTROL = "no-cache"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not serializable")
+
+
+def encode_exercise(exercise: Dict[str, Any]) -> bytes:
+    ordered = {field: exercise[field] for field in sorted(exercise)}
+    if msgpack is not None:
+        return msgpack.packb(ordered, default=_default)
+    return json.dumps(ordered, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+def build_artifact(encoded: List[bytes]) -> bytes:
+    """The compressed snapshot of exercises already passed through encode_exercise()."""
+    if msgpack is not None:
+        packer = msgpack.Packer()
+        body = b"".join([
+            packer.pack_map_header(2),
+            packer.pack("schema"), packer.pack(SCHEMA_VERSION),
+            packer.pack("exercises"), packer.pack_array_header(len(encoded)),
+            *encoded,
+        ])
+    else:
+        body = b'{"schema":%d,"exercises":[' % SCHEMA_VERSION + b",".join(encoded) + b"]}"
+    # A fixed mtime keeps the bytes, and so the hash, a function of the content
+    return gzip.compress(body, mtime=0)
+
+
+def decode_snapshot(artifact: bytes, snapshot_format: str = SNAPSHOT_FORMAT) -> List[Dict[str, Any]]:
+    """The exercises of a snapshot artifact, with their UPDATED_AT back as datetimes."""
+    body = gzip.decompress(artifact)
+    if snapshot_format == "msgpack+gzip":
+        if msgpack is None:
+            raise ValueError("msgpack is not installed")
+        snapshot = msgpack.unpackb(body, raw=False)
+    elif snapshot_format == "json+gzip":
+        snapshot = json.loads(body)
+    else:
+        raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+    if snapshot.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported snapshot schema: {snapshot.get('schema')}")
+
+    exercises = snapshot["exercises"]
+    for exercise in exercises:
+        if isinstance(exercise.get(UPDATED_AT), str):
+            exercise[UPDATED_AT] = datetime.fromisoformat(exercise[UPDATED_AT])
+    return exercises
+
+
+def _artifact_path(digest: str) -> str:
+    extension = "msgpack.gz" if SNAPSHOT_FORMAT == "msgpack+gzip" else "json.gz"
+    return f"{SNAPSHOTS_PREFIX}{digest[:32]}.{extension}"
+
+
+class CatalogueSnapshot:
+    """Builds and publishes the snapshot, re-encoding only the exercises that changed."""
+
+    def __init__(self):
+        # Reentrant: loading the catalogue during a build sends exercise_catalogue_loaded
+        self._lock = threading.RLock()
+        self._encoded: Dict[str, bytes] = {}
+        self._manifest: Optional[Dict[str, Any]] = None
+        # exercise_cache.fingerprint() the manifest was built from
+        self._built_for: Optional[str] = None
+        self._stats = {"builds": 0, "encoded": 0, "reused": 0, "uploads": 0}
+
+    def invalidate(self, ex_id: Optional[str] = None) -> None:
+        with self._lock:
+            if ex_id is None:
+                self._encoded.clear()
+            else:
+                self._encoded.pop(ex_id, None)
+            self._built_for = None
+
+    def reset(self) -> None:
+        """invalidate() that also forgets the published manifest."""
+        with self._lock:
+            self._encoded.clear()
+            self._manifest = None
+            self._built_for = None
+
+    def manifest(self, bucket=None) -> Dict[str, Any]:
+        """The manifest of the current catalogue's snapshot, built and published if needed."""
+        with self._lock:
+            fingerprint = exercise_cache.fingerprint()
+            if self._manifest is not None and fingerprint is not None and fingerprint == self._built_for:
+                return self._manifest
+            return self._build(bucket or get_bucket(), fingerprint)
+
+    def _build(self, bucket, fingerprint: Optional[str]) -> Dict[str, Any]:
+        # Taken before reading the catalogue: a cached catalogue's own load cursor, so
+        # clients following the changes feed from it get every write the cache may miss
+        cursor = catalogue_changes_cursor()
+        if fingerprint is None:
+            get_exercises()
+            fingerprint = exercise_cache.fingerprint()
+        exercises = get_exercises()
+
+        encoded = []
+        for exercise in exercises:
+            item = self._encoded.get(exercise["id"])
+            if item is None:
+                item = self._encoded[exercise["id"]] = encode_exercise(exercise)
+                self._stats["encoded"] += 1
+            else:
+                self._stats["reused"] += 1
+            encoded.append(item)
+        artifact = build_artifact(encoded)
+        digest = hashlib.sha256(artifact).hexdigest()
+        changes_since = int(cursor.timestamp() * 1000)
+
+        if self._manifest is None or self._manifest["sha256"] != digest:
+            published = _published_manifest(bucket)
+            if published is not None and published["changes_since"] > changes_since:
+                # Another worker published from a newer catalogue, keep serving theirs
+                self._manifest = published
+            else:
+                self._manifest = self._publish(bucket, artifact, digest, len(exercises), changes_since)
+
+        self._built_for = fingerprint
+        self._stats["builds"] += 1
+        return self._manifest
+
+    def _publish(self, bucket, artifact: bytes, digest: str, count: int, changes_since: int) -> Dict[str, Any]:
+        blob = bucket.blob(_artifact_path(digest))
+        if not blob.exists():
+            blob.cache_control = IMMUTABLE_CACHE_CONTROL
+            blob.upload_from_string(artifact, content_type=SNAPSHOT_CONTENT_TYPE, predefined_acl="publicRead")
+            self._stats["uploads"] += 1
+
+        manifest = {
+            "schema": SCHEMA_VERSION,
+            "format": SNAPSHOT_FORMAT,
+            "version": digest[:16],
+            "sha256": digest,
+            "path": blob.name,
+            "url": blob.public_url,
+            "size": len(artifact),
+            "count": count,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            # A version for /portal/exercises/changes/ covering every write the snapshot lacks
+            "changes_since": changes_since,
+        }
+        manifest_blob = bucket.blob(MANIFEST_PATH)
+        manifest_blob.cache_control = MANIFEST_CACHE_CONTROL
+        manifest_blob.upload_from_string(json.dumps(manifest), content_type="application/json", predefined_acl="publicRead")
+        return manifest
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "encoded_exercises": len(self._encoded), "version": self._manifest and self._manifest["version"]}
+
+
+catalogue_snapshot = CatalogueSnapshot()
+
+
+def _published_manifest(bucket) -> Optional[Dict[str, Any]]:
+    """The manifest.json in the bucket, None when missing or in a schema or format we can't read."""
+    manifest_blob = bucket.get_blob(MANIFEST_PATH)
+    if manifest_blob is None:
+        return None
+    manifest = json.loads(manifest_blob.download_as_bytes())
+    if manifest.get("schema") != SCHEMA_VERSION or manifest.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return manifest
+
+
+def load_catalogue_snapshot(bucket=None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Loads exercise_cache from the published snapshot plus the changes made since it was
+    built: two downloads and the changes queries instead of one read per exercise.
+    Returns None, leaving the cache alone, when there is no usable snapshot or it is
+    older than the changes feed covers.
+    """
+    bucket = bucket or get_bucket()
+    manifest = _published_manifest(bucket)
+    if manifest is None:
+        return None
+
+    changes = get_exercise_changes(datetime.fromtimestamp(manifest["changes_since"] / 1000, tz=timezone.utc))
+    if changes["full_reload"]:
+        return None
+    artifact = bucket.blob(manifest["path"]).download_as_bytes()
+    if hashlib.sha256(artifact).hexdigest() != manifest["sha256"]:
+        return None
+
+    exercises = {exercise["id"]: exercise for exercise in decode_snapshot(artifact, manifest["format"])}
+    for exercise in changes["updated"]:
+        exercises[exercise["id"]] = exercise
+    for ex_id in changes["deleted"]:
+        exercises.pop(ex_id, None)
+    catalogue = [exercises[ex_id] for ex_id in sorted(exercises)]
+
+    exercise_cache.load_catalogue(catalogue, changes["since"])
+    exercise_catalogue_loaded.send(sender=None, exercises=catalogue)
+    return catalogue
+
+
+@receiver(exercise_catalogue_loaded)
+def _clear_on_catalogue_load(sender, **kwargs):
+    catalogue_snapshot.invalidate()
+
+
+@receiver(exercise_saved)
+def _invalidate_saved_exercise(sender, ex_id, **kwargs):
+    catalogue_snapshot.invalidate(ex_id)
+
+
+@receiver(exercise_deleted)
+def _invalidate_deleted_exercise(sender, ex_id, **kwargs):
+    catalogue_snapshot.invalidate(ex_id)
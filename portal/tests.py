@@ -1,3 +1,935 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import Client, RequestFactory, SimpleTestCase
+from google.api_core.exceptions import NotFound
+
+from . import async_views, catalogue_io
+from .catalogue_sync import catalogue_sync
+from .completeness import completeness_index
+from .counters import SHARDS_COLLECTION, added_count_buffer, most_added, roll_up_added_counts
+from .fragments import card_fragments
+from .fakes import FakeBucket, FakeFirestore, seed_portal_data
+from .firebase_clients import firebase_clients
+from .firebase_utils import (
+    MAX_PAGE_SIZE,
+    TOMBSTONE_COLLECTION,
+    TOMBSTONE_RETENTION,
+    UPDATED_AT,
+    ExerciseSummary,
+    _merge_changes,
+    batch_update_exercises,
+    create_exercise,
+    create_exercises,
+    delete_exercises,
+    exercise_cache,
+    exercise_write_buffer,
+    get_exercise_changes,
+    get_exercises,
+    get_exercises_page,
+    get_users_page,
+    get_users_with_subcollections,
+    sanitize_exercise_payload,
+    update_exercise,
+)
+from .image_pipeline import Image, collect_unreferenced_images
+from .instrumentation import collect_metrics
+from .search import exercise_search_index
+from .snapshots import MANIFEST_PATH, catalogue_snapshot, decode_snapshot, load_catalogue_snapshot
+from .training_analytics import ProgressColumns, empty_state, fold, get_training_summaries, refresh_training_summary, summarize
+
+
+class FakeFirebaseTestCase(SimpleTestCase):
+    """Runs each test against fresh in-memory Firestore/Storage fakes."""
+
+    users = 5
+    exercises = 20
+
+    def setUp(self):
+        self.firestore = FakeFirestore()
+        self.bucket = FakeBucket()
+        seed_portal_data(self.firestore, self.bucket, users=self.users, exercises=self.exercises)
+
+        override = firebase_clients.override(
+            firestore=self.firestore, bucket=self.bucket, async_firestore=self.firestore.async_client()
+        )
+        override.__enter__()
+        self.addCleanup(override.__exit__, None, None, None)
+        self.addCleanup(exercise_write_buffer.flush)
+        self.addCleanup(added_count_buffer.flush)
+        self.addCleanup(self._reset_caches)
+        self._reset_caches()
+
+    def _reset_caches(self):
+        exercise_cache.invalidate()
+        exercise_search_index.invalidate()
+        completeness_index.invalidate()
+        card_fragments.invalidate()
+        catalogue_snapshot.reset()
+
+
+class FakeFirestoreTests(SimpleTestCase):
+    def test_cursor_queries_page_in_both_directions(self):
+        firestore = FakeFirestore()
+        for index in range(5):
+            firestore.put(f"items/item_{index}", {"n": index})
+
+        items = firestore.collection("items")
+        forward = items.order_by("__name__").start_after({"__name__": "item_1"}).limit(2).stream()
+        backward = items.order_by("__name__", direction="DESCENDING").start_after({"__name__": "item_3"}).limit(2).stream()
+
+        self.assertEqual([doc.id for doc in forward], ["item_2", "item_3"])
+        self.assertEqual([doc.id for doc in backward], ["item_2", "item_1"])
+        self.assertEqual(firestore.rpcs["stream"], 2)
+
+    def test_batch_commit_is_atomic(self):
+        firestore = FakeFirestore()
+        firestore.put("items/a", {"n": 1})
+
+        batch = firestore.batch()
+        batch.update(firestore.collection("items").document("a"), {"n": 2})
+        batch.update(firestore.collection("items").document("missing"), {"n": 2})
+
+        with self.assertRaises(NotFound):
+            batch.commit()
+        self.assertEqual(firestore.data("items/a"), {"n": 1})
+
+
+class DataLayerTests(FakeFirebaseTestCase):
+    def test_users_with_subcollections_round_trips_do_not_grow_with_users(self):
+        users = get_users_with_subcollections()
+
+        self.assertEqual(len(users), self.users)
+        self.assertTrue(all(user["routines"] and user["routines_progress"] for user in users))
+        # One users stream plus one collection-group query per subcollection
+        self.assertEqual(self.firestore.rpc_count, 3)
+
+    def test_users_page_cursors(self):
+        first = get_users_page(page_size=2)
+        second = get_users_page(page_size=2, after=first["next_cursor"])
+        back = get_users_page(page_size=2, before=second["prev_cursor"])
+
+        self.assertEqual([user["id"] for user in first["items"]], ["user_00000", "user_00001"])
+        self.assertEqual([user["id"] for user in second["items"]], ["user_00002", "user_00003"])
+        self.assertEqual([user["id"] for user in back["items"]], ["user_00000", "user_00001"])
+        self.assertIsNone(back["prev_cursor"])
+
+    def test_page_edges(self):
+        # 5 users: a page ending on the last user has no next cursor
+        last = get_users_page(page_size=2, after="user_00002")
+        self.assertEqual([user["id"] for user in last["items"]], ["user_00003", "user_00004"])
+        self.assertIsNone(last["next_cursor"])
+        self.assertEqual(last["prev_cursor"], "user_00003")
+        self.assertIsNone(get_users_page(page_size=5)["next_cursor"])
+
+        self.assertEqual(get_users_page(after="user_00004")["items"], [])
+        before_first = get_users_page(before="user_00000")
+        self.assertEqual((before_first["items"], before_first["prev_cursor"]), ([], None))
+        # Cursors need not be existing IDs
+        self.assertEqual([user["id"] for user in get_users_page(page_size=1, after="user_00001x")["items"]], ["user_00002"])
+
+        self.assertEqual(get_users_page(page_size=0)["page_size"], 1)
+        self.assertEqual(get_users_page(page_size=10_000)["page_size"], MAX_PAGE_SIZE)
+
+    def test_cached_and_firestore_pages_agree(self):
+        def walk(**cursor):
+            pages = []
+            while True:
+                page = get_exercises_page(page_size=6, **cursor)
+                pages.append(([exercise["id"] for exercise in page["items"]], page["next_cursor"], page["prev_cursor"]))
+                if not page["next_cursor"]:
+                    return pages
+                cursor = {"after": page["next_cursor"]}
+
+        cached = walk()
+        with mock.patch.object(exercise_cache, "can_hold_catalogue", return_value=False):
+            exercise_cache.invalidate()
+            self.assertEqual(walk(), cached)
+            backward = get_exercises_page(page_size=6, before=cached[-1][0][0])
+        self.assertEqual(backward["items"] and [exercise["id"] for exercise in backward["items"]], cached[-2][0])
+        self.assertEqual([len(ids) for ids, _, _ in cached], [6, 6, 6, 2])
+
+    def test_update_exercise_sanitizes_and_refreshes_the_cache(self):
+        get_exercises()
+        update_exercise("exercise_00001", {"name_en": "  Squat ", "added_count": "7"})
+
+        self.assertEqual(self.firestore.data("exerciseData/exercise_00001")["name_en"], "Squat")
+        self.assertEqual(self.firestore.data("exerciseData/exercise_00001")["added_count"], 7)
+        cached = {exercise["id"]: exercise for exercise in get_exercises()}
+        self.assertEqual(cached["exercise_00001"]["name_en"], "Squat")
+
+    def test_batch_update_reports_missing_documents(self):
+        result = batch_update_exercises(["exercise_00001", "missing", "exercise_00002"], "type", "duration")
+
+        self.assertEqual(result["updated_count"], 2)
+        self.assertEqual(list(result["failures"]), ["missing"])
+        self.assertEqual(self.firestore.data("exerciseData/exercise_00002")["type"], "duration")
+
+    def test_delete_exercises_removes_documents_and_images(self):
+        result = delete_exercises(["exercise_00001", "exercise_00002"], bucket=self.bucket)
+
+        self.assertEqual(result, {"deleted_count": 2, "failures": {}})
+        self.assertIsNone(self.firestore.data("exerciseData/exercise_00001"))
+        self.assertEqual(self.bucket.names("exercise_images/exercise_00001/"), [])
+        self.assertEqual(len(self.bucket.names("exercise_images/exercise_00003/")), 2)
+
+    def test_write_buffer_coalesces_updates(self):
+        exercise_write_buffer.submit("exercise_00001", {"name_en": "A"})
+        exercise_write_buffer.submit("exercise_00001", {"name_ar": "ب"})
+        self.firestore.reset_stats()
+
+        report = exercise_write_buffer.flush()
+
+        self.assertEqual(report["flushed"]["exercise_00001"]["merged_updates"], 2)
+        self.assertEqual(self.firestore.rpcs, {"commit": 1})
+        data = self.firestore.data("exerciseData/exercise_00001")
+        self.assertEqual((data["name_en"], data["name_ar"]), ("A", "ب"))
+
+    def test_failed_flush_is_reported_to_the_next_submit(self):
+        original = get_exercises()[3]["name_en"]
+        exercise_write_buffer.submit("exercise_00002", {"name_en": "Lost"})
+        exercise_write_buffer.submit("exercise_00003", {"name_en": "Lost"})
+        self.firestore.document("exerciseData/exercise_00002").delete()
+
+        def unavailable(updates):
+            return [], {ex_id: "unavailable" for ex_id in updates}
+
+        with self.assertLogs("portal.firebase_utils", "ERROR") as logs:
+            with mock.patch("portal.firebase_utils._commit_updates", side_effect=unavailable):
+                # As the flush timer does
+                exercise_write_buffer._flush()
+        self.assertEqual(len(logs.records), 2)
+
+        # The cache and indexes are back to what Firestore holds, and the catalogue stays whole
+        exercises = {exercise["id"]: exercise for exercise in get_exercises()}
+        self.assertEqual(len(exercises), self.exercises - 1)
+        self.assertEqual(exercises["exercise_00003"]["name_en"], original)
+        self.assertEqual(exercise_search_index.search("Lost", {})["total"], 0)
+
+        with self.assertLogs("portal.firebase_utils", "ERROR"):
+            response = self.client.post("/portal/exercises/exercise_00002/update_field/", json.dumps({"name_en": "Again"}), content_type="application/json").json()
+            self.assertFalse(response["success"])
+            self.assertIn("exercise_00002", response["failures"])
+            self.assertEqual(set(exercise_write_buffer.flush()["failures"]), {"exercise_00002", "exercise_00003"})
+        self.assertEqual(exercise_write_buffer.flush()["failures"], {})
+
+    def test_direct_writes_wait_only_for_the_same_exercise(self):
+        holding, release = threading.Event(), threading.Event()
+        self.addCleanup(release.set)
+
+        def hold():
+            with exercise_write_buffer.direct_write({"exercise_00001": ["name_en"]}):
+                holding.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        holding.wait(5)
+        update_exercise("exercise_00002", {"name_en": "B"})
+        waiting = threading.Thread(target=update_exercise, args=("exercise_00001", {"name_en": "A"}))
+        waiting.start()
+        waiting.join(0.1)
+        self.assertTrue(waiting.is_alive())
+
+        release.set()
+        holder.join(5)
+        waiting.join(5)
+        self.assertEqual(self.firestore.data("exerciseData/exercise_00001")["name_en"], "A")
+        self.assertEqual(self.firestore.data("exerciseData/exercise_00002")["name_en"], "B")
+
+
+    def test_create_exercise_claims_its_id_in_one_round_trip(self):
+        self.assertEqual(create_exercise("Front Squat"), "front_squat")
+        self.assertEqual(self.firestore.rpc_count, 1)
+
+        # Taken IDs get a suffix instead of being overwritten
+        second = create_exercise("Front Squat")
+        self.assertRegex(second, r"^front_squat_[0-9a-f]{6}$")
+        self.assertEqual(self.firestore.data("exerciseData/front_squat")["name_en"], "Front Squat")
+        self.assertIn(second, [exercise["id"] for exercise in get_exercises()])
+
+    def test_create_exercises_reports_conflicts_without_overwriting(self):
+        original = self.firestore.data("exerciseData/exercise_00001")
+        result = create_exercises([
+            {"id": "new_1", "name_en": "New 1"},
+            {"id": "exercise_00001", "name_en": "Clobbered"},
+            {"id": "new_2", "name_en": "New 2"},
+            {"id": "new_1", "name_en": "Repeated"},
+        ])
+
+        self.assertEqual(result, {"created": ["new_1", "new_2"], "conflicts": ["new_1", "exercise_00001"], "failures": {}})
+        self.assertEqual(self.firestore.data("exerciseData/exercise_00001"), original)
+        self.assertEqual(self.firestore.data("exerciseData/new_1")["name_en"], "New 1")
+
+    def test_summary_pages_share_cached_summaries(self):
+        first = get_exercises_page(page_size=5, shape="summary")["items"]
+        again = get_exercises_page(page_size=5, shape="summary")["items"]
+
+        self.assertIsInstance(first[0], ExerciseSummary)
+        self.assertIs(first[0], again[0])
+        self.assertEqual(first[0]["name_en"], self.firestore.data("exerciseData/exercise_00000")["name_en"])
+
+        update_exercise("exercise_00000", {"name_en": "Renamed", "instructions_en": []})
+        summary = get_exercises_page(page_size=5, shape="summary")["items"][0]
+        self.assertEqual((summary.name_en, summary.has_instructions), ("Renamed", False))
+
+    def test_summary_pages_select_fields_from_firestore(self):
+        with mock.patch.object(exercise_cache, "can_hold_catalogue", return_value=False):
+            with collect_metrics() as full:
+                get_exercises_page(page_size=10)
+            exercise_cache.invalidate()
+            with collect_metrics() as summary:
+                page = get_exercises_page(page_size=10, shape="summary")
+
+        self.assertEqual(len(page["items"]), 10)
+        self.assertTrue(page["items"][0].has_instructions)
+        self.assertLess(summary.firestore["bytes_read"], full.firestore["bytes_read"])
+        # Partial documents are not cached
+        self.assertEqual(exercise_cache.stats()["entries"], 0)
+
+
+class ViewTests(FakeFirebaseTestCase):
+    def test_exercises_view_applies_search_filters(self):
+        response = self.client.get("/portal/exercises/", {"category": "Chest"})
+
+        self.assertEqual(response.status_code, 200)
+        chest = [path for path in self.firestore.paths("exerciseData") if self.firestore.data(path)["category_en"] == "Chest"]
+        self.assertEqual(response.context["search"]["total"], len(chest))
+
+    def test_list_renders_summaries_and_cards_load_on_expand(self):
+        response = self.client.get("/portal/exercises/", {"page_size": 5})
+        self.assertNotContains(response, "Step 1")
+        self.assertNotContains(response, "instructions-en-list-")
+
+        response = self.client.get("/portal/exercises/exercise_00001/detail/")
+        self.assertContains(response, "instructions-en-list-exercise_00001")
+        self.assertContains(response, "Step 1")
+        self.assertEqual(self.client.get("/portal/exercises/missing/detail/").status_code, 404)
+
+    def test_cards_are_streamed_from_the_fragment_cache(self):
+        before = card_fragments.stats()
+        response = self.client.get("/portal/exercises/", {"page_size": 3})
+        self.assertTrue(response.streaming)
+        first = b"".join(response.streaming_content).decode()
+        self.assertEqual(card_fragments.stats()["misses"] - before["misses"], 3)
+
+        update_exercise("exercise_00001", {"name_en": "Renamed Squat"})
+        second = b"".join(self.client.get("/portal/exercises/", {"page_size": 3}).streaming_content).decode()
+
+        self.assertEqual(card_fragments.stats()["hits"] - before["hits"], 2)
+        self.assertIn("Renamed Squat", second)
+        self.assertEqual(first.count('class="card exercise"'), 3)
+        self.assertLess(first.index("<h1>Exercises</h1>"), first.index("exercise-exercise_00000"))
+        self.assertLess(first.index("exercise-exercise_00002"), first.index("cropModal"))
+
+    def test_card_details_are_cached_until_written(self):
+        self.client.get("/portal/exercises/exercise_00001/detail/")
+        self.firestore.reset_stats()
+        exercise_cache.invalidate()
+
+        self.assertContains(self.client.get("/portal/exercises/exercise_00001/detail/"), "exercise_00001")
+        self.assertEqual(self.firestore.rpc_count, 0)
+
+        update_exercise("exercise_00001", {"name_ar": "قرفصاء"})
+        self.assertContains(self.client.get("/portal/exercises/exercise_00001/detail/"), "قرفصاء")
+
+    def test_unchanged_pages_are_answered_with_304_without_reads(self):
+        response = self.client.get("/portal/exercises/", {"page_size": 3})
+        b"".join(response.streaming_content)
+        etag = response["ETag"]
+        search_etag = self.client.get("/portal/exercises/search/", {"q": "squat"})["ETag"]
+        self.firestore.reset_stats()
+
+        response = self.client.get("/portal/exercises/", {"page_size": 3}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get("/portal/exercises/search/", {"q": "squat"}, HTTP_IF_NONE_MATCH=search_etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.firestore.rpc_count, 0)
+        # Other parameters are another resource
+        self.assertEqual(self.client.get("/portal/exercises/", {"page_size": 4}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        update_exercise("exercise_00001", {"name_en": "Renamed Squat"})
+        response = self.client.get("/portal/exercises/", {"page_size": 3}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_responses_are_compressed(self):
+        response = self.client.get("/portal/exercises/", {"page_size": 3}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(b"exercise-exercise_00002", gzip.decompress(b"".join(response.streaming_content)))
+
+        response = self.client.get("/portal/exercises/completeness/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertTrue(json.loads(gzip.decompress(response.content))["success"])
+
+    def test_create_then_delete_exercise(self):
+        response = self.client.post(
+            "/portal/exercises/create/",
+            json.dumps({"id": "new_exercise", "name_en": " New ", "type": "duration"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json(), {"success": True, "id": "new_exercise"})
+        self.assertEqual(self.firestore.data("exerciseData/new_exercise")["name_en"], "New")
+
+        response = self.client.post(
+            "/portal/exercises/create/", json.dumps({"id": "new_exercise", "name_en": "Other"}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.firestore.data("exerciseData/new_exercise")["name_en"], "New")
+
+        response = self.client.post("/portal/exercises/new_exercise/delete/")
+        self.assertTrue(response.json()["success"])
+        self.assertIsNone(self.firestore.data("exerciseData/new_exercise"))
+
+    @skipIf(Image is None, "Pillow is not installed")
+    def test_upload_stores_full_image_and_thumbnail(self):
+        source = io.BytesIO()
+        Image.new("RGB", (2400, 1200), (200, 10, 10)).save(source, format="PNG")
+        source.seek(0)
+        source.name = "image.png"
+
+        response = self.client.post("/portal/exercises/upload_image/", {
+            "exercise_name": "exercise_00001", "image_type": "1", "image": source,
+        })
+
+        self.assertTrue(response.json()["success"])
+        names = self.bucket.names("exercise_images/exercise_00001/")
+        # The replaced 1.jpg is left for collect_unreferenced_images(), 2.jpg is another slot
+        self.assertEqual(len(names), 4)
+        self.assertRegex(names[0], r"^exercise_images/exercise_00001/1-[0-9a-f]{32}\.jpg$")
+        self.assertEqual(names[1:], [names[0][:-4] + "_thumb.webp", "exercise_images/exercise_00001/1.jpg", "exercise_images/exercise_00001/2.jpg"])
+        self.assertEqual(self.bucket.get_blob(names[0]).cache_control, "public, max-age=31536000, immutable")
+        data = self.firestore.data("exerciseData/exercise_00001")
+        self.assertEqual(data["image_1_thumb"], response.json()["thumbnailUrl"])
+
+        # The same file again is not uploaded twice
+        self.bucket.reset_stats()
+        source.seek(0)
+        response = self.client.post("/portal/exercises/upload_image/", {
+            "exercise_name": "exercise_00001", "image_type": "1", "image": source,
+        })
+        self.assertEqual(response.json()["newImageUrl"], data["image_1"])
+        self.assertEqual(self.bucket.rpcs["upload"], 0)
+        self.assertEqual(self.bucket.names("exercise_images/exercise_00001/"), names)
+
+        self.assertEqual(collect_unreferenced_images(min_age=timedelta(0))["deleted"], 1)
+        self.assertNotIn("exercise_images/exercise_00001/1.jpg", self.bucket.names("exercise_images/exercise_00001/"))
+
+    @skipIf(Image is None, "Pillow is not installed")
+    def test_failed_upload_leaves_the_exercise_and_old_image(self):
+        source = io.BytesIO()
+        Image.new("RGB", (200, 100), (10, 200, 10)).save(source, format="PNG")
+        source.seek(0)
+        source.name = "image.png"
+        before = self.firestore.data("exerciseData/exercise_00001")
+        names = self.bucket.names("exercise_images/exercise_00001/")
+
+        with self.assertLogs("portal.views", "ERROR") as logs, mock.patch("portal.image_pipeline._upload", side_effect=RuntimeError("upload failed")):
+            response = self.client.post("/portal/exercises/upload_image/", {
+                "exercise_name": "exercise_00001", "image_type": "1", "image": source,
+            })
+        self.assertIn("Error uploading image for exercise_00001", logs.output[0])
+
+        self.assertFalse(response.json()["success"])
+        self.assertEqual(self.firestore.data("exerciseData/exercise_00001"), before)
+        self.assertEqual(self.bucket.names("exercise_images/exercise_00001/"), names)
+
+    def test_collect_unreferenced_images(self):
+        self.bucket.put("exercise_images/deleted_exercise/1.jpg", bytes(10))
+        self.firestore.put("exerciseData/exercise_00002", {**self.firestore.data("exerciseData/exercise_00002"), "image_2": ""})
+
+        self.assertEqual(collect_unreferenced_images(), {"unreferenced": 0, "bytes": 0, "deleted": 0})
+        report = collect_unreferenced_images(min_age=timedelta(0))
+        self.assertEqual(report, {"unreferenced": 2, "bytes": 74, "deleted": 2})
+        self.assertEqual(self.bucket.names("exercise_images/deleted_exercise/"), [])
+        self.assertEqual(self.bucket.names("exercise_images/exercise_00002/"), ["exercise_images/exercise_00002/1.jpg"])
+
+
+class CsrfTests(FakeFirebaseTestCase):
+    def test_catalogue_wide_writes_require_the_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        response = client.post("/portal/exercises/bulk_delete/", json.dumps({"exercise_ids": ["exercise_00001"]}), content_type="text/plain")
+        self.assertEqual(response.status_code, 403)
+        self.assertIsNotNone(self.firestore.data("exerciseData/exercise_00001"))
+
+        upload = io.BytesIO(b'{"id": "exercise_00001", "name_en": "Replaced"}\n')
+        upload.name = "exercises.jsonl"
+        self.assertEqual(client.post("/portal/exercises/import/", {"file": upload}).status_code, 403)
+        self.assertNotEqual(self.firestore.data("exerciseData/exercise_00001")["name_en"], "Replaced")
+
+        response = client.post("/portal/exercises/bulk_create/", json.dumps({"exercises": [{"id": "forged"}]}), content_type="text/plain")
+        self.assertEqual(response.status_code, 403)
+        self.assertIsNone(self.firestore.data("exerciseData/forged"))
+
+        body = {"field": "name_en", "value": "Forged", "exercise_ids": ["exercise_00001"]}
+        response = client.post("/portal/exercises/batch_update/", json.dumps(body), content_type="text/plain")
+        self.assertEqual(response.status_code, 403)
+        self.assertNotEqual(self.firestore.data("exerciseData/exercise_00001")["name_en"], "Forged")
+
+
+class AsyncViewTests(FakeFirebaseTestCase):
+    async def test_update_and_delete_through_async_client(self):
+        factory = RequestFactory()
+
+        response = await async_views.update_exercise_type(
+            factory.post("/portal/exercises/exercise_00001/update_type/", {"exercise_type": "distance"}), "exercise_00001"
+        )
+        self.assertTrue(json.loads(response.content)["success"])
+        self.assertEqual(self.firestore.data("exerciseData/exercise_00001")["type"], "distance")
+
+        response = await async_views.bulk_delete(factory.post(
+            "/portal/exercises/bulk_delete/", json.dumps({"exercise_ids": ["exercise_00001"]}), content_type="application/json"
+        ))
+        self.assertEqual(json.loads(response.content)["deleted_count"], 1)
+        self.assertEqual(self.bucket.names("exercise_images/exercise_00001/"), [])
+
+
+class CatalogueIOTests(FakeFirebaseTestCase):
+    def _export(self, file_format):
+        return "".join(catalogue_io.export_lines(catalogue_io.iter_exercises(page_size=7), file_format))
+
+    def _import(self, text, file_format="jsonl", **options):
+        return catalogue_io.import_exercises(catalogue_io.read_records(io.StringIO(text), file_format), **options)
+
+    def test_export_then_import_round_trips(self):
+        for file_format in catalogue_io.FORMATS:
+            with self.subTest(file_format=file_format):
+                exported = self._export(file_format)
+                original = {path: self.firestore.data(path) for path in self.firestore.paths("exerciseData")}
+                for path in original:
+                    self.firestore.collection("exerciseData").document(path.rsplit("/", 1)[1]).delete()
+
+                report = self._import(exported, file_format, batch_size=6, concurrency=2)
+
+                self.assertEqual((report["written"], report["invalid"], report["failed"]), (self.exercises, 0, None))
+                for path, data in original.items():
+                    imported = self.firestore.data(path)
+                    imported.pop("updated_at")
+                    expected = sanitize_exercise_payload({**data, "id": path.rsplit("/", 1)[1]}, apply_defaults=True)
+                    self.assertEqual(imported, expected)
+
+    def test_dry_run_reports_invalid_records_without_writing(self):
+        text = '{"id": "a", "name_en": "A", "colour": "red"}\nnot json\n{"name_en": "no id"}\n{"id": "a/b"}\n{"id": "a"}\n'
+
+        report = self._import(text, dry_run=True)
+
+        self.assertEqual((report["records"], report["valid"], report["invalid"], report["duplicates"]), (5, 2, 3, 1))
+        self.assertEqual([error["line"] for error in report["errors"]], [2, 3, 4])
+        self.assertEqual(report["ignored_fields"], {"colour": 1})
+        self.assertIsNone(self.firestore.data("exerciseData/a"))
+
+    def test_failed_batch_can_be_resumed(self):
+        text = "".join(json.dumps({"id": f"imported_{index:02d}", "name_en": str(index)}) + "\n" for index in range(10))
+        commit_sets = catalogue_io._commit_sets
+        calls = []
+
+        def flaky(batch_items, merge):
+            calls.append(batch_items)
+            if len(calls) == 2:
+                raise RuntimeError("deadline exceeded")
+            commit_sets(batch_items, merge)
+
+        with mock.patch.object(catalogue_io, "_commit_sets", flaky):
+            report = self._import(text, batch_size=3, concurrency=1)
+        self.assertEqual((report["committed_through"], report["failed"]["lines"]), (3, [4, 6]))
+
+        report = self._import(text, batch_size=3, resume_after=report["committed_through"])
+
+        self.assertEqual((report["skipped"], report["written"], report["committed_through"]), (3, 7, 10))
+        self.assertEqual(len(self.firestore.paths("exerciseData")), self.exercises + 10)
+
+    def test_import_command_and_export_endpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "exercises.csv")
+            with open(path, "w", encoding="utf-8", newline="") as csv_file:
+                csv_file.write('id,name_ar,primaryMuscles_en\nnew_1,ضغط,"[""Chest""]"\nnew_2,,Back\n')
+
+            out = io.StringIO()
+            call_command("import_exercises", path, "--merge", stdout=out)
+
+            self.assertIn("Imported 2 of 2 records", out.getvalue())
+            self.assertFalse(os.path.exists(path + ".progress"))
+        self.assertEqual(self.firestore.data("exerciseData/new_1")["primaryMuscles_en"], ["Chest"])
+        self.assertNotIn("name_ar", self.firestore.data("exerciseData/new_2"))
+
+        response = self.client.get("/portal/exercises/export/", {"format": "jsonl"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), self.exercises + 2)
+        self.assertEqual(json.loads(lines[-1])["primaryMuscles_en"], ["Back"])
+
+
+class ExerciseChangesTests(FakeFirebaseTestCase):
+    def test_changes_since_a_version(self):
+        version = self.client.get("/portal/exercises/changes/").json()["version"]
+        update_exercise("exercise_00001", {"name_en": "Squat"})
+        delete_exercises(["exercise_00002"])
+
+        changes = self.client.get("/portal/exercises/changes/", {"since": version}).json()
+
+        self.assertFalse(changes["full_reload"])
+        self.assertEqual([exercise["id"] for exercise in changes["updated"]], ["exercise_00001"])
+        self.assertEqual(changes["updated"][0]["name_en"], "Squat")
+        self.assertEqual(changes["deleted"], ["exercise_00002"])
+        self.assertGreaterEqual(changes["version"], version)
+
+    def test_recreated_exercise_is_reported_as_updated(self):
+        since = get_exercise_changes(None)["since"]
+        delete_exercises(["exercise_00003"])
+        self.client.post("/portal/exercises/create/", json.dumps({"id": "exercise_00003", "name_en": "Back"}), content_type="application/json")
+
+        changes = get_exercise_changes(since)
+
+        self.assertEqual([exercise["id"] for exercise in changes["updated"]], ["exercise_00003"])
+        self.assertEqual(changes["deleted"], [])
+
+    def test_merge_keeps_whichever_of_write_and_delete_came_last(self):
+        stamp = get_exercise_changes(None)["since"]
+        firestore = FakeFirestore()
+        for ex_id, updated_at, deleted_at in (
+            ("rewritten", stamp + timedelta(seconds=2), stamp + timedelta(seconds=1)),
+            ("deleted", stamp + timedelta(seconds=1), stamp + timedelta(seconds=2)),
+        ):
+            firestore.put(f"exerciseData/{ex_id}", {"name_en": ex_id, UPDATED_AT: updated_at})
+            firestore.put(f"{TOMBSTONE_COLLECTION}/{ex_id}", {"deleted_at": deleted_at})
+        firestore.put(f"{TOMBSTONE_COLLECTION}/gone", {"deleted_at": stamp})
+
+        changes = _merge_changes(
+            stamp, stamp - timedelta(seconds=5),
+            firestore.collection("exerciseData").stream(), firestore.collection(TOMBSTONE_COLLECTION).stream(),
+        )
+
+        self.assertEqual([exercise["id"] for exercise in changes["updated"]], ["rewritten"])
+        self.assertEqual(changes["deleted"], ["deleted", "gone"])
+        # The cursor never moves back
+        self.assertEqual(changes["since"], stamp)
+
+    def test_writes_stamp_updated_at_and_deletes_leave_tombstones(self):
+        since = get_exercise_changes(None)["since"]
+        batch_update_exercises(["exercise_00005", "exercise_00006"], "type", "duration")
+        delete_exercises(["exercise_00007"])
+
+        for ex_id in ("exercise_00005", "exercise_00006"):
+            self.assertGreater(self.firestore.data(f"exerciseData/{ex_id}")[UPDATED_AT], since)
+        self.assertGreater(self.firestore.data(f"{TOMBSTONE_COLLECTION}/exercise_00007")["deleted_at"], since)
+        changes = get_exercise_changes(since)
+        self.assertEqual([exercise["id"] for exercise in changes["updated"]], ["exercise_00005", "exercise_00006"])
+        self.assertEqual(changes["deleted"], ["exercise_00007"])
+
+    def test_since_older_than_tombstone_retention_needs_full_reload(self):
+        cursor = get_exercise_changes(None)["since"]
+        self.assertTrue(get_exercise_changes(cursor - TOMBSTONE_RETENTION - timedelta(minutes=1))["full_reload"])
+        self.assertFalse(get_exercise_changes(cursor - TOMBSTONE_RETENTION + timedelta(minutes=1))["full_reload"])
+
+    def test_cursors_handed_out_with_a_cached_catalogue_cover_its_age(self):
+        get_exercises()
+        loaded_since = exercise_cache.changes_since()
+        # Written by another worker once this one cached the catalogue
+        data = self.firestore.data("exerciseData/exercise_00008")
+        self.firestore.put("exerciseData/exercise_00008", {**data, "name_en": "Elsewhere", UPDATED_AT: loaded_since + timedelta(seconds=10)})
+
+        with mock.patch("portal.firebase_utils._now", return_value=loaded_since + timedelta(minutes=2)):
+            full = get_exercise_changes(None)
+            page = b"".join(self.client.get("/portal/exercises/").streaming_content).decode()
+        self.assertTrue(full["full_reload"])
+        self.assertEqual(full["since"], loaded_since)
+        self.assertIn(str(int(loaded_since.timestamp() * 1000)), page)
+        self.assertEqual([exercise["id"] for exercise in get_exercise_changes(full["since"])["updated"]], ["exercise_00008"])
+
+    def test_missing_or_invalid_since(self):
+        self.assertTrue(self.client.get("/portal/exercises/changes/").json()["full_reload"])
+        self.assertTrue(self.client.get("/portal/exercises/changes/", {"since": "2000-01-01T00:00:00Z"}).json()["full_reload"])
+        self.assertEqual(self.client.get("/portal/exercises/changes/", {"since": "yesterday"}).status_code, 400)
+
+    async def test_async_view(self):
+        since = get_exercise_changes(None)["since"]
+        update_exercise("exercise_00004", {"type": "duration"})
+
+        response = await async_views.exercise_changes(RequestFactory().get("/portal/exercises/changes/", {"since": since.isoformat()}))
+
+        self.assertEqual([exercise["id"] for exercise in json.loads(response.content)["updated"]], ["exercise_00004"])
+
+
+class CompletenessTests(FakeFirebaseTestCase):
+    def test_scores_follow_writes_without_reads(self):
+        self.assertTrue(completeness_index.get("exercise_00001")["complete"])
+
+        with collect_metrics() as metrics:
+            update_exercise("exercise_00001", {"instructions_en": []})
+            delete_exercises(["exercise_00002"])
+            entry = completeness_index.get("exercise_00001")
+            report = completeness_index.report()
+
+        self.assertEqual(metrics.firestore["reads"], 0)
+        self.assertFalse(entry["complete"])
+        self.assertIn("instructions_en", entry["missing"])
+        self.assertIsNone(completeness_index.get("exercise_00002"))
+        self.assertEqual((report["summary"]["total"], report["summary"]["complete"]), (self.exercises - 1, self.exercises - 2))
+
+    def test_report_filters_and_pages(self):
+        update_exercise("exercise_00003", {"image_1": ""})
+        update_exercise("exercise_00004", {"primaryMuscles_en": []})
+
+        response = self.client.get("/portal/exercises/completeness/", {"complete": "0", "page_size": 1}).json()
+        self.assertEqual(response["summary"]["total"], 2)
+        self.assertEqual([item["id"] for item in response["items"]], ["exercise_00003"])
+        self.assertIn("image_1", response["items"][0]["missing"])
+        self.assertEqual(response["next_cursor"], "exercise_00003")
+
+        response = self.client.get("/portal/exercises/completeness/", {"missing": "primaryMuscles_en"}).json()
+        self.assertEqual([item["id"] for item in response["items"]], ["exercise_00004"])
+        self.assertEqual(self.client.get("/portal/exercises/completeness/", {"missing": "nope"}).status_code, 400)
+
+    def test_csv_report(self):
+        update_exercise("exercise_00005", {"image_1": "", "instructions_en": []})
+
+        response = self.client.get("/portal/exercises/completeness/report.csv", {"complete": "0"})
+
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][:2], ["Exercise Name", "Exercise ID"])
+        self.assertEqual(rows[1][1:2] + rows[1][4:7], ["exercise_00005", "Yes", "No", "Yes"])
+        self.assertEqual(len(rows), 2)
+
+
+class AddedCountTests(FakeFirebaseTestCase):
+    def shard_counts(self, ex_id):
+        return [self.firestore.data(path)["count"] for path in self.firestore.paths(f"exerciseData/{ex_id}/{SHARDS_COLLECTION}")]
+
+    def test_increments_are_buffered_then_rolled_up(self):
+        before = {ex_id: self.firestore.data(f"exerciseData/{ex_id}")["added_count"] for ex_id in ("exercise_00001", "exercise_00002")}
+        for _ in range(3):
+            self.client.post("/portal/exercises/exercise_00001/added/")
+        response = self.client.post("/portal/exercises/exercise_00002/added/", json.dumps({"count": 1000}), content_type="application/json")
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(self.firestore.rpc_count, 0)
+
+        self.assertEqual(added_count_buffer.flush(), {"exercises": 2, "added": 1003})
+        self.assertEqual(self.firestore.rpcs["commit"], 1)
+        self.assertEqual(sum(self.shard_counts("exercise_00001")), 3)
+
+        self.assertEqual(roll_up_added_counts(), {"exercises": 2, "added": 1003, "orphaned_shards": 0})
+        self.assertEqual(self.firestore.data("exerciseData/exercise_00001")["added_count"], before["exercise_00001"] + 3)
+        self.assertEqual(set(self.shard_counts("exercise_00002")), {0})
+        self.assertEqual(roll_up_added_counts()["exercises"], 0)
+
+        ranking = self.client.get("/portal/exercises/most_added/", {"limit": 3}).json()["items"]
+        self.assertEqual(ranking[0], {**ranking[0], "id": "exercise_00002", "added_count": before["exercise_00002"] + 1000})
+        self.assertEqual(len(ranking), 3)
+
+    def test_roll_up_deletes_shards_of_deleted_exercises(self):
+        added_count_buffer.record("exercise_00003", 2)
+        added_count_buffer.flush()
+        delete_exercises(["exercise_00003"])
+
+        self.assertEqual(roll_up_added_counts(), {"exercises": 0, "added": 0, "orphaned_shards": 1})
+        self.assertEqual(self.shard_counts("exercise_00003"), [])
+        self.assertNotIn("exercise_00003", [item["id"] for item in most_added(100)])
+
+
+class CatalogueSnapshotTests(FakeFirebaseTestCase):
+    def download(self, name):
+        return self.bucket.blob(name).download_as_bytes()
+
+    def test_snapshot_is_rebuilt_for_changed_exercises_only(self):
+        manifest = self.client.get("/portal/exercises/snapshot/").json()
+        self.assertEqual(manifest["count"], self.exercises)
+        self.assertEqual(json.loads(self.download(MANIFEST_PATH))["sha256"], manifest["sha256"])
+        artifact = self.download(manifest["path"])
+        self.assertEqual(len(artifact), manifest["size"])
+        self.assertEqual(decode_snapshot(artifact), get_exercises())
+
+        self.bucket.reset_stats()
+        etag = self.client.get("/portal/exercises/snapshot/").headers["ETag"]
+        self.assertEqual(self.client.get("/portal/exercises/snapshot/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.bucket.rpc_count, 0)
+
+        update_exercise("exercise_00004", {"name_en": "Renamed"})
+        encoded = catalogue_snapshot.stats()["encoded"]
+        updated = self.client.get("/portal/exercises/snapshot/").json()
+        self.assertNotEqual(updated["version"], manifest["version"])
+        self.assertEqual(catalogue_snapshot.stats()["encoded"], encoded + 1)
+        exercises = {exercise["id"]: exercise for exercise in decode_snapshot(self.download(updated["path"]))}
+        self.assertEqual(exercises["exercise_00004"]["name_en"], "Renamed")
+
+    def test_cold_load_reads_snapshot_and_changes(self):
+        catalogue_snapshot.manifest()
+        update_exercise("exercise_00002", {"name_en": "Changed"})
+        delete_exercises(["exercise_00003"])
+        exercise_cache.invalidate()
+        self.firestore.reset_stats()
+
+        with self.settings(PORTAL_CATALOGUE_SNAPSHOT_COLD_LOAD=True):
+            exercises = {exercise["id"]: exercise for exercise in get_exercises()}
+        self.assertEqual(len(exercises), self.exercises - 1)
+        self.assertEqual(exercises["exercise_00002"]["name_en"], "Changed")
+        self.assertNotIn("exercise_00003", exercises)
+        # Only the changed exercise and the tombstone are read from Firestore
+        self.assertEqual(self.firestore.rpcs, {"stream": 2})
+        self.assertIsNone(load_catalogue_snapshot(FakeBucket()))
+
+    def test_manifest_covers_the_cached_catalogue_and_never_goes_back(self):
+        get_exercises()
+        loaded_since = exercise_cache.changes_since()
+        with mock.patch("portal.firebase_utils._now", return_value=loaded_since + timedelta(minutes=2)):
+            manifest = catalogue_snapshot.manifest()
+        self.assertEqual(manifest["changes_since"], int(loaded_since.timestamp() * 1000))
+
+        newer = {**manifest, "sha256": "0" * 64, "version": "0" * 16, "changes_since": manifest["changes_since"] + 60000}
+        self.bucket.blob(MANIFEST_PATH).upload_from_string(json.dumps(newer), content_type="application/json")
+        update_exercise("exercise_00004", {"name_en": "Renamed"})
+        self.assertEqual(catalogue_snapshot.manifest(), newer)
+        self.assertEqual(json.loads(self.download(MANIFEST_PATH)), newer)
+
+
+class TrainingAnalyticsTests(FakeFirebaseTestCase):
+    users = 2
+
+    def test_fold_and_summarize(self):
+        columns = ProgressColumns.from_docs([
+            {"routine_id": "r1", "date": "2025-03-01", "completed_sets": [
+                {"reps": 10, "weight": 50, "prev_reps": 8, "prev_weight": 50},
+                {"reps": 5, "weight": 80, "prev_reps": 5, "prev_weight": 80},
+            ]},
+            {"routine_id": "r1", "date": "2025-03-02", "completed_sets": [{"reps": 6, "weight": 60, "prev_reps": 8, "prev_weight": 60}]},
+            {"routine_id": "r2", "date": "2025-03-04", "completed_sets": [{"reps": 12, "weight": 20}]},
+            {"routine_id": "r2", "completed_sets": [{"reps": 1, "weight": 500}]},
+        ])
+
+        summary = summarize(fold(empty_state(), columns), today=date(2025, 3, 5))
+
+        self.assertEqual((summary["sessions"], summary["sets"], summary["reps"]), (3, 4, 33))
+        self.assertEqual(summary["volume"], 500 + 400 + 360 + 240)
+        self.assertEqual((summary["best_weight"], summary["best_session_volume"]), (80, 900))
+        self.assertEqual(summary["progression"], {"improved": 1, "matched": 1, "regressed": 1, "compared": 3, "improved_percent": 33})
+        self.assertEqual((summary["current_streak"], summary["longest_streak"], summary["last_active"]), (1, 2, "2025-03-04"))
+        self.assertEqual(summary["routines"][0], {"id": "r1", "sessions": 2, "volume": 1260})
+
+    def test_refresh_folds_only_new_progress(self):
+        summary = get_training_summaries(["user_00000"])["user_00000"]
+        self.assertEqual(summary["sessions"], 10)
+
+        progress = self.firestore.collection("users").document("user_00000").collection("routines_progress")
+        progress.document("late").set({"routine_id": "routine_0", "date": "2025-12-31", "completed_sets": [{"reps": 10, "weight": 100}]})
+        with collect_metrics() as metrics:
+            state = refresh_training_summary("user_00000")
+
+        # The stored summary plus the documents on or after the watermark
+        self.assertLessEqual(metrics.firestore["reads"], 5)
+        self.assertEqual(state["sessions"], 11)
+        self.assertEqual(refresh_training_summary("user_00000")["sessions"], 11)
+        self.assertEqual(refresh_training_summary("user_00000", rebuild=True)["volume"], state["volume"])
+
+    def test_users_page_reads_summaries_instead_of_history(self):
+        get_training_summaries(["user_00000", "user_00001"])
+        self.firestore.reset_stats()
+
+        response = self.client.get("/portal/users/")
+
+        self.assertContains(response, "sessions")
+        self.assertEqual(self.firestore.rpcs["stream"], 1 + self.users)
+        self.assertEqual(self.firestore.rpcs["get_all"], 1)
+
+    async def test_async_users_view_stores_missing_summaries(self):
+        response = await async_views.users_view(RequestFactory().get("/portal/users/"))
+
+        self.assertContains(response, "Streak")
+        self.assertEqual(sorted(self.firestore.paths("userTrainingSummaries")), ["userTrainingSummaries/user_00000", "userTrainingSummaries/user_00001"])
+
+
+class CatalogueSyncTests(FakeFirebaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(catalogue_sync.stop)
+        self.assertTrue(catalogue_sync.start(timeout=1))
+
+    def test_reads_are_served_from_memory_without_expiring(self):
+        self.firestore.reset_stats()
+
+        with mock.patch.object(exercise_cache, "ttl", 0):
+            self.assertEqual(len(get_exercises()), self.exercises)
+            self.assertEqual(exercise_search_index.search("")["total"], self.exercises)
+
+        self.assertEqual(self.firestore.rpc_count, 0)
+
+    def test_changes_written_elsewhere_are_applied(self):
+        version = catalogue_sync.version
+        collection = self.firestore.collection("exerciseData")
+
+        collection.document("exercise_00001").update({"name_en": "Zercher squat"})
+        collection.document("exercise_00002").delete()
+        collection.document("remote").set({"name_en": "Remote", "added_count": "3"})
+
+        exercises = {exercise["id"]: exercise for exercise in get_exercises()}
+        self.assertEqual(exercises["exercise_00001"]["name_en"], "Zercher squat")
+        self.assertNotIn("exercise_00002", exercises)
+        self.assertEqual(exercises["remote"]["added_count"], 3)
+        self.assertEqual(exercise_search_index.search("zercher")["ids"], ["exercise_00001"])
+        self.assertGreater(catalogue_sync.version, version)
+
+    def test_own_writes_are_applied_once(self):
+        version = catalogue_sync.version
+
+        update_exercise("exercise_00001", {"name_en": "Squat"})
+
+        # Whichever of the write path and the listener comes second finds nothing to change
+        self.assertEqual(catalogue_sync.version, version + 1)
+        self.assertEqual(get_exercises()[1]["name_en"], "Squat")
+
+
+class InstrumentationTests(FakeFirebaseTestCase):
+    def test_collect_metrics_counts_reads_writes_and_pool_work(self):
+        with collect_metrics() as metrics:
+            get_exercises()
+            batch_update_exercises(["exercise_00001", "exercise_00002"], "type", "duration")
+            delete_exercises(["exercise_00003"])
+
+        firestore, storage = metrics.firestore, metrics.storage
+        self.assertEqual(firestore["streamed"], self.exercises)
+        self.assertEqual(firestore["reads"], self.exercises)
+        # Two updates, one delete and its tombstone
+        self.assertEqual(firestore["writes"], 4)
+        self.assertGreater(firestore["bytes_read"], 0)
+        # Image deletes run on the I/O pool and are still attributed to this block
+        self.assertEqual(storage["rpcs"], self.bucket.rpc_count)
+
+    def test_response_has_server_timing_and_request_log(self):
+        # The first view of the page stores the users' training summaries
+        get_training_summaries([f"user_{index:05d}" for index in range(self.users)])
+        self.firestore.reset_stats()
+
+        with self.assertLogs("portal.requests", "INFO") as logs:
+            response = self.client.get("/portal/users/")
+
+        self.assertRegex(response["Server-Timing"], r'^firestore;dur=[\d.]+;desc="\d+ rpcs, \d+ reads, 0 writes", storage;dur=[\d.]+;desc="0 rpcs", total;dur=[\d.]+$')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record["path"], record["status"]), ("/portal/users/", 200))
+        self.assertEqual(record["firestore_rpcs"], self.firestore.rpc_count)
+
+    def test_streamed_body_is_counted_once_sent(self):
+        with self.assertLogs("portal.requests", "INFO") as logs:
+            response = self.client.get("/portal/exercises/export/", {"format": "jsonl"})
+            self.assertEqual(logs.records, [])
+            body = b"".join(response.streaming_content)
+
+        self.assertEqual(body.count(b"\n"), self.exercises)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["firestore_streamed"], self.exercises)
+
+
+class BenchmarkCommandTests(SimpleTestCase):
+    def test_benchmark_reports_every_scenario(self):
+        out = io.StringIO()
+        call_command("benchmark_portal", users=3, exercises=60, requests=2, latency=0, json=True, stdout=out)
+
+        results = {result["scenario"]: result for result in json.loads(out.getvalue())["results"]}
+        self.assertIn("users_view", results)
+        self.assertEqual(results["get_users_with_subcollections"]["firestore_rpcs"], 3)
+        self.assertEqual(results["exercises_view warm"]["firestore_rpcs"], 0)
+        self.assertTrue(all(result["p50_ms"] <= result["p99_ms"] for result in results.values()))
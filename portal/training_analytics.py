@@ -0,0 +1,302 @@
+"""
+Materialised training summaries over users/{uid}/routines_progress.
+
+Each user's totals are kept in a userTrainingSummaries/{uid} document: volume, sets and
+reps, personal records, progression against the sets' prev_reps/prev_weight, training
+days for streaks, and weekly and per-routine volume. Refreshing a summary reads only the
+progress documents dated on or after its watermark (the latest date folded in so far)
+and folds them into the stored totals, so the users page reads one small document per
+user instead of the whole history.
+
+The completed sets of a batch are loaded into parallel typed arrays (ProgressColumns)
+and reduced with map/sum/max over whole columns rather than per-document loops.
+
+Progress documents without a date are skipped. Edits or deletes of progress that was
+already folded in, and documents backfilled with an older date, are only picked up by
+a rebuild (``manage.py refresh_training_summaries --rebuild``).
+"""
+
+import asyncio
+import logging
+import math
+from array import array
+from datetime import date, datetime, timedelta
+from operator import eq, gt, lt, mul
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from .firebase_async import run_io
+from .firebase_clients import get_async_db, get_db
+from .firebase_utils import _io_executor, _now
+from .instrumentation import bind_context
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLLECTION = "userTrainingSummaries"
+# Stored summaries of another schema are rebuilt on their next refresh
+SCHEMA_VERSION = 1
+# Summaries refreshed longer ago than this are brought up to date when read
+SUMMARY_TTL = timedelta(seconds=getattr(settings, "PORTAL_TRAINING_SUMMARY_TTL", 900))
+RECENT_WEEKS = 8
+TOP_ROUTINES = 5
+
+
+def _number(value: Any, default: float) -> float:
+    if isinstance(value, bool):
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _day(value: Any) -> Optional[int]:
+    """Date ordinal of a progress "date": a datetime/date or an ISO 8601 string."""
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10]).toordinal()
+        except ValueError:
+            return None
+    return None
+
+
+def _week(day: int) -> str:
+    year, week, _ = date.fromordinal(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class ProgressColumns:
+    """
+    The completed sets of a batch of progress documents as parallel arrays, one item per
+    set, plus one item per session (progress document) in the session_* columns.
+    """
+
+    def __init__(self):
+        self.session = array("l")
+        self.reps = array("d")
+        self.weight = array("d")
+        # NaN when the set has no previous values, so every comparison with it is false
+        self.prev_volume = array("d")
+        self.session_day = array("l")
+        self.session_routine: List[str] = []
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[Dict[str, Any]]) -> "ProgressColumns":
+        columns = cls()
+        for progress in docs:
+            day = _day(progress.get("date"))
+            if day is None:
+                continue
+            session = len(columns.session_day)
+            columns.session_day.append(day)
+            columns.session_routine.append(str(progress.get("routine_id") or ""))
+            for completed in progress.get("completed_sets") or []:
+                if not isinstance(completed, dict):
+                    continue
+                columns.session.append(session)
+                columns.reps.append(_number(completed.get("reps"), 0.0))
+                columns.weight.append(_number(completed.get("weight"), 0.0))
+                columns.prev_volume.append(
+                    _number(completed.get("prev_reps"), math.nan) * _number(completed.get("prev_weight"), math.nan)
+                )
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.session_day)
+
+
+def empty_state() -> Dict[str, Any]:
+    return {
+        "schema": SCHEMA_VERSION,
+        "sessions": 0,
+        "sets": 0,
+        "reps": 0.0,
+        "volume": 0.0,
+        "best_weight": 0.0,
+        "best_e1rm": 0.0,
+        "best_session_volume": 0.0,
+        "progression": {"improved": 0, "matched": 0, "regressed": 0},
+        "days": [],
+        "weekly_volume": {},
+        "routines": {},
+        # Latest progress date folded in, and the IDs of the documents with that date
+        "watermark": {"date": None, "ids": []},
+        "refreshed_at": None,
+    }
+
+
+def fold(state: Dict[str, Any], columns: ProgressColumns) -> Dict[str, Any]:
+    """Adds a batch of progress to a summary state, in place."""
+    if not len(columns):
+        return state
+    volume = array("d", map(mul, columns.reps, columns.weight))
+    e1rm = map(lambda weight, reps: weight * (1 + reps / 30) if reps else 0.0, columns.weight, columns.reps)
+
+    session_volume = array("d", bytes(8 * len(columns)))
+    for session, set_volume in zip(columns.session, volume):
+        session_volume[session] += set_volume
+
+    state["sessions"] += len(columns)
+    state["sets"] += len(volume)
+    state["reps"] += math.fsum(columns.reps)
+    state["volume"] += math.fsum(volume)
+    state["best_weight"] = max(state["best_weight"], max(columns.weight, default=0.0))
+    state["best_e1rm"] = max(state["best_e1rm"], max(e1rm, default=0.0))
+    state["best_session_volume"] = max(state["best_session_volume"], max(session_volume))
+
+    progression = state["progression"]
+    progression["improved"] += sum(map(gt, volume, columns.prev_volume))
+    progression["matched"] += sum(map(eq, volume, columns.prev_volume))
+    progression["regressed"] += sum(map(lt, volume, columns.prev_volume))
+
+    state["days"] = sorted(set(state["days"]).union(columns.session_day))
+    weekly, routines = state["weekly_volume"], state["routines"]
+    for day, routine_id, total in zip(columns.session_day, columns.session_routine, session_volume):
+        week = _week(day)
+        weekly[week] = weekly.get(week, 0.0) + total
+        if routine_id:
+            routine = routines.setdefault(routine_id, {"sessions": 0, "volume": 0.0})
+            routine["sessions"] += 1
+            routine["volume"] += total
+    return state
+
+
+def _streaks(days: List[int], today: int) -> Dict[str, int]:
+    """Longest run of consecutive training days, and the run ending today or yesterday."""
+    if not days:
+        return {"current_streak": 0, "longest_streak": 0}
+    breaks = [index for index, gap in enumerate(map(lambda later, earlier: later - earlier, days[1:], days[:-1]), start=1) if gap > 1]
+    bounds = [0, *breaks, len(days)]
+    longest = max(map(lambda start, end: end - start, bounds[:-1], bounds[1:]))
+    current = len(days) - bounds[-2] if today - days[-1] <= 1 else 0
+    return {"current_streak": current, "longest_streak": longest}
+
+
+def summarize(state: Optional[Dict[str, Any]], today: Optional[date] = None) -> Dict[str, Any]:
+    """The dashboard view of a summary state."""
+    state = state or empty_state()
+    today_ordinal = (today or _now().date()).toordinal()
+    days = state["days"]
+    progression = state["progression"]
+    compared = progression["improved"] + progression["matched"] + progression["regressed"]
+    weeks = sorted(state["weekly_volume"].items())[-RECENT_WEEKS:]
+    routines = sorted(state["routines"].items(), key=lambda item: (-item[1]["sessions"], item[0]))[:TOP_ROUTINES]
+    return {
+        "sessions": state["sessions"],
+        "sets": state["sets"],
+        "reps": round(state["reps"]),
+        "volume": round(state["volume"], 1),
+        "best_weight": state["best_weight"],
+        "best_e1rm": round(state["best_e1rm"], 1),
+        "best_session_volume": round(state["best_session_volume"], 1),
+        "progression": {
+            **progression,
+            "compared": compared,
+            "improved_percent": round(100 * progression["improved"] / compared) if compared else 0,
+        },
+        **_streaks(days, today_ordinal),
+        "last_active": date.fromordinal(days[-1]).isoformat() if days else None,
+        "active_days_30": sum(1 for day in days if today_ordinal - day < 30),
+        "weekly_volume": [{"week": week, "volume": round(volume, 1)} for week, volume in weeks],
+        "routines": [{"id": routine_id, **totals, "volume": round(totals["volume"], 1)} for routine_id, totals in routines],
+        "refreshed_at": state["refreshed_at"],
+    }
+
+
+def _is_stale(state: Optional[Dict[str, Any]]) -> bool:
+    if not state or state.get("schema") != SCHEMA_VERSION or not state.get("refreshed_at"):
+        return True
+    return _now() - state["refreshed_at"] >= SUMMARY_TTL
+
+
+def _progress_query(db, user_id: str, since: Any):
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    query = db.collection("users").document(user_id).collection("routines_progress")
+    return query.where(filter=FieldFilter("date", ">=", since)) if since is not None else query
+
+
+def _fold_new_progress(state: Dict[str, Any], docs) -> Dict[str, Any]:
+    watermark = state["watermark"]
+    seen = set(watermark["ids"])
+    # The query includes the watermark's date, whose documents may be folded in already
+    new = [{**doc.to_dict(), "id": doc.id} for doc in docs if doc.id not in seen]
+    fold(state, ProgressColumns.from_docs(new))
+
+    dated = [progress for progress in new if _day(progress.get("date")) is not None]
+    if dated:
+        latest = max(progress["date"] for progress in dated)
+        ids = [progress["id"] for progress in dated if progress["date"] == latest]
+        if latest == watermark["date"]:
+            ids = watermark["ids"] + ids
+        state["watermark"] = {"date": latest, "ids": ids}
+    state["refreshed_at"] = _now()
+    return state
+
+
+def refresh_training_summary(user_id: str, state: Optional[Dict[str, Any]] = None, rebuild: bool = False) -> Dict[str, Any]:
+    """
+    Folds the user's progress documents newer than the summary's watermark into it and
+    stores the result. ``state`` is the stored summary if the caller already read it;
+    ``rebuild`` starts over from the whole history.
+    """
+    db = get_db()
+    reference = db.collection(SUMMARY_COLLECTION).document(user_id)
+    if state is None and not rebuild:
+        snapshot = reference.get()
+        state = snapshot.to_dict() if snapshot.exists else None
+    if rebuild or not state or state.get("schema") != SCHEMA_VERSION:
+        state = empty_state()
+
+    docs = _progress_query(db, user_id, state["watermark"]["date"]).stream()
+    state = _fold_new_progress(state, docs)
+    reference.set(state)
+    return state
+
+
+def _refresh_or_keep(user_id: str, state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    try:
+        return refresh_training_summary(user_id, state)
+    except Exception:
+        # A stale summary is still better than failing the page
+        logger.exception("Error refreshing the training summary of %s", user_id)
+        return state
+
+
+def get_training_summaries(user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns summarize() of each user's stored summary, read with one get_all call.
+    Stale or missing summaries are refreshed first, concurrently on the I/O pool.
+    """
+    if not user_ids:
+        return {}
+    db = get_db()
+    collection = db.collection(SUMMARY_COLLECTION)
+    states = {doc.id: doc.to_dict() for doc in db.get_all([collection.document(user_id) for user_id in user_ids]) if doc.exists}
+
+    stale = [user_id for user_id in user_ids if _is_stale(states.get(user_id))]
+    futures = [(user_id, _io_executor.submit(bind_context(_refresh_or_keep, user_id, states.get(user_id)))) for user_id in stale]
+    for user_id, future in futures:
+        states[user_id] = future.result()
+    return {user_id: summarize(states.get(user_id)) for user_id in user_ids}
+
+
+async def aget_training_summaries(user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Async get_training_summaries(); refreshes run on the I/O pool."""
+    if not user_ids:
+        return {}
+    db = get_async_db()
+    collection = db.collection(SUMMARY_COLLECTION)
+    states = {doc.id: doc.to_dict() async for doc in db.get_all([collection.document(user_id) for user_id in user_ids]) if doc.exists}
+
+    stale = [user_id for user_id in user_ids if _is_stale(states.get(user_id))]
+    refreshed = await asyncio.gather(*(run_io(_refresh_or_keep, user_id, states.get(user_id)) for user_id in stale))
+    states.update(zip(stale, refreshed))
+    return {user_id: summarize(states.get(user_id)) for user_id in user_ids}
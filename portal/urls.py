@@ -1,14 +1,34 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+
+if getattr(settings, "PORTAL_ASYNC_VIEWS", False):
+    from . import async_views as views
+else:
+    from . import views
 
 urlpatterns = [
     path("users/", views.users_view, name="users"),
     path("exercises/", views.exercises_view, name="exercises_list"),
+    path("exercises/cache_stats/", views.exercise_cache_stats, name="exercise_cache_stats"),
+    path("exercises/search/", views.exercise_search, name="exercise_search"),
+    path("exercises/completeness/", views.exercise_completeness, name="exercise_completeness"),
+    path("exercises/completeness/report.csv", views.completeness_report_csv, name="completeness_report_csv"),
+    path("exercises/most_added/", views.most_added_exercises, name="most_added_exercises"),
+    path("exercises/changes/", views.exercise_changes, name="exercise_changes"),
+    path("exercises/snapshot/", views.catalogue_snapshot_manifest, name="catalogue_snapshot_manifest"),
+    path("exercises/export/", views.export_exercises, name="export_exercises"),
+    path("exercises/import/", views.import_exercises_view, name="import_exercises"),
+    path("exercises/<str:ex_id>/detail/", views.exercise_detail, name="exercise_detail"),
+    path("exercises/<str:ex_id>/added/", views.exercise_added, name="exercise_added"),
     path("exercises/<str:ex_id>/update_type/", views.update_exercise_type, name="update_exercise_type"),
     path("exercises/<str:ex_id>/update_video_url/", views.update_video_url, name="update_video_url"),
     path("exercises/<str:ex_id>/delete/", views.delete_exercise_view, name="delete_exercise"),
     path("exercises/upload_image/", views.upload_exercise_image, name="upload_exercise_image"),
     path("exercises/create/", views.create_exercise, name="create_exercise"),
+    path("exercises/bulk_create/", views.bulk_create, name="bulk_create"),
+    path("exercises/batch_update/", views.batch_update, name="batch_update"),
+    path("exercises/flush_writes/", views.flush_writes, name="flush_writes"),
+    path("exercises/bulk_delete/", views.bulk_delete, name="bulk_delete"),
     path("exercises/<str:ex_id>/update_field/", views.update_field, name="update_field"),
     path("exercises/<str:ex_id>/update_array/", views.update_array, name="update_array"),
 ]
@@ -1,24 +1,320 @@
+import codecs
+import csv
+import logging
+from datetime import datetime, timezone
+
 from django.shortcuts import render
+from django.template.loader import render_to_string
 from .firebase_utils import (
-    get_users_with_subcollections,
-    get_exercises,
+    DEFAULT_PAGE_SIZE,
+    get_users_page,
+    get_exercises_by_ids,
+    get_exercises_page,
+    paginate_sorted,
     update_exercise,
+    batch_update_exercises,
     delete_exercise,
-    sanitize_exercise_payload,
+    delete_exercises,
+    create_exercises,
+    insert_exercise,
+    exercise_write_buffer,
+    get_exercise_cache_stats,
+    catalogue_changes_cursor,
+    get_exercise_changes,
 )
-from django.http import JsonResponse
+from .conditional import catalogue_condition, catalogue_page_condition, exercise_condition
+from .counters import DEFAULT_RANKING_SIZE, added_count_buffer, most_added, record_exercise_added
+from .completeness import SCORED_FIELDS, completeness_index, report_rows, serialize_entry
+from .fragments import card_fragments
+from .catalogue_io import CONTENT_TYPES, FORMATS, export_lines, format_for, import_exercises, iter_exercises, read_records
+from .image_pipeline import store_exercise_image
+from .search import FACET_FIELDS, exercise_search_index
+from .snapshots import catalogue_snapshot
+from .training_analytics import get_training_summaries
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from urllib.parse import urlencode
 from django.views.decorators.csrf import csrf_exempt
-from firebase_admin import firestore, storage
 
-db = firestore.client()
+logger = logging.getLogger(__name__)
+
+def _page_params(request):
+    """
+    Reads the cursor pagination query parameters: page_size, after and before.
+    """
+    try:
+        page_size = int(request.GET.get("page_size", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    return {
+        "page_size": page_size,
+        "after": request.GET.get("after") or None,
+        "before": request.GET.get("before") or None,
+    }
 
 def users_view(request):
-    users = get_users_with_subcollections()
-    return render(request, "portal/users.html", {"users": users})
+    page = get_users_page(**_page_params(request))
+    summaries = get_training_summaries([user["id"] for user in page["items"]])
+    for user in page["items"]:
+        user["training"] = summaries[user["id"]]
+    return render(request, "portal/users.html", {"users": page["items"], "page": page})
+
+def _search_params(request):
+    """
+    Reads the search query parameters: q plus one value per search facet.
+    """
+    return request.GET.get("q", "").strip(), {
+        facet: request.GET.get(facet, "").strip() for facet in FACET_FIELDS if request.GET.get(facet, "").strip()
+    }
+
+CARD_TEMPLATE = "portal/_exercise_card.html"
+CARD_CONTENT_TEMPLATE = "portal/_exercise_card_content.html"
+# Where exercises.html is split to stream the cards in between
+CARDS_MARKER = "<!-- exercise cards -->"
 
+def _exercises_page_parts(request, context):
+    """
+    Renders exercises.html without its cards and returns the parts before and after them.
+    """
+    head, tail = render_to_string("portal/exercises.html", context, request).split(CARDS_MARKER, 1)
+    return head, tail
+
+def _exercises_page_chunks(head, exercises, tail):
+    yield head
+    for exercise in exercises:
+        yield card_fragments.render_exercise(CARD_TEMPLATE, exercise)
+    yield tail
+
+@catalogue_page_condition
 def exercises_view(request):
-    exercises = get_exercises()
-    return render(request, "portal/exercises.html", {"exercises": exercises})
+    # Taken before the page is read, it covers whatever the cached catalogue is missing
+    changes_since = catalogue_changes_cursor()
+    query, filters = _search_params(request)
+    search = exercise_search_index.search(query, filters)
+    ids = search["ids"] if query or filters else None
+
+    page = get_exercises_page(**_page_params(request), ids=ids, shape="summary")
+    filter_query = urlencode({"q": query, **filters}) if query or filters else ""
+    head, tail = _exercises_page_parts(request, {
+        "exercises": page["items"],
+        "page": page,
+        "search": {"q": query, **filters, "total": search["total"], "facets": search["facets"]},
+        "filter_query": filter_query,
+        "changes_since": _changes_version(changes_since),
+    })
+    # Cards are sent as they are rendered (or taken from card_fragments)
+    return StreamingHttpResponse(_exercises_page_chunks(head, page["items"], tail), content_type="text/html; charset=utf-8")
+
+@exercise_condition
+def exercise_detail(request, ex_id):
+    """
+    Renders the editor fields of one exercise card, fetched when the card is expanded
+    """
+    def render_detail():
+        exercises = get_exercises_by_ids([ex_id])
+        if not exercises:
+            raise Http404("Exercise not found")
+        return render_to_string(CARD_CONTENT_TEMPLATE, {"ex": exercises[0]})
+
+    return HttpResponse(card_fragments.get_or_render(CARD_CONTENT_TEMPLATE, ex_id, render_detail))
+
+def _changes_version(moment):
+    """Milliseconds since the epoch, the compact form of a changes cursor."""
+    return int(moment.timestamp() * 1000)
+
+def _changes_since(request):
+    """
+    Reads the since parameter of the changes endpoint: a version returned by it (epoch
+    milliseconds) or an ISO 8601 timestamp. Raises ValueError when it is neither.
+    """
+    value = request.GET.get("since", "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc)
+    since = datetime.fromisoformat(value)
+    return since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+
+def _changes_response(changes):
+    return JsonResponse({
+        "success": True,
+        **changes,
+        "version": _changes_version(changes["since"]),
+    })
+
+def exercise_changes(request):
+    """
+    Returns the exercises created, updated or deleted since a version or timestamp:
+    {"updated": [...], "deleted": [ids], "version": <since for the next call>}
+    """
+    try:
+        since = _changes_since(request)
+    except ValueError:
+        return JsonResponse({"success": False, "error": "since must be a version or an ISO 8601 timestamp"}, status=400)
+    return _changes_response(get_exercise_changes(since))
+
+@catalogue_condition
+def catalogue_snapshot_manifest(request):
+    """
+    Returns the manifest of the compressed catalogue snapshot, rebuilt first if the
+    catalogue changed: download the artifact at url once, then follow exercise_changes
+    from changes_since.
+    """
+    return JsonResponse({"success": True, **catalogue_snapshot.manifest()})
+
+@catalogue_condition
+def exercise_search(request):
+    """
+    Returns the IDs matching q and the facet filters, one page at a time, with facet counts
+    """
+    query, filters = _search_params(request)
+    search = exercise_search_index.search(query, filters)
+    page = paginate_sorted([{"id": ex_id} for ex_id in search["ids"]], **_page_params(request))
+    return JsonResponse({
+        "success": True,
+        "ids": [item["id"] for item in page["items"]],
+        "total": search["total"],
+        "facets": search["facets"],
+        "next_cursor": page["next_cursor"],
+        "prev_cursor": page["prev_cursor"],
+    })
+
+def export_exercises(request):
+    """
+    Streams the whole catalogue as a download: ?format=jsonl (default) or csv
+    """
+    file_format = request.GET.get("format", "jsonl")
+    if file_format not in FORMATS:
+        return JsonResponse({"success": False, "error": f"format must be one of {', '.join(FORMATS)}"}, status=400)
+    response = StreamingHttpResponse(export_lines(iter_exercises(), file_format), content_type=CONTENT_TYPES[file_format])
+    response["Content-Disposition"] = f'attachment; filename="exercises.{file_format}"'
+    return response
+
+def import_exercises_view(request):
+    """
+    Imports an uploaded JSONL/CSV file ("file") and returns the import report.
+    Optional fields: format, dry_run=1, merge=1, resume_after=<line>.
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Invalid method"})
+    upload = request.FILES.get("file")
+    if upload is None:
+        return JsonResponse({"success": False, "error": "Missing file"})
+    file_format = request.POST.get("format") or format_for(upload.name)
+    if file_format not in FORMATS:
+        return JsonResponse({"success": False, "error": f"format must be one of {', '.join(FORMATS)}"})
+    try:
+        resume_after = int(request.POST.get("resume_after") or 0)
+    except ValueError:
+        return JsonResponse({"success": False, "error": "resume_after must be a line number"})
+
+    try:
+        report = import_exercises(
+            read_records(codecs.iterdecode(upload, "utf-8-sig"), file_format),
+            dry_run=request.POST.get("dry_run") == "1",
+            merge=request.POST.get("merge") == "1",
+            resume_after=resume_after,
+        )
+    except Exception as e:
+        logger.exception("Error importing exercises")
+        return JsonResponse({"success": False, "error": str(e)})
+    return JsonResponse({"success": report["failed"] is None, **report})
+
+def _completeness_params(request):
+    """
+    Reads the completeness report filters: missing=<field>, complete=0/1 and max_score.
+    Raises ValueError for values outside those.
+    """
+    missing = request.GET.get("missing", "").strip() or None
+    if missing is not None and missing not in SCORED_FIELDS:
+        raise ValueError(f"Unknown field: {missing}")
+    complete = request.GET.get("complete", "").strip()
+    if complete not in ("", "0", "1"):
+        raise ValueError("complete must be 0 or 1")
+    max_score = request.GET.get("max_score", "").strip()
+    return {
+        "missing": missing,
+        "complete": None if complete == "" else complete == "1",
+        "max_score": int(max_score) if max_score else None,
+    }
+
+@catalogue_condition
+def exercise_completeness(request):
+    """
+    Returns the precomputed completeness scores matching the filters, one page at a time,
+    with a summary over all of them
+    """
+    try:
+        report = completeness_index.report(**_completeness_params(request))
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    page = paginate_sorted(report["items"], **_page_params(request))
+    return JsonResponse({
+        "success": True,
+        "summary": report["summary"],
+        "items": [serialize_entry(entry) for entry in page["items"]],
+        "next_cursor": page["next_cursor"],
+        "prev_cursor": page["prev_cursor"],
+    })
+
+class _Echo:
+    """File-like object whose write() returns the line, for streaming csv.writer output."""
+    def write(self, value):
+        return value
+
+@catalogue_condition
+def completeness_report_csv(request):
+    """
+    Streams the completeness report as a CSV download, with the same filters as
+    exercise_completeness
+    """
+    try:
+        report = completeness_index.report(**_completeness_params(request))
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    writer = csv.writer(_Echo())
+    response = StreamingHttpResponse((writer.writerow(row) for row in report_rows(report["items"])), content_type="text/csv")
+    response["Content-Disposition"] = 'attachment; filename="incomplete_exercises_report.csv"'
+    return response
+
+def exercise_cache_stats(request):
+    return JsonResponse({
+        "success": True,
+        "stats": get_exercise_cache_stats(),
+        "fragments": card_fragments.stats(),
+        "added_counts": added_count_buffer.stats(),
+        "snapshot": catalogue_snapshot.stats(),
+    })
+
+@csrf_exempt
+def exercise_added(request, ex_id):
+    """
+    Counts additions of an exercise to routines: {"count": n} (default 1). Written to the
+    added_count shards in the background.
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Invalid method"})
+    try:
+        import json
+        data = {}
+        if request.content_type == 'application/json' and request.body:
+            data = json.loads(request.body.decode('utf-8'))
+        count = int(data.get("count", 1))
+    except (ValueError, AttributeError, TypeError):
+        return JsonResponse({"success": False, "error": "count must be a positive integer"})
+    if count < 1:
+        return JsonResponse({"success": False, "error": "count must be a positive integer"})
+    record_exercise_added(ex_id, count)
+    return JsonResponse({"success": True})
+
+def most_added_exercises(request):
+    """
+    Returns the most added exercises by their rolled-up added_count: ?limit=n
+    """
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_RANKING_SIZE))
+    except ValueError:
+        limit = DEFAULT_RANKING_SIZE
+    return JsonResponse({"success": True, "items": most_added(limit)})
 
 def update_exercise_type(request, ex_id):
     if request.method == "POST":
@@ -46,10 +342,33 @@ def update_video_url(request, ex_id):
 
 def delete_exercise_view(request, ex_id):
     if request.method == "POST":
-        delete_exercise(ex_id)
-        return JsonResponse({"success": True})
+        try:
+            delete_exercise(ex_id)
+            return JsonResponse({"success": True})
+        except Exception as e:
+            logger.exception("Error deleting exercise %s", ex_id)
+            return JsonResponse({"success": False, "error": str(e)})
     return JsonResponse({"success": False})
 
+def bulk_delete(request):
+    """
+    Deletes many exercises and their images: {"exercise_ids": [...]}
+    """
+    if request.method == "POST":
+        try:
+            import json
+            data = json.loads(request.body.decode('utf-8'))
+            ex_ids = data.get("exercise_ids") or []
+            if not ex_ids:
+                return JsonResponse({"success": False, "error": "No exercise IDs provided"})
+            result = delete_exercises(ex_ids)
+            return JsonResponse({"success": True, **result})
+        except Exception as e:
+            logger.exception("Error in bulk delete")
+            return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({"success": False, "error": "Invalid method"})
+
 @csrf_exempt
 def upload_exercise_image(request):
     if request.method == "POST":
@@ -61,33 +380,16 @@ def upload_exercise_image(request):
             return JsonResponse({"success": False, "error": "Missing fields"})
 
         try:
-            # Path in Firebase Storage
-            blob_path = f"exercise_images/{exercise_name}/{image_type}.jpg"
-            bucket = storage.bucket()
-            blob = bucket.blob(blob_path)
-
-            # Read the file content
-            image_content = image_file.read()
-            
-            # Upload file
-            blob.upload_from_string(
-                image_content, 
-                content_type=image_file.content_type
-            )
-
-            # Make public (or use signed URL if you want restricted access)
-            blob.make_public()
-            public_url = blob.public_url
-
-            # Update Firestore with new image URL
-            field_name = f"image_{image_type}"
-            update_exercise(exercise_name, {field_name: public_url})
-
-            return JsonResponse({"success": True, "newImageUrl": public_url})
+            result = store_exercise_image(exercise_name, image_type, image_file)
+            return JsonResponse({
+                "success": True,
+                "newImageUrl": result["image_url"],
+                "thumbnailUrl": result["thumbnail_url"],
+            })
+        except ValueError as e:
+            return JsonResponse({"success": False, "error": str(e)})
         except Exception as e:
-            import traceback
-            print(f"Error uploading image: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error uploading image for %s", exercise_name)
             return JsonResponse({"success": False, "error": str(e)})
             
     return JsonResponse({"success": False, "error": "Invalid method"})
@@ -98,6 +400,8 @@ def create_exercise(request):
     Creates a new exercise in the database with all fields
     """
     if request.method == "POST":
+        from google.api_core.exceptions import AlreadyExists
+
         try:
             import json
             if request.content_type == 'application/json':
@@ -118,20 +422,56 @@ def create_exercise(request):
             if not exercise_id:
                 return JsonResponse({"success": False, "error": "Exercise ID is required"})
 
-            sanitized_payload = sanitize_exercise_payload(data, apply_defaults=True, include_unknown=False)
-            sanitized_payload["id"] = exercise_id
-
-            # Store the exercise document
-            db.collection("exerciseData").document(exercise_id).set(sanitized_payload)
+            # Fails instead of overwriting an existing exercise
+            insert_exercise(exercise_id, data)
             return JsonResponse({"success": True, "id": exercise_id})
+        except AlreadyExists:
+            return JsonResponse({"success": False, "error": f"Exercise {exercise_id} already exists"}, status=409)
         except Exception as e:
-            import traceback
-            print(f"Error creating exercise: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error creating exercise")
             return JsonResponse({"success": False, "error": str(e)})
             
     return JsonResponse({"success": False, "error": "Invalid method"})
 
+def bulk_create(request):
+    """
+    Creates many exercises without overwriting existing ones: {"exercises": [{"id": ...}, ...]}
+    """
+    if request.method == "POST":
+        try:
+            import json
+            data = json.loads(request.body.decode('utf-8'))
+            exercises = data.get("exercises")
+            if not isinstance(exercises, list) or not all(isinstance(exercise, dict) for exercise in exercises):
+                return JsonResponse({"success": False, "error": "exercises must be a list of objects"})
+            result = create_exercises(exercises)
+            return JsonResponse({"success": not result["conflicts"] and not result["failures"], **result})
+        except ValueError as e:
+            return JsonResponse({"success": False, "error": str(e)})
+        except Exception as e:
+            logger.exception("Error in bulk create")
+            return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({"success": False, "error": "Invalid method"})
+
+def _buffered_result(ex_id, result):
+    """
+    Response to a buffered update: not a success when an earlier update of the exercise
+    could not be written, as the editor shows values that were lost.
+    """
+    if result["failures"]:
+        return {"success": False, "buffered": True, "error": f"An earlier update of {ex_id} was not saved: {result['failures'][ex_id]}", **result}
+    return {"success": True, "buffered": True, **result}
+
+def _save_fields(ex_id, data):
+    """
+    Saves editor field updates through the write buffer when coalescing is enabled.
+    """
+    if exercise_write_buffer.enabled:
+        return _buffered_result(ex_id, exercise_write_buffer.submit(ex_id, data))
+    update_exercise(ex_id, data)
+    return {"success": True}
+
 @csrf_exempt
 def update_field(request, ex_id):
     """
@@ -144,31 +484,66 @@ def update_field(request, ex_id):
                 data = json.loads(request.body.decode('utf-8'))
                 
                 try:
-                    update_exercise(ex_id, data)
-                    return JsonResponse({"success": True})
+                    return JsonResponse(_save_fields(ex_id, data))
                 except ValueError as e:
                     return JsonResponse({"success": False, "error": str(e)})
                 except Exception as e:
-                    print(f"Error updating field: {str(e)}")
+                    logger.exception("Error updating field of %s", ex_id)
                     return JsonResponse({"success": False, "error": str(e)})
             else:
                 # Handle form data
                 field = next(iter(request.POST))
                 value = request.POST.get(field)
                 try:
-                    update_exercise(ex_id, {field: value})
-                    return JsonResponse({"success": True})
+                    return JsonResponse(_save_fields(ex_id, {field: value}))
                 except ValueError as e:
                     return JsonResponse({"success": False, "error": str(e)})
                 except Exception as e:
-                    print(f"Error updating field: {str(e)}")
+                    logger.exception("Error updating field of %s", ex_id)
                     return JsonResponse({"success": False, "error": str(e)})
         except Exception as e:
-            print(f"Error updating field: {str(e)}")
+            logger.exception("Error updating field of %s", ex_id)
             return JsonResponse({"success": False, "error": str(e)})
     
     return JsonResponse({"success": False, "error": "Invalid method"})
 
+def batch_update(request):
+    """
+    Applies one field value to many exercises: {"field", "value", "exercise_ids"}
+    """
+    if request.method == "POST":
+        try:
+            import json
+            data = json.loads(request.body.decode('utf-8'))
+            result = batch_update_exercises(data.get("exercise_ids") or [], data.get("field"), data.get("value"))
+            return JsonResponse({"success": True, **result})
+        except ValueError as e:
+            return JsonResponse({"success": False, "error": str(e)})
+        except Exception as e:
+            logger.exception("Error in batch update")
+            return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({"success": False, "error": "Invalid method"})
+
+@csrf_exempt
+def flush_writes(request):
+    """
+    Flushes buffered field updates, for one exercise when "exercise_id" is given
+    """
+    if request.method == "POST":
+        try:
+            import json
+            data = {}
+            if request.content_type == 'application/json' and request.body:
+                data = json.loads(request.body.decode('utf-8'))
+            report = exercise_write_buffer.flush(data.get("exercise_id"))
+            return JsonResponse({"success": not report["failures"], **report, "stats": exercise_write_buffer.stats()})
+        except Exception as e:
+            logger.exception("Error flushing writes")
+            return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({"success": False, "error": "Invalid method"})
+
 @csrf_exempt
 def update_array(request, ex_id):
     """
@@ -179,15 +554,14 @@ def update_array(request, ex_id):
             import json
             data = json.loads(request.body.decode('utf-8'))
             try:
-                update_exercise(ex_id, data)
-                return JsonResponse({"success": True})
+                return JsonResponse(_save_fields(ex_id, data))
             except ValueError as e:
                 return JsonResponse({"success": False, "error": str(e)})
             except Exception as e:
-                print(f"Error updating array field: {str(e)}")
+                logger.exception("Error updating array field of %s", ex_id)
                 return JsonResponse({"success": False, "error": str(e)})
         except Exception as e:
-            print(f"Error updating array field: {str(e)}")
+            logger.exception("Error updating array field of %s", ex_id)
             return JsonResponse({"success": False, "error": str(e)})
     
     return JsonResponse({"success": False, "error": "Invalid method"})
\ No newline at end of file